@@ -0,0 +1,5 @@
+"""Benchmarks.
+
+Not part of the test suite, to be run from the repository root with:
+    PYTHONPATH=:custom_components python -m benchmarks.<module>
+"""
@@ -0,0 +1,92 @@
+"""Simulation benchmark of the adapter multi queue scheduler.
+
+An adapter with an instantaneous advertising gets N device queues, each one receiving a train of queue items,
+with or without delay_after, or only SPARSE of them (the others being known but idle).
+The CPU time spent per advertised item measures the scheduling overhead, which should stay flat whatever the number of queues.
+    python -m benchmarks.adapter_scheduler [--queues 10 100 500] [--items 20] [--sets 1] [--delay 2]
+"""
+
+# ruff: noqa: T201
+import argparse
+import asyncio
+import time
+
+from ble_adv.adapters import BleAdvAdapter, BleAdvAdapterAdvItem, BleAdvQueueItem
+
+
+class _SimAdapter(BleAdvAdapter):
+    """Adapter advertising instantaneously, counting the advertised items."""
+
+    def __init__(self, nb_adv_sets: int) -> None:
+        super().__init__("sim", "00:00:00:00:00:00", self._on_adapter_error, 100)
+        self.nb_adv_sets = nb_adv_sets
+        self.nb_advertised: int = 0
+        self.expected: int = 0
+        self.done: asyncio.Event = asyncio.Event()
+
+    async def _on_adapter_error(self, message: str) -> None:
+        print(f"Adapter error: {message}")
+
+    async def open(self) -> None:
+        self._opened = True
+
+    def close(self) -> None:
+        self._opened = False
+
+    async def _advertise(self, item: BleAdvAdapterAdvItem, adv_set: int = 0) -> None:  # noqa: ARG002
+        self.nb_advertised += 1
+        if self.nb_advertised >= self.expected:
+            self.done.set()
+        await asyncio.sleep(0)
+
+    async def _advertise_idle(self, adv_set: int = 0) -> None:
+        pass
+
+
+SPARSE = 5
+
+
+async def _run(nb_queues: int, nb_active: int, nb_items: int, nb_sets: int, delay: int) -> tuple[float, float]:
+    """Run a scenario on nb_active of nb_queues queues, returning the CPU time per advertised item (in us) and the wall duration (in s)."""
+    adapter = _SimAdapter(nb_sets)
+    await adapter.async_init()
+    adapter.expected = nb_queues + nb_active * nb_items
+    for qind in range(nb_queues):
+        await adapter.enqueue(f"q{qind}", BleAdvQueueItem(None, 1, 0, 100, [bytes([qind & 0xFF])], 2))
+    await adapter.drain()
+    start_cpu = time.process_time()
+    start = time.perf_counter()
+    for i in range(nb_items):
+        for qind in range(nb_active):
+            # distinct keys: no replacement of the pending items
+            await adapter.enqueue(f"q{qind}", BleAdvQueueItem(i, 1, delay, 100, [bytes([qind & 0xFF, i & 0xFF])], 2))
+    await adapter.done.wait()
+    cpu = time.process_time() - start_cpu
+    duration = time.perf_counter() - start
+    await adapter.async_final()
+    for task in adapter._dequeue_tasks:  # noqa: SLF001
+        task.cancel()
+    return 1000000.0 * cpu / (nb_active * nb_items), duration
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Adapter scheduler simulation benchmark")
+    parser.add_argument("--queues", type=int, nargs="+", default=[10, 100, 500], help="Numbers of device queues")
+    parser.add_argument("--items", type=int, default=20, help="Number of items per queue")
+    parser.add_argument("--sets", type=int, default=1, help="Number of advertising sets")
+    parser.add_argument("--delay", type=int, default=2, help="delay_after of the items with delay, in ms")
+    args = parser.parse_args()
+
+    scenarios = {"no delay": (None, 0), f"delay {args.delay}ms": (None, args.delay), f"sparse {SPARSE}, delay": (SPARSE, args.delay)}
+    print(f"{'queues':>8}" + "".join(f"{x:>24}" for x in scenarios))
+    for nb_queues in args.queues:
+        cells = []
+        for nb_active, delay in scenarios.values():
+            cpu, duration = asyncio.run(_run(nb_queues, nb_active or nb_queues, args.items, args.sets, delay))
+            cells.append(f"{cpu:>9.1f} us/item {duration:>5.2f}s")
+        print(f"{nb_queues:>8}" + "".join(f"{x:>24}" for x in cells))
+
+
+if __name__ == "__main__":
+    main()
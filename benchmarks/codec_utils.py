@@ -0,0 +1,80 @@
+"""Micro benchmark of the codec utils: whitening, bytes reversal and CRC16.
+
+Compares the current implementations to the historical bit by bit ones.
+"""
+
+# ruff: noqa: T201
+import timeit
+from binascii import crc_hqx
+from collections.abc import Callable
+
+from ble_adv.codecs.utils import Crc16, crc16_le, reverse_all, reverse_byte, whiten
+
+NB_LOOP = 20000
+BUFFER = bytes.fromhex("F9084989E4E1A23E6C950B58C9382807")
+
+
+def ref_whiten(buffer: bytes, seed: int) -> bytes:
+    """Historical bit by bit whitening."""
+    obuf = []
+    r = seed
+    for val in buffer:
+        b = 0
+        for j in range(8):
+            r <<= 1
+            if r & 0x80:
+                r ^= 0x11
+                b |= 1 << j
+            r &= 0x7F
+        obuf.append(val ^ b)
+    return bytes(obuf)
+
+
+def ref_reverse_all(buffer: bytes) -> bytes:
+    """Historical byte per byte reversal."""
+    return bytes([reverse_byte(x) for x in buffer])
+
+
+def ref_crc16_le(buffer: bytes, seed: int, poly: int = 0x8408, ref_in: bool = True, ref_out: bool = True) -> int:
+    """Historical bit by bit CRC16."""
+    crc = seed if not ref_in else seed ^ 0xFFFF
+    for byte in buffer:
+        crc = crc ^ byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ poly if crc & 0x0001 else crc >> 1
+    return crc if not ref_out else crc ^ 0xFFFF
+
+
+def ref_crc16_x25(buffer: bytes) -> int:
+    """Historical Zhi Mei V2 CRC."""
+    pre_cec: int = crc_hqx(ref_reverse_all(buffer), 0xFFFF)
+    return 0xFFFF ^ (((reverse_byte(pre_cec & 0xFF) << 8) & 0xFF00) | (reverse_byte(pre_cec >> 8) & 0xFF))
+
+
+CRC16_X25 = Crc16(0x1021, ref_in=True, ref_out=True, xor_out=0xFFFF)
+CRC16_ARC = Crc16(0x8005, ref_in=True, ref_out=True)
+
+CASES: list[tuple[str, Callable[[], object], Callable[[], object]]] = [
+    ("whiten", lambda: ref_whiten(BUFFER, 0x37), lambda: whiten(BUFFER, 0x37)),
+    ("whiten x2", lambda: ref_whiten(ref_whiten(BUFFER, 0x37), 0x7F), lambda: whiten(BUFFER, 0x37, 0x7F)),
+    ("reverse_all", lambda: ref_reverse_all(BUFFER), lambda: reverse_all(BUFFER)),
+    ("crc16_le", lambda: ref_crc16_le(BUFFER, 0), lambda: crc16_le(BUFFER, 0)),
+    ("crc16_x25", lambda: ref_crc16_x25(BUFFER), lambda: CRC16_X25(BUFFER, 0xFFFF)),
+    ("crc16_arc", lambda: ref_crc16_le(BUFFER, 0, 0xA001, False, False), lambda: CRC16_ARC(BUFFER, 0)),
+]
+
+
+def main() -> None:
+    """Run the benchmark."""
+    print(f"{'case':<12} {'reference':>14} {'current':>14} {'speed-up':>9}")
+    for name, ref_fct, cur_fct in CASES:
+        if ref_fct() != cur_fct():
+            msg = f"Results differ for {name}"
+            raise AssertionError(msg)
+        ref_ops = NB_LOOP / timeit.timeit(ref_fct, number=NB_LOOP)
+        cur_ops = NB_LOOP / timeit.timeit(cur_fct, number=NB_LOOP)
+        print(f"{name:<12} {ref_ops:>10.0f} op/s {cur_ops:>10.0f} op/s {cur_ops / ref_ops:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Micro benchmark of the codecs, on the golden vectors of the codec tests.
+
+For each codec_id, measures the throughput and the peak traced memory (tracemalloc) during a call of:
+* decode_hit: decoding of a vector of the codec,
+* decode_miss: decoding of a vector of another codec, rejected,
+* encode: encoding of the decoded command and config,
+* full: ent_to_enc -> encode_advs -> to_raw from the entity attributes of the decoded command.
+
+The golden vectors are the parameters of the codec tests, as collected by pytest.
+The results can be written as a JSON report, and compared to a baseline report of the same machine and python version:
+    python -m benchmarks.codecs [--output report.json] [--baseline path] [--tolerance 0.25] [--update-baseline]
+No baseline is committed: the timings are machine specific. Store one locally with --update-baseline before a change.
+"""
+
+# ruff: noqa: T201
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import timeit
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import pytest
+from ble_adv.codecs import dyn_codec_params, get_codecs
+from ble_adv.codecs.models import BleAdvAdvertisement, BleAdvCodec
+
+NB_LOOP = 1000
+NB_REPEAT = 5
+TOLERANCE = 0.25
+TESTS_DIR = Path(__file__).parent.parent / "tests" / "codecs"
+METRICS = ["decode_hit", "decode_miss", "encode", "full"]
+
+
+def _from_dotted(data: str) -> bytes:
+    return bytes.fromhex(data.replace(".", ""))
+
+
+class _VectorCollector:
+    """Pytest plugin keeping the name and parameters of the collected parametrized tests."""
+
+    def __init__(self) -> None:
+        self.tests: list[tuple[str, dict[str, Any]]] = []
+
+    def pytest_collection_modifyitems(self, items: list[pytest.Item]) -> None:
+        self.tests += [(x.originalname, x.callspec.params) for x in items if isinstance(x, pytest.Function) and hasattr(x, "callspec")]
+
+
+def get_vectors() -> dict[str, tuple[BleAdvAdvertisement, str]]:
+    """Get the first (adv, translator set) vector of each codec_id from the codec tests, full vectors first."""
+    collector = _VectorCollector()
+    with contextlib.redirect_stdout(io.StringIO()):
+        pytest.main(["--collect-only", "--noconftest", "-p", "no:cacheprovider", str(TESTS_DIR)], plugins=[collector])
+    full_vectors: dict[str, tuple[BleAdvAdvertisement, str]] = {}
+    base_vectors: dict[str, tuple[BleAdvAdvertisement, str]] = {}
+    for test_name, vals in collector.tests:
+        if "enc_name" not in vals:
+            continue
+        codec_id = vals["enc_name"] if "params" in vals else dyn_codec_params(vals["enc_name"])[0]
+        if test_name == "test_decode_reencode":
+            adv = BleAdvAdvertisement.FromRaw(_from_dotted(vals["raw"]))
+            full_vectors.setdefault(codec_id, (adv, vals.get("tr_set", BleAdvCodec.DEF_TRANS_NAME)))
+        elif test_name == "test_encoding":
+            sec_raw = _from_dotted(vals.get("sec_raw", ""))
+            adv = BleAdvAdvertisement(vals["ble_type"], _from_dotted(vals["data"]), 0, vals.get("sec_type", 0), sec_raw)
+            base_vectors.setdefault(codec_id, (adv, BleAdvCodec.DEF_TRANS_NAME))
+    return {**base_vectors, **full_vectors}
+
+
+def _measure(func: Callable[[], Any]) -> dict[str, float]:
+    """Measure the ops / sec (best of NB_REPEAT runs) and the peak traced memory during a call, in bytes."""
+    ops = NB_LOOP / min(timeit.repeat(func, number=NB_LOOP, repeat=NB_REPEAT))
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ops": round(ops, 1), "peak_traced_bytes": peak}
+
+
+def _bench_codec(codec: BleAdvCodec, adv: BleAdvAdvertisement, tr_set: str, miss_adv: BleAdvAdvertisement | None) -> dict[str, dict[str, float]]:
+    enc_cmd, conf = codec.decode_adv(adv)
+    if enc_cmd is None or conf is None:
+        msg = f"Golden vector not decoded by {codec.codec_id}"
+        raise AssertionError(msg)
+    res = {
+        "decode_hit": _measure(lambda: codec.decode_adv(adv)),
+        "encode": _measure(lambda: codec.encode_advs(enc_cmd, conf)),
+    }
+    if miss_adv is not None:
+        res["decode_miss"] = _measure(lambda: codec.decode_adv(miss_adv))
+    if ent_attrs := codec.enc_to_ent(enc_cmd, tr_set):
+        ent_attr = ent_attrs[0]
+        res["full"] = _measure(lambda: [x.to_raw() for cmd in codec.ent_to_enc(ent_attr, tr_set) for x in codec.encode_advs(cmd, conf)])
+    return res
+
+
+def run() -> dict[str, Any]:
+    """Run the benchmark on all the codecs having a golden vector."""
+    vectors = get_vectors()
+    codecs = get_codecs()
+    results = {}
+    for codec_id, (adv, tr_set) in sorted(vectors.items()):
+        codec = codecs[codec_id]
+        # a vector of another codec, not decoded by this one, preferably with the same signature type and length to reach the deepest checks
+        misses = [x for cid, (x, _) in vectors.items() if cid != codec_id and codec.decode_adv(x)[1] is None]
+        miss_adv = max(misses, key=lambda x: (x.ble_type == adv.ble_type, len(x.raw) == len(adv.raw)), default=None)
+        results[codec_id] = _bench_codec(codec, adv, tr_set, miss_adv)
+    return {"python": platform.python_version(), "machine": platform.machine(), "loops": NB_LOOP, "repeat": NB_REPEAT, "results": results}
+
+
+def compare(report: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    """Compare a report to a baseline, returning the regressions beyond the tolerance."""
+    regressions: list[str] = []
+    for codec_id, metrics in report["results"].items():
+        for metric, res in metrics.items():
+            if (ref := baseline["results"].get(codec_id, {}).get(metric)) is None:
+                continue
+            if res["ops"] < ref["ops"] * (1.0 - tolerance):
+                regressions.append(f"{codec_id} {metric}: {res['ops']:.0f} op/s vs {ref['ops']:.0f} op/s in baseline")
+            if res["peak_traced_bytes"] > ref["peak_traced_bytes"] * (1.0 + tolerance):
+                regressions.append(f"{codec_id} {metric}: {res['peak_traced_bytes']} peak traced bytes vs {ref['peak_traced_bytes']} in baseline")
+    return regressions
+
+
+def main() -> None:
+    """Run the benchmark, write the report and compare it to the baseline."""
+    parser = argparse.ArgumentParser(description="Codecs micro benchmark")
+    parser.add_argument("--output", type=Path, help="JSON report file")
+    parser.add_argument("--baseline", type=Path, help="Local JSON baseline file, of the same machine and python version")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Accepted relative degradation")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the report as the new baseline")
+    args = parser.parse_args()
+
+    report = run()
+    print(f"{'codec_id':<22}" + "".join(f"{x:>24}" for x in METRICS))
+    for codec_id, metrics in report["results"].items():
+        cells = [f"{metrics[x]['ops']:>10.0f} op/s {metrics[x]['peak_traced_bytes']:>6} B" if x in metrics else f"{'-':>24}" for x in METRICS]
+        print(f"{codec_id:<22}" + "".join(cells))
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2))
+    if args.baseline is None:
+        return
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Baseline stored in {args.baseline}")
+        return
+    if not args.baseline.exists():
+        print(f"No baseline found in {args.baseline}")
+        return
+    baseline = json.loads(args.baseline.read_text())
+    if (baseline["python"], baseline["machine"]) != (report["python"], report["machine"]):
+        print(f"Baseline recorded with python {baseline['python']} on {baseline['machine']}, not comparable: store a new one with --update-baseline")
+        return
+    if regressions := compare(report, baseline, args.tolerance):
+        print(f"{len(regressions)} regression(s) beyond {100.0 * args.tolerance:.0f}% tolerance:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"No regression beyond {100.0 * args.tolerance:.0f}% tolerance against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""Replay benchmark of the coordinator: sizing of a deployment.
+
+A replay coordinator (see BleAdvCoordinator.create_replay_coordinator) gets a synthetic device population:
+N devices over M codecs and A adapters. A timestamped stream of (adapter_id, orig, raw) records, either synthetic
+or loaded from a capture file, is then replayed through handle_raw_adv, as fast as possible or at recorded / accelerated speed.
+The coordinator runs on a virtual clock driven by the record timestamps, so the dedup behaves as recorded whatever the speed.
+
+Reported: throughput (records / replay wall time), p50 / p99 per adv latency, dedup hit rates, published commands and memory growth.
+    python -m benchmarks.coordinator_replay [--devices 100] [--codecs 10] [--adapters 2] [--duration 600] [--speed 0]
+    python -m benchmarks.coordinator_replay --write-capture capture.bin
+    python -m benchmarks.coordinator_replay --capture capture.bin
+Captures are binary captures (see ble_adv.capture), possibly rotated, or JSON lines files if suffixed '.jsonl'.
+"""
+
+# ruff: noqa: T201, SLF001
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from ble_adv.capture import BleAdvCaptureRecord, BleAdvCaptureWriter, read_capture_files
+from ble_adv.codecs import get_codecs
+from ble_adv.codecs.models import BleAdvAdvertisement, BleAdvConfig, BleAdvEncCmd, BleAdvEntAttr
+from ble_adv.coordinator import BleAdvBaseDevice, BleAdvCoordinator
+from homeassistant.core import HomeAssistant
+
+from benchmarks.codecs import get_vectors
+
+
+class _Device(BleAdvBaseDevice):
+    """Device counting the commands it receives."""
+
+    def __init__(self, coordinator: BleAdvCoordinator, unique_id: str, codec_id: str, adapter_ids: list[str], config: BleAdvConfig) -> None:
+        super().__init__(coordinator, unique_id, codec_id, adapter_ids, 1, 20, 100, config)
+        self.nb_commands: int = 0
+
+    async def async_on_command(self, ent_attrs: list[BleAdvEntAttr], publish_command: bool) -> None:  # noqa: ARG002
+        """Count the received commands."""
+        self.nb_commands += 1
+
+
+class Population(NamedTuple):
+    """Synthetic device population: per device its codec_id, adapters, orig mac, config and command."""
+
+    devices: list[tuple[str, list[str], str, BleAdvConfig, BleAdvEncCmd]]
+    adapter_ids: list[str]
+
+
+def _mac(rnd: random.Random) -> str:
+    return ":".join(f"{rnd.randrange(256):02X}" for _ in range(6))
+
+
+def build_population(nb_devices: int, nb_codecs: int, nb_adapters: int, rnd: random.Random) -> Population:
+    """Build N devices over M codecs of distinct match ids, with the golden vectors as commands, and A adapters."""
+    codecs = get_codecs()
+    vectors = get_vectors()
+    by_match_id = {codecs.match_id(codec_id): codec_id for codec_id in sorted(vectors, reverse=True)}
+    codec_ids = sorted(by_match_id.values())[:nb_codecs]
+    adapter_ids = [f"hci{i}" for i in range(nb_adapters)]
+    devices = []
+    for i in range(nb_devices):
+        codec_id = codec_ids[i % len(codec_ids)]
+        enc_cmd, conf = codecs[codec_id].decode_adv(vectors[codec_id][0])
+        if enc_cmd is None or conf is None:
+            msg = f"Golden vector not decoded by {codec_id}"
+            raise AssertionError(msg)
+        conf.id = conf.id ^ (i + 1)
+        # keep the config as effectively decoded: some codecs truncate the id or index
+        _, dec_conf = codecs[codec_id].decode_adv(codecs[codec_id].encode_advs(enc_cmd, conf)[0])
+        if dec_conf is not None:
+            conf.id, conf.index = dec_conf.id, dec_conf.index
+        adapters = rnd.sample(adapter_ids, rnd.randint(1, len(adapter_ids)))
+        devices.append((codec_id, adapters, _mac(rnd), conf, enc_cmd))
+    return Population(devices, adapter_ids)
+
+
+def synthetic_stream(pop: Population, duration: float, rate: float, repeats: int, noise_rate: float, rnd: random.Random) -> list[BleAdvCaptureRecord]:
+    """Build a stream of records over 'duration' seconds.
+
+    Commands are sent at 'rate' per second by random devices, each advertisement being received 'repeats' times
+    every 20ms by each adapter of the device. Ambient noise from 50 beacons is received at 'noise_rate' per second.
+    """
+    codecs = get_codecs()
+    records = []
+    ts = 0.0
+    tx_count = 0
+    while (ts := ts + rnd.expovariate(rate)) < duration:
+        codec_id, adapters, orig, conf, enc_cmd = rnd.choice(pop.devices)
+        tx_count += 1
+        conf.tx_count = tx_count % 125
+        for adv in codecs[codec_id].encode_advs(enc_cmd, conf):
+            raw = adv.to_raw()
+            records.extend(
+                BleAdvCaptureRecord(ts + 0.02 * rep + 0.001 * i, adapter_id, orig, raw)
+                for rep in range(repeats)
+                for i, adapter_id in enumerate(adapters)
+            )
+    beacons = [(_mac(rnd), bytes([0x02, 0x01, 0x06, 27, 0xFF]) + rnd.randbytes(26)) for _ in range(50)]
+    ts = 0.0
+    while (ts := ts + rnd.expovariate(noise_rate)) < duration:
+        orig, raw = rnd.choice(beacons)
+        records.append(BleAdvCaptureRecord(ts, rnd.choice(pop.adapter_ids), orig, raw))
+    return sorted(records, key=lambda x: x.ts)
+
+
+def write_capture(path: Path, records: list[BleAdvCaptureRecord]) -> None:
+    """Write records as a JSON lines capture file if its suffix is '.jsonl', else as a binary capture."""
+    if path.suffix == ".jsonl":
+        with path.open("w") as file:
+            file.writelines(json.dumps({"ts": x.ts, "adapter_id": x.adapter_id, "orig": x.orig, "raw": x.raw.hex()}) + "\n" for x in records)
+        return
+    with path.open("wb") as file:
+        writer = BleAdvCaptureWriter(file, 0.0)
+        for rec in records:
+            writer.write(rec.ts, rec.adapter_id, rec.orig, rec.raw)
+
+
+def read_capture(path: Path) -> Iterator[BleAdvCaptureRecord]:
+    """Stream the records of a JSON lines capture file if its suffix is '.jsonl', else of a rotating binary capture."""
+    if path.suffix != ".jsonl":
+        yield from read_capture_files(path)
+        return
+    with path.open() as file:
+        for line in file:
+            data = json.loads(line)
+            yield BleAdvCaptureRecord(data["ts"], data["adapter_id"], data["orig"], bytes.fromhex(data["raw"]))
+
+
+class _VirtualClock:
+    def __init__(self) -> None:
+        self.now: float = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _setup(base: BleAdvCoordinator, pop: Population) -> tuple[BleAdvCoordinator, list[_Device]]:
+    coord = base.create_replay_coordinator()
+    devices = []
+    for i, (codec_id, adapters, _, conf, _) in enumerate(pop.devices):
+        device = _Device(coord, f"dev_{i}", codec_id, adapters, BleAdvConfig(conf.id, conf.index))
+        coord.add_device(device)
+        devices.append(device)
+    return coord, devices
+
+
+async def replay(base: BleAdvCoordinator, pop: Population, records: list[BleAdvCaptureRecord], speed: float) -> dict[str, Any]:
+    """Replay the records through a fresh replay coordinator, at 'speed' times the recorded speed, or as fast as possible if 0."""
+    coord, devices = _setup(base, pop)
+    clock = coord.clock = _VirtualClock()
+    outcomes: Counter[str] = Counter()
+    latencies = []
+    t0 = records[0].ts if records else 0.0
+    start = time.perf_counter()
+    for record in records:
+        if speed > 0 and (delay := start + (record.ts - t0) / speed - time.perf_counter()) > 0:
+            await asyncio.sleep(delay)
+        clock.now = record.ts
+        # classify the outcome beforehand: the coordinator expires the outdated items first
+        coord._raw_last_advs.expire(record.ts)
+        coord._dec_last_advs.expire(record.ts)
+        if record.raw in coord._raw_last_advs:
+            outcomes["raw_dedup"] += 1
+        elif BleAdvAdvertisement.FromRaw(record.raw).raw in coord._dec_last_advs:
+            outcomes["decoded_dedup"] += 1
+        else:
+            outcomes["processed"] += 1
+        t_start = time.perf_counter_ns()
+        await coord.handle_raw_adv(record.adapter_id, record.orig, record.raw)
+        latencies.append(time.perf_counter_ns() - t_start)
+    total = time.perf_counter() - start
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    return {
+        "records": len(records),
+        "duration_s": total,
+        "throughput": len(records) / total if total > 0 else 0.0,
+        "p50_us": quantiles[49] / 1000.0,
+        "p99_us": quantiles[98] / 1000.0,
+        "outcomes": dict(outcomes),
+        "commands": sum(x.nb_commands for x in devices),
+    }
+
+
+async def memory_growth(base: BleAdvCoordinator, pop: Population, records: list[BleAdvCaptureRecord]) -> dict[str, int]:
+    """Measure the memory growth of a replay coordinator along the replay."""
+    tracemalloc.start()
+    coord, _ = _setup(base, pop)
+    before, _ = tracemalloc.get_traced_memory()
+    await coord.replay(records)
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"growth": after - before, "peak": peak - before, "raw_advs": len(coord._raw_last_advs), "dec_advs": len(coord._dec_last_advs)}
+
+
+async def async_main(args: argparse.Namespace) -> None:
+    """Run the benchmark."""
+    rnd = random.Random(args.seed)
+    pop = build_population(args.devices, args.codecs, args.adapters, rnd)
+    if args.capture is not None:
+        records = list(read_capture(args.capture))
+    else:
+        records = synthetic_stream(pop, args.duration, args.rate, args.repeats, args.noise_rate, rnd)
+    if args.write_capture is not None:
+        write_capture(args.write_capture, records)
+        size = args.write_capture.stat().st_size
+        print(f"{len(records)} records written in {args.write_capture}: {size} bytes, {size / max(len(records), 1):.1f} bytes / record")
+        return
+    base = BleAdvCoordinator(HomeAssistant(tempfile.gettempdir()), get_codecs(), [], 2000, [], [])
+    res = await replay(base, pop, records, args.speed)
+    mem = await memory_growth(base, pop, records)
+    nb_rec = max(res["records"], 1)
+    print(f"{len(pop.devices)} devices over {len(pop.adapter_ids)} adapters, {res['records']} records, {res['commands']} commands published")
+    print(f"  throughput : {res['throughput']:10.0f} adv/s (replay wall time {res['duration_s']:.2f}s)")
+    print(f"  latency    : p50 {res['p50_us']:8.1f} us, p99 {res['p99_us']:8.1f} us")
+    for outcome, nb in sorted(res["outcomes"].items()):
+        print(f"  {outcome:14s}: {nb:8d} ({100.0 * nb / nb_rec:5.1f}%)")
+    print(f"  memory     : growth {mem['growth'] / 1024:8.1f} KiB, peak {mem['peak'] / 1024:8.1f} KiB")
+    print(f"  dedup maps : {mem['raw_advs']} raw advs, {mem['dec_advs']} decoded advs")
+
+
+def main() -> None:
+    """Parse the arguments and run the benchmark."""
+    parser = argparse.ArgumentParser(description="Coordinator replay benchmark")
+    parser.add_argument("--devices", type=int, default=100, help="Number of devices")
+    parser.add_argument("--codecs", type=int, default=10, help="Number of codecs used by the devices")
+    parser.add_argument("--adapters", type=int, default=2, help="Number of adapters")
+    parser.add_argument("--duration", type=float, default=600.0, help="Duration of the synthetic stream in seconds")
+    parser.add_argument("--rate", type=float, default=2.0, help="Commands per second in the synthetic stream")
+    parser.add_argument("--repeats", type=int, default=6, help="Receptions of each advertisement per adapter")
+    parser.add_argument("--noise-rate", type=float, default=50.0, help="Ambient advertisements per second")
+    parser.add_argument("--speed", type=float, default=0.0, help="Replay speed factor, 0 for as fast as possible")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the population and synthetic stream")
+    parser.add_argument("--capture", type=Path, help="Replay this capture file instead of a synthetic stream")
+    parser.add_argument("--write-capture", type=Path, help="Write the stream to this capture file instead of replaying it")
+    asyncio.run(async_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
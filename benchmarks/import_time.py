@@ -0,0 +1,52 @@
+"""Startup benchmark of the codec registry: import time and memory of a single family vs all the families.
+
+Each scenario runs in a fresh interpreter so that the module imports are really measured.
+"""
+
+# ruff: noqa: T201
+import json
+import subprocess
+import sys
+
+NB_RUNS = 5
+
+_SCENARIO = """
+import json, time, tracemalloc
+tracemalloc.start()
+start = time.perf_counter()
+from ble_adv.codecs import get_codecs
+registry = get_codecs()
+{action}
+duration = time.perf_counter() - start
+size, _ = tracemalloc.get_traced_memory()
+print(json.dumps({{"duration": duration, "size": size}}))
+"""
+
+SCENARIOS = {
+    "registry only": "",
+    "single family": "registry['zhijia_v2']",
+    "all families": "registry.warm_all()",
+}
+
+
+def _run(action: str) -> tuple[float, int]:
+    durations = []
+    size = 0
+    for _ in range(NB_RUNS):
+        res = subprocess.run([sys.executable, "-c", _SCENARIO.format(action=action)], capture_output=True, check=True, text=True)  # noqa: S603
+        data = json.loads(res.stdout.splitlines()[-1])
+        durations.append(data["duration"])
+        size = data["size"]
+    return min(durations), size
+
+
+def main() -> None:
+    """Run the benchmark."""
+    print(f"Codec registry startup, best of {NB_RUNS} fresh interpreters:")
+    for name, action in SCENARIOS.items():
+        duration, size = _run(action)
+        print(f"  {name:14s}: {1000.0 * duration:8.1f} ms, {size / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Memory benchmark of the hot path models: 10k live receive items.
+
+Compares the slotted models to the historical dict backed ones.
+"""
+
+# ruff: noqa: T201
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from ble_adv.codecs.models import BleAdvConfig, BleAdvEncCmd
+from ble_adv.coordinator import BleAdvRecvItem
+
+NB_ITEMS = 10000
+
+
+@dataclass
+class RefEncCmd:
+    """Historical dict backed BleAdvEncCmd."""
+
+    cmd: int = 0
+    param: int = 0
+    arg0: int = 0
+    arg1: int = 0
+    arg2: int = 0
+    arg3: int = 0
+    arg4: int = 0
+
+    def __init__(self, cmd: int) -> None:
+        self.cmd = cmd
+
+
+@dataclass
+class RefConfig:
+    """Historical dict backed BleAdvConfig."""
+
+    tx_count: int = 0
+    app_restart_count: int = 1
+    seed: int = 0
+
+    def __init__(self, config_id: int = 0, index: int = 0, codec_params: list[Any] | None = None, translator_set: str | None = None) -> None:
+        self.id: int = config_id
+        self.index: int = index
+        self.codec_params: list[Any] = codec_params if codec_params is not None else []
+        self.translator_set: str | None = translator_set
+
+
+@dataclass
+class RefRecvItem:
+    """Historical dict backed BleAdvRecvItem."""
+
+    del_time: datetime
+    codec: Any
+    pub_devices: set[str]
+    conf: RefConfig
+    enc_cmd: RefEncCmd
+
+
+def _build(recv_cls: Callable, conf_cls: Callable, cmd_cls: Callable) -> list[Any]:
+    now = datetime.now()
+    items = []
+    for i in range(NB_ITEMS):
+        conf = conf_cls(i, i & 0x03)
+        conf.tx_count = i & 0x7F
+        conf.seed = i
+        enc_cmd = cmd_cls(i & 0xFF)
+        enc_cmd.param = 1
+        enc_cmd.arg0 = i & 0x0F
+        items.append(recv_cls(now, None, set(), conf, enc_cmd))
+    return items
+
+
+def _measure(recv_cls: Callable, conf_cls: Callable, cmd_cls: Callable) -> int:
+    tracemalloc.start()
+    items = _build(recv_cls, conf_cls, cmd_cls)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del items
+    return size
+
+
+def main() -> None:
+    """Run the benchmark."""
+    ref = _measure(RefRecvItem, RefConfig, RefEncCmd)
+    cur = _measure(BleAdvRecvItem, BleAdvConfig, BleAdvEncCmd)
+    print(f"{NB_ITEMS} live receive items (recv item + config + command):")
+    print(f"  {'dict backed':14s}: {ref / 1024:10.1f} KiB, {ref / NB_ITEMS:6.1f} bytes / item")
+    print(f"  {'slotted':14s}: {cur / 1024:10.1f} KiB, {cur / NB_ITEMS:6.1f} bytes / item")
+    print(f"  {'saving':14s}: {(ref - cur) / NB_ITEMS:6.1f} bytes / item ({100.0 * (ref - cur) / ref:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,32 @@
 "ble_adv package."
 
 import logging
+from pathlib import Path
 
 import voluptuous as vol
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_DEVICE, CONF_NAME
+from homeassistant.const import CONF_DEVICE, CONF_FILE_PATH, CONF_NAME
 from homeassistant.core import HomeAssistant, ServiceCall
 from homeassistant.helpers import config_validation as cv
 from homeassistant.helpers.selector import NumberSelector, NumberSelectorConfig
 from homeassistant.helpers.singleton import singleton
 from homeassistant.helpers.typing import ConfigType
 
-from .codecs import dyn_codec_params, get_codecs
+from .capture import BleAdvCaptureFile, BleAdvCaptureRing
+from .codecs import dyn_codec_params, get_codecs, set_keystream_cache_size
 from .codecs.models import BleAdvConfig
 from .const import (
     CONF_ADAPTER_ID,
     CONF_ADAPTER_IDS,
     CONF_APPLE_INC_UUIDS,
+    CONF_CAPTURE_BACKUPS,
+    CONF_CAPTURE_FILE,
+    CONF_CAPTURE_MAX_SIZE,
+    CONF_CAPTURE_RING_SIZE,
     CONF_CODEC_ID,
     CONF_CODEC_ID_OLD,
     CONF_COORDINATOR_ID,
+    CONF_DEBOUNCE,
     CONF_DEVICE_QUEUE,
     CONF_DURATION,
     CONF_FANS,
@@ -31,6 +38,7 @@ from .const import (
     CONF_IGN_MACS,
     CONF_INDEX,
     CONF_INTERVAL,
+    CONF_KEYSTREAM_CACHE_SIZE,
     CONF_LAST_VERSION,
     CONF_LIGHTS,
     CONF_MAX_ENTITY_NB,
@@ -45,10 +53,13 @@ from .const import (
     CONF_REPEATS,
     CONF_TECHNICAL,
     CONF_TRANS_SET,
+    CONF_TX_ADAPTERS,
+    CONF_TX_POLICY,
     CONF_USE_DIR,
     CONF_USE_OSC,
     DOMAIN,
     PLATFORMS,
+    TX_POLICY_ALL,
 )
 from .coordinator import BleAdvCoordinator
 from .device import BleAdvDevice
@@ -66,6 +77,8 @@ INJECT_RAW_SCHEMA = vol.Schema(
         vol.Optional(CONF_DURATION, default=800): NumberSelector(NumberSelectorConfig(min=100, max=2000)),
     }
 )
+EXPORT_CAPTURE_SERVICE_NAME = "export_capture"
+EXPORT_CAPTURE_SCHEMA = vol.Schema({vol.Required(CONF_FILE_PATH): str})
 
 CONFIG_SCHEMA = vol.Schema(
     {
@@ -75,6 +88,12 @@ CONFIG_SCHEMA = vol.Schema(
                 vol.Optional(CONF_IGN_DURATION): vol.All(vol.Coerce(int), vol.Range(min=0, max=60000)),
                 vol.Optional(CONF_IGN_CIDS): vol.All(cv.ensure_list, [vol.All(vol.Coerce(int), vol.Range(min=0, max=0xFFFF))]),
                 vol.Optional(CONF_IGN_MACS): vol.All(cv.ensure_list, [cv.string]),
+                vol.Optional(CONF_KEYSTREAM_CACHE_SIZE): vol.All(vol.Coerce(int), vol.Range(min=0, max=0x10000)),
+                vol.Optional(CONF_CAPTURE_FILE): cv.string,
+                vol.Optional(CONF_CAPTURE_MAX_SIZE): vol.All(vol.Coerce(int), vol.Range(min=0x1000)),
+                vol.Optional(CONF_CAPTURE_BACKUPS): vol.All(vol.Coerce(int), vol.Range(min=0, max=20)),
+                vol.Optional(CONF_CAPTURE_RING_SIZE): vol.All(vol.Coerce(int), vol.Range(min=0x1000, max=0x1000000)),
+                vol.Optional(CONF_DEBOUNCE): vol.All(vol.Coerce(int), vol.Range(min=0, max=5000)),
             }
         )
     },
@@ -86,6 +105,8 @@ CONFIG_SCHEMA = vol.Schema(
 async def get_coordinator(hass: HomeAssistant) -> BleAdvCoordinator:
     """Get and initiate a coordinator."""
     conf = hass.data.get(DOMAIN, {}).pop(CONF_COORDINATOR_ID, {})
+    if (keystream_cache_size := conf.get(CONF_KEYSTREAM_CACHE_SIZE)) is not None:
+        await hass.async_add_executor_job(set_keystream_cache_size, keystream_cache_size)
     coordinator = BleAdvCoordinator(
         hass,
         get_codecs(),
@@ -94,6 +115,13 @@ async def get_coordinator(hass: HomeAssistant) -> BleAdvCoordinator:
         conf.get(CONF_IGN_CIDS, [*CONF_GOOGLE_LCC_UUIDS, *CONF_APPLE_INC_UUIDS]),
         conf.get(CONF_IGN_MACS, []),
     )
+    coordinator.debounce = conf.get(CONF_DEBOUNCE, 0)
+    if (capture_file := conf.get(CONF_CAPTURE_FILE)) is not None:
+        path = Path(hass.config.path(capture_file))
+        max_size, backups = conf.get(CONF_CAPTURE_MAX_SIZE, 0x400000), conf.get(CONF_CAPTURE_BACKUPS, 2)
+        coordinator.recorder = await hass.async_add_executor_job(BleAdvCaptureFile, path, max_size, backups)
+    elif (capture_ring_size := conf.get(CONF_CAPTURE_RING_SIZE)) is not None:
+        coordinator.recorder = BleAdvCaptureRing(capture_ring_size)
     await coordinator.async_init()
     return coordinator
 
@@ -112,6 +140,13 @@ async def async_setup(hass: HomeAssistant, conf: ConfigType) -> bool:
             raise vol.Invalid(msg)
 
     hass.services.async_register(DOMAIN, INJECT_RAW_SERVICE_NAME, inject_raw, INJECT_RAW_SCHEMA)
+
+    async def export_capture(call: ServiceCall) -> None:
+        if errors := await coord.export_capture(Path(hass.config.path(call.data[CONF_FILE_PATH]))):
+            msg = "/".join([f"Invalid {field} - {reason}" for field, reason in errors.items()])
+            raise vol.Invalid(msg)
+
+    hass.services.async_register(DOMAIN, EXPORT_CAPTURE_SERVICE_NAME, export_capture, EXPORT_CAPTURE_SCHEMA)
     return True
 
 
@@ -194,6 +229,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     device_conf = entry.data[CONF_DEVICE]
     tech_conf = entry.data[CONF_TECHNICAL]
     coordinator = await get_coordinator(hass)
+    codec_ids = [device_conf[CONF_CODEC_ID], *([entry.data[CONF_REMOTE][CONF_CODEC_ID]] if CONF_CODEC_ID in entry.data.get(CONF_REMOTE, {}) else [])]
+    await hass.async_add_executor_job(coordinator.codecs.warm, codec_ids)
     device = BleAdvDevice(
         hass,
         entry.unique_id,
@@ -206,6 +243,8 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         BleAdvConfig(device_conf[CONF_FORCED_ID], device_conf[CONF_INDEX], device_conf.get(CONF_PARAMS), tech_conf.get(CONF_TRANS_SET)),
         coordinator,
     )
+    device.tx_policy = tech_conf.get(CONF_TX_POLICY, TX_POLICY_ALL)
+    device.tx_adapters = int(tech_conf.get(CONF_TX_ADAPTERS, device.tx_adapters))
     if CONF_REMOTE in entry.data and CONF_CODEC_ID in entry.data[CONF_REMOTE]:
         rconf = entry.data[CONF_REMOTE]
         device.add_listener(
@@ -227,5 +266,7 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
         coordinator = await get_coordinator(hass)
-        coordinator.remove_device(hass.data[DOMAIN].pop(entry.entry_id))
+        device: BleAdvDevice = hass.data[DOMAIN].pop(entry.entry_id)
+        await device.async_final()
+        coordinator.remove_device(device)
     return unload_ok
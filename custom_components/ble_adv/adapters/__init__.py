@@ -2,15 +2,18 @@
 
 import asyncio
 import contextlib
+import heapq
 import logging
 import socket
 import struct
 from abc import ABC, abstractmethod
+from bisect import bisect_left
 from collections import deque
-from collections.abc import Awaitable, Callable, Coroutine, MutableMapping
-from dataclasses import dataclass
+from collections.abc import Awaitable, Callable, Coroutine, Hashable, MutableMapping
+from dataclasses import dataclass, field
 from datetime import datetime
-from math import floor
+from functools import partial
+from math import ceil, floor
 from typing import Any, Self
 
 from btsocket.btmgmt_protocol import reader as btmgmt_reader
@@ -24,7 +27,7 @@ class AdapterError(Exception):
     """Adapter Exception."""
 
 
-@dataclass
+@dataclass(slots=True)
 class BleAdvAdapterAdvItem:
     """Item to be used for Adapter Advertising."""
 
@@ -37,18 +40,66 @@ class BleAdvAdapterAdvItem:
         return f"duration: {self.interval}ms, repeat: {self.repeat}, {self.data.hex().upper()}"
 
 
+# Priority classes of the queue items, the lower the first served
+PRIO_COMMAND = 0  # on / off and device commands
+PRIO_REFRESH = 1  # refresh of the state, following a command received from a remote
+PRIO_ADJUST = 2  # continuous adjustments: brightness, color temperature, rgb, speed
+NB_PRIOS = 3
+
+
 class BleAdvQueueItem:
     """MultiQueue Item."""
 
-    def __init__(self, key: int | None, repeat: int, delay_after: int, interval: int, data: list[bytes], ign_duration: int) -> None:
+    __slots__ = (
+        "_adv_items",
+        "_interval",
+        "_repeat",
+        "completion",
+        "data",
+        "delay_after",
+        "enqueued_at",
+        "entity",
+        "failed",
+        "ign_duration",
+        "key",
+        "priority",
+    )
+
+    def __init__(
+        self,
+        key: int | None,
+        repeat: int,
+        delay_after: int,
+        interval: int,
+        data: list[bytes],
+        ign_duration: int,
+        priority: int = PRIO_COMMAND,
+        entity: Hashable | None = None,
+    ) -> None:
         """Init MultiQueue Item."""
         self.key: int | None = key
+        self.priority: int = priority
+        self.entity: Hashable | None = entity  # entity changed by the item, if any
         self.delay_after: int = delay_after
         self.data: list[bytes] = data
         self.ign_duration = ign_duration
         self._repeat: int = repeat if len(data) == 1 else 1
         self._interval: int = interval
         self._adv_items: list[BleAdvAdapterAdvItem] = []
+        self.completion: asyncio.Future[bool] | None = None
+        self.enqueued_at: float | None = None  # loop time of the enqueue, None once its advertising started
+        self.failed: bool = False  # True once the advertising of one of its advs failed
+
+    def complete(self, *, transmitted: bool) -> None:
+        """Resolve the completion future: True if fully transmitted, False if superseded or dropped."""
+        if self.completion is not None and not self.completion.done():
+            self.completion.set_result(transmitted)
+
+    def supersedes(self, other: Self) -> bool:
+        """Return True if this item supersedes the other item of its queue: same key, or same entity in a lower priority class."""
+        if self.key is not None and other.key == self.key:
+            return True
+        return self.entity is not None and other.entity == self.entity and other.priority > self.priority
 
     def split_repeat(self, adapter_bunch_time: int) -> None:
         """Split the initial repeat based on adapter capacity."""
@@ -77,6 +128,77 @@ class BleAdvQueueItem:
         return (self.key == comp.key) and (self.data == comp.data)
 
 
+class BleAdvHistogram:
+    """Histogram of durations, by buckets of upper bounds BOUNDS_MS, and an overflow bucket."""
+
+    BOUNDS_MS: tuple[int, ...] = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    __slots__ = ("buckets", "count", "total")
+
+    def __init__(self) -> None:
+        self.count: int = 0
+        self.total: float = 0.0
+        self.buckets: list[int] = [0] * (len(self.BOUNDS_MS) + 1)
+
+    def record(self, duration: float) -> None:
+        """Record a duration in s."""
+        self.count += 1
+        self.total += duration
+        self.buckets[bisect_left(self.BOUNDS_MS, 1000.0 * duration)] += 1
+
+    def percentile(self, ratio: float) -> int | None:
+        """Upper bound in ms of the bucket reaching ratio of the recorded durations, None if empty or in the overflow bucket."""
+        rank = ratio * self.count
+        cumul = 0
+        for bound, nb in zip(self.BOUNDS_MS, self.buckets, strict=False):
+            cumul += nb
+            if cumul and cumul >= rank:
+                return bound
+        return None
+
+    def _labels(self) -> list[str]:
+        return [*(f"<={bound}ms" for bound in self.BOUNDS_MS), f">{self.BOUNDS_MS[-1]}ms"]
+
+    def diagnostic_dump(self) -> dict[str, Any]:
+        """Diagnostic dump."""
+        return {
+            "count": self.count,
+            "mean_ms": round(1000.0 * self.total / self.count, 1) if self.count else None,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "buckets": {label: nb for label, nb in zip(self._labels(), self.buckets, strict=True) if nb},
+        }
+
+
+@dataclass(slots=True)
+class BleAdvAdapterStats:
+    """Performance counters and histograms of an adapter, kept by its manager across the reconnections."""
+
+    enqueued: int = 0
+    advertised: int = 0
+    superseded: int = 0
+    dropped: int = 0
+    errors: int = 0
+    connections: int = 0
+    cmd_rtt: BleAdvHistogram = field(default_factory=BleAdvHistogram)  # HCI / MGMT command round trip
+    queue_wait: BleAdvHistogram = field(default_factory=BleAdvHistogram)  # from enqueue to the start of the advertising
+    on_air: BleAdvHistogram = field(default_factory=BleAdvHistogram)  # advertising of a msg
+
+    def diagnostic_dump(self) -> dict[str, Any]:
+        """Diagnostic dump."""
+        return {
+            "enqueued": self.enqueued,
+            "advertised": self.advertised,
+            "superseded": self.superseded,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "reconnects": max(0, self.connections - 1),
+            "cmd_rtt": self.cmd_rtt.diagnostic_dump(),
+            "queue_wait": self.queue_wait.diagnostic_dump(),
+            "on_air": self.on_air.diagnostic_dump(),
+        }
+
+
 type AdvRecvCallback = Callable[[str, str, bytes], Awaitable[None]]
 type AdapterErrorCallback = SocketErrorCallback
 type MgmtSendCallback = Callable[[int, int, bytes], Coroutine]
@@ -88,9 +210,24 @@ class _AdapterLoggingAdapter(logging.LoggerAdapter):
 
 
 class BleAdvAdapter(ABC):
-    """Base BLE ADV Adapter including multi Advertising sequencing queues."""
+    """Base BLE ADV Adapter including multi Advertising sequencing queues.
+
+    Each of the nb_adv_sets advertising sets of the adapter is fed by its own dequeue task: the sets advertise
+    concurrently, each one picking the next available queue round robin, a queue being advertised by one set at a time.
+
+    Scheduling does not depend on the number of queues: a queue is either idle (empty), ready (in the round robin deque
+    of ready queues of its priority class), busy (being advertised by a set) or locked for its delay_after
+    (in a heap by unlock time, with a single timer for the next unlock).
+
+    The ready queues of the highest priority class are served first, unless the oldest ready queue has been waiting for
+    more than MAX_PRIO_WAIT: it is then served whatever its class, so that lower classes are never starved.
+    The items of a queue are advertised in order, the queue taking the highest class of its items. An item only preempts
+    the items of its queue of a lower class changing the same entity: they are dropped.
+    """
 
     MAX_ADV_WAIT: float = 3.0
+    MAX_PRIO_WAIT: float = 1.0
+    TX_LATENCY_WEIGHT: float = 0.2  # weight of the last advertising duration in the recent transmit latency
 
     def __init__(
         self,
@@ -106,15 +243,24 @@ class BleAdvAdapter(ABC):
         self._on_error: AdapterErrorCallback = on_error
         self._qlen: int = 0
         self._queues_index: dict[str, int] = {}
-        self._queues: list[list[BleAdvQueueItem]] = []
-        self._locked_tasks: list[asyncio.Task | None] = []
+        self._queues: list[deque[BleAdvQueueItem]] = []
+        self._ready: list[deque[tuple[float, int]]] = [deque() for _ in range(NB_PRIOS)]
+        self._locked: list[tuple[float, int]] = []
+        self._locked_queues: set[int] = set()
+        self._unlock_timer: asyncio.TimerHandle | None = None
         self._add_event: asyncio.Event = asyncio.Event()
-        self._cur_ind: int = -1
+        self._nb_items: int = 0
+        self._idle_event: asyncio.Event = asyncio.Event()
+        self._idle_event.set()
         self._lock: asyncio.Lock = asyncio.Lock()
         self._processing: bool = False
-        self._dequeue_task: asyncio.Task | None = None
+        self._dequeue_tasks: list[asyncio.Task] = []
         self._opened: bool = False
-        self._advertise_on_going: bool = False
+        self._busy_queues: set[int] = set()
+        self._active_sets: set[int] = set()
+        self.nb_adv_sets: int = 1
+        self.tx_latency: float = 0.0  # recent duration of the advertising of a msg, in s
+        self.stats: BleAdvAdapterStats = BleAdvAdapterStats()
         self.logger = _AdapterLoggingAdapter(_LOGGER, {"name": self.name})
         self._diags: deque[str] = deque(maxlen=30)
 
@@ -130,13 +276,16 @@ class BleAdvAdapter(ABC):
 
     def diagnostic_dump(self) -> dict[str, Any]:
         """Diagnostic dump."""
-        dequeueing = self._dequeue_task is not None and not self._dequeue_task.done() and self._processing
+        dequeueing = any(not task.done() for task in self._dequeue_tasks) and self._processing
         return {
             "type": type(self).__name__,
             "mac": self.mac,
             "available": self.available,
             "queue": self._qlen,
+            "adv_sets": self.nb_adv_sets,
+            "tx_latency": round(self.tx_latency, 3),
             "dequeueing": dequeueing,
+            "stats": self.stats.diagnostic_dump(),
             "logs": list(self._diags),
         }
 
@@ -144,23 +293,48 @@ class BleAdvAdapter(ABC):
         """Async Init."""
         await self.open()
         self._processing = True
-        self._dequeue_task = asyncio.create_task(self._dequeue())
+        self._dequeue_tasks = [asyncio.create_task(self._dequeue(adv_set)) for adv_set in range(self.nb_adv_sets)]
+
+    @property
+    def nb_queued(self) -> int:
+        """Number of items queued, not yet fully advertised."""
+        return self._nb_items
+
+    def tx_delay(self) -> float:
+        """Estimated delay before a new item is advertised, in s: the queued items and the new one advertised by the sets at the recent latency."""
+        return (self._nb_items + len(self._busy_queues) + 1) * self.tx_latency / self.nb_adv_sets
 
     async def drain(self) -> None:
-        """Wait for all queued messages to be processed."""
-        while any(len(queue) > 0 for queue in self._queues) or self._advertise_on_going or any(task is not None for task in self._locked_tasks):
-            await asyncio.sleep(0.1)
+        """Wait for all queued messages to be processed, and the queues unlocked."""
+        await self._idle_event.wait()
+
+    def _check_idle(self) -> None:
+        if not self._nb_items and not self._busy_queues and not self._active_sets and not self._locked:
+            self._idle_event.set()
 
     async def async_final(self) -> None:
         """Async Final: clean-up to be ready for another init."""
         async with self._lock:
             self._processing = False
             self._qlen = 0
-            self._cur_ind = -1
+            for queue in self._queues:
+                for qi in queue:
+                    qi.complete(transmitted=False)
+            self.stats.dropped += self._nb_items
+            self._nb_items = 0
             self._queues.clear()
             self._queues_index.clear()
-            self._locked_tasks.clear()
+            for ready in self._ready:
+                ready.clear()
+            self._locked.clear()
+            self._locked_queues.clear()
+            if self._unlock_timer is not None:
+                self._unlock_timer.cancel()
+                self._unlock_timer = None
+            self._busy_queues.clear()
+            self._active_sets.clear()
             self._add_event.set()
+            self._idle_event.set()
         self.close()
 
     @abstractmethod
@@ -172,65 +346,168 @@ class BleAdvAdapter(ABC):
         """Close the adapter."""
 
     @abstractmethod
-    async def _advertise(self, item: BleAdvAdapterAdvItem) -> None:
-        """Advertise the msg."""
+    async def _advertise(self, item: BleAdvAdapterAdvItem, adv_set: int = 0) -> None:
+        """Advertise the msg on the advertising set adv_set."""
 
-    async def enqueue(self, queue_id: str, item: BleAdvQueueItem) -> None:
-        """Enqueue an Adv in the queue_id."""
+    @abstractmethod
+    async def _advertise_idle(self, adv_set: int = 0) -> None:
+        """Stop the advertising set adv_set, no more msg to be advertised for now."""
+
+    async def _report_error(self, message: str) -> None:
+        """Count and report an adapter error."""
+        self.stats.errors += 1
+        await self._on_error(message)
+
+    async def enqueue(self, queue_id: str, item: BleAdvQueueItem) -> asyncio.Future[bool]:
+        """Enqueue an Adv in the queue_id.
+
+        Return the completion future of the item, resolved to True once all its advs are transmitted,
+        or to False if superseded by an item with the same key, preempted by an item of the same entity and a higher class, or dropped.
+        """
         item.split_repeat(self._bunch_adv_time)
         async with self._lock:
             tq_ind = self._queues_index.get(queue_id, None)
             if tq_ind is None:
-                self._queues_index[queue_id] = self._qlen
-                self._queues.append([item])
-                self._locked_tasks.append(None)
+                tq_ind = self._queues_index[queue_id] = self._qlen
+                self._queues.append(deque())
                 self._qlen += 1
-            else:
-                if item.key is not None:
-                    self._queues[tq_ind] = [x for x in self._queues[tq_ind] if x.key != item.key]
-                self._queues[tq_ind].append(item)
-            self._add_event.set()
-
-    async def _unlock_queue(self, qind: int, delay: int) -> None:
-        await asyncio.sleep(delay / 1000.0)
-        self._locked_tasks[qind] = None
+            tq = self._queues[tq_ind]
+            was_idle = not tq and tq_ind not in self._busy_queues and tq_ind not in self._locked_queues
+            prev_prio = self._queue_prio(tq) if tq else item.priority
+            if superseded := [x for x in tq if item.supersedes(x)]:
+                for old_item in superseded:
+                    old_item.complete(transmitted=False)
+                tq = self._queues[tq_ind] = deque(x for x in tq if not item.supersedes(x))
+                self._nb_items -= len(superseded)
+                self.stats.superseded += len(superseded)
+            item.completion = asyncio.get_running_loop().create_future()
+            item.enqueued_at = asyncio.get_running_loop().time()
+            tq.append(item)
+            self._nb_items += 1
+            self.stats.enqueued += 1
+            self._idle_event.clear()
+            if was_idle:
+                self._set_ready(tq_ind)
+            elif (prio := self._queue_prio(tq)) != prev_prio:
+                self._move_ready(tq_ind, prev_prio, prio)
+            return item.completion
+
+    @staticmethod
+    def _queue_prio(tq: deque[BleAdvQueueItem]) -> int:
+        """Priority class of a queue: the highest class of its items, still advertised in order."""
+        return min(x.priority for x in tq)
+
+    def _set_ready(self, qind: int) -> None:
+        self._ready[self._queue_prio(self._queues[qind])].append((asyncio.get_running_loop().time(), qind))
         self._add_event.set()
 
-    async def _lock_queue_for(self, qind: int, delay: int) -> None:
-        if not delay:
-            return
-        self._locked_tasks[qind] = asyncio.create_task(self._unlock_queue(qind, delay))
-
-    async def _dequeue(self) -> None:
+    def _move_ready(self, qind: int, prev_prio: int, prio: int) -> None:
+        """Move a ready queue to the ready queues of its new priority class, keeping its ready time."""
+        for entry in self._ready[prev_prio]:
+            if entry[1] == qind:
+                self._ready[prev_prio].remove(entry)
+                self._ready[prio].append(entry)
+                return
+
+    def _pop_ready(self) -> int:
+        """Pop the next ready queue: the first of the highest class, or the oldest one if waiting for more than MAX_PRIO_WAIT."""
+        readies = [x for x in self._ready if x]
+        oldest = min(readies, key=lambda x: x[0][0])
+        if oldest[0][0] < asyncio.get_running_loop().time() - self.MAX_PRIO_WAIT:
+            return oldest.popleft()[1]
+        return readies[0].popleft()[1]
+
+    def _lock_queue_for(self, qind: int, delay: int) -> None:
+        """Lock the queue for delay ms, or set it ready again if not empty."""
+        if delay:
+            self._locked_queues.add(qind)
+            unlock_time = asyncio.get_running_loop().time() + delay / 1000.0
+            heapq.heappush(self._locked, (unlock_time, qind))
+            if self._locked[0][1] == qind:
+                self._schedule_unlock()
+        elif self._queues[qind]:
+            self._set_ready(qind)
+
+    def _schedule_unlock(self) -> None:
+        """(Re)Schedule the single unlock timer at the next unlock time."""
+        if self._unlock_timer is not None:
+            self._unlock_timer.cancel()
+        self._unlock_timer = asyncio.get_running_loop().call_at(self._locked[0][0], self._unlock_queues) if self._locked else None
+
+    def _unlock_queues(self) -> None:
+        now = asyncio.get_running_loop().time()
+        while self._locked and self._locked[0][0] <= now:
+            _, qind = heapq.heappop(self._locked)
+            self._locked_queues.discard(qind)
+            if self._queues[qind]:
+                self._set_ready(qind)
+        self._unlock_timer = None
+        self._schedule_unlock()
+        self._check_idle()
+
+    async def _dequeue(self, adv_set: int) -> None:
         while self._processing:
             try:
                 item: BleAdvAdapterAdvItem | None = None
+                qi: BleAdvQueueItem | None = None
+                done_qi: BleAdvQueueItem | None = None
+                qind = -1
                 lock_delay = 0
-                self._advertise_on_going = False
                 await self._add_event.wait()
                 async with self._lock:
-                    for _ in range(self._qlen):
-                        self._cur_ind = (self._cur_ind + 1) % self._qlen
-                        if self._locked_tasks[self._cur_ind] is not None:
-                            continue
-                        tq = self._queues[self._cur_ind]
-                        if len(tq) > 0:
-                            self._advertise_on_going = True
-                            qi = tq[0]
-                            item = qi.get_next()
-                            if not qi.has_next():
-                                tq.pop(0)
-                                lock_delay = qi.delay_after
-                            break
-                    self._add_event.clear()
+                    if any(self._ready):
+                        qind = self._pop_ready()
+                        self._busy_queues.add(qind)
+                        tq = self._queues[qind]
+                        qi = tq[0]
+                        if qi.enqueued_at is not None:
+                            self.stats.queue_wait.record(asyncio.get_running_loop().time() - qi.enqueued_at)
+                            qi.enqueued_at = None
+                        item = qi.get_next()
+                        if not qi.has_next():
+                            done_qi = tq.popleft()
+                            self._nb_items -= 1
+                            lock_delay = qi.delay_after
+                    else:
+                        # nothing ready: cleared, set again by the next enqueue or queue unlock, or the end of an advertising
+                        self._add_event.clear()
+                if item is None and adv_set in self._active_sets:
+                    try:
+                        await asyncio.wait_for(self._advertise_idle(adv_set), self.MAX_ADV_WAIT)
+                    finally:
+                        self._active_sets.discard(adv_set)
+                        self._check_idle()
                 if item is not None:
-                    self._add_diag(f"Advertising - {item}")
-                    await asyncio.wait_for(self._advertise(item), self.MAX_ADV_WAIT)
-                    await self._lock_queue_for(self._cur_ind, lock_delay)
-                    self._add_event.set()
+                    self._active_sets.add(adv_set)
+                    self._add_diag(f"Advertising on set {adv_set} - {item}")
+                    start = asyncio.get_running_loop().time()
+                    try:
+                        await asyncio.wait_for(self._advertise(item, adv_set), self.MAX_ADV_WAIT)
+                        latency = asyncio.get_running_loop().time() - start
+                        self.tx_latency = latency if not self.tx_latency else self.tx_latency + self.TX_LATENCY_WEIGHT * (latency - self.tx_latency)
+                        self.stats.on_air.record(latency)
+                    except BaseException:
+                        if qi is not None:
+                            qi.failed = True
+                        if done_qi is not None:
+                            done_qi.complete(transmitted=False)
+                            self.stats.dropped += 1
+                        raise
+                    finally:
+                        if qind in self._busy_queues:
+                            self._busy_queues.discard(qind)
+                            self._lock_queue_for(qind, lock_delay)
+                    if done_qi is not None:
+                        # a single failed adv fails the whole item: a partial multi advs command is not transmitted
+                        done_qi.complete(transmitted=not done_qi.failed)
+                        if done_qi.failed:
+                            self.stats.dropped += 1
+                        else:
+                            self.stats.advertised += 1
+                    self._add_event.set()  # check for the next item, or idle
             except Exception:
                 self.logger.exception("Exception in dequeue")
-                await self._on_error("Exception in Adapter Dequeue")
+                await self._report_error("Exception in Adapter Dequeue")
 
 
 SOCK_AF_BLUETOOTH = socket.AF_BLUETOOTH if hasattr(socket, "AF_BLUETOOTH") else 31  # type: ignore[none]
@@ -239,23 +516,51 @@ SOCK_HCI_FILTER = socket.HCI_FILTER if hasattr(socket, "HCI_FILTER") else 2  # t
 SOCK_SOL_HCI = socket.SOL_HCI if hasattr(socket, "SOL_HCI") else 0  # type: ignore[none]
 
 
+@dataclass(slots=True)
+class _AdvSetState:
+    """Controller side state of an advertising set, None when unknown."""
+
+    interval: int | None = None
+    data: bytes | None = None
+    enabled: bool | None = None
+
+
 class BluetoothHCIAdapter(BleAdvAdapter):
-    """BLE ADV direct HCI Adapter."""
+    """BLE ADV direct HCI Adapter.
+
+    The state of the advertising sets is cached so that only the commands changing it are sent: consecutive msgs
+    only swap the data while advertising stays enabled, and the set is only disabled when its queues are idle.
+
+    With extended advertising, the controller times the advertising: the set is enabled for Max_Extended_Advertising_Events
+    and the msg is completed on the LE Advertising Set Terminated event. If the controller does not send this event within
+    TERMINATED_RTO after the expected end, the adapter falls back to the advertising timed by the host.
+    """
 
     CMD_RTO: float = 1.0
     ADV_INST: int = 1
+    MAX_ADV_SETS: int = 4  # max number of extended advertising sets used concurrently, from handle ADV_INST
+    TERMINATED_RTO: float = 0.5
+    # MGMT advertising: the kernel rotates the instances of a legacy controller by slots of seconds, so a single instance
+    # by default. The advertising is timed by the host: the kernel only removes by itself an instance left behind,
+    # MGMT_ADV_TIMEOUT seconds after the advertising time of its msg, rounded up to the second.
+    MAX_MGMT_ADV_INSTANCES: int = 1
+    MGMT_ADV_TIMEOUT: int = 1
     FAKE_ADV: bytes = bytearray([0x1D, 0xFF, 0xFF, 0xFF] + [0x00] * 27)
 
     HCI_SUCCESS = 0x00
     HCI_DISALLOWED = 0x0C
+    MGMT_SUCCESS = 0x00
+    MGMT_UNKNOWN_COMMAND = 0x01
     HCI_COMMAND_PKT = 0x01
     HCI_EVENT_PKT = 0x04
 
     EVT_CMD_COMPLETE = 0x0E
+    EVT_CMD_STATUS = 0x0F
     EVT_LE_META_EVENT = 0x3E
 
     EVT_LE_ADVERTISING_REPORT = 0x02
     EVT_LE_EXTENDED_ADVERTISING_REPORT = 0x0D
+    EVT_LE_ADVERTISING_SET_TERMINATED = 0x12
 
     OGF_LE_CTL = 0x08
     OCF_LE_READ_LOCAL_SUPPORTED_FEATURES = 0x03
@@ -267,12 +572,13 @@ class BluetoothHCIAdapter(BleAdvAdapter):
     OCF_LE_SET_EXT_ADVERTISING_PARAMETERS = 0x36
     OCF_LE_SET_EXT_ADVERTISING_DATA = 0x37
     OCF_LE_SET_EXT_ADVERTISE_ENABLE = 0x39
+    OCF_LE_READ_NUMBER_OF_SUPPORTED_ADV_SETS = 0x3B
     OCF_LE_SET_EXT_SCAN_PARAMETERS = 0x41
     OCF_LE_SET_EXT_SCAN_ENABLE = 0x42
     ADV_FILTER = struct.pack(
         "<LLLHxx",
         1 << HCI_EVENT_PKT,
-        1 << EVT_CMD_COMPLETE,
+        (1 << EVT_CMD_COMPLETE) | (1 << EVT_CMD_STATUS),
         1 << (EVT_LE_META_EVENT - 0x20),
         0,
     )
@@ -292,16 +598,27 @@ class BluetoothHCIAdapter(BleAdvAdapter):
         self._mgmt_send: MgmtSendCallback = mgmt_send
         self._on_adv_recv: AdvRecvCallback = on_adv_recv
         self._async_socket: AsyncSocketBase = create_async_socket()
-        self._cmd_event: asyncio.Event = asyncio.Event()
-        self._on_going_cmd: int | None = None
+        self._pending_cmds: dict[int, asyncio.Future[tuple[int, bytes | None]]] = {}
+        self._cmd_credits: int = 1
+        self._credits_event: asyncio.Event = asyncio.Event()
         self._adv_lock: asyncio.Lock = asyncio.Lock()
         self._cmd_lock: asyncio.Lock = asyncio.Lock()
+        self._adv_states: dict[int | None, _AdvSetState] = {}
+        self._adv_terminated: dict[int, asyncio.Future[int]] = {}
         self._use_ext_adv = False
+        self._timed_ext_adv = True
         self._use_mgmt_adv = False
+        self._use_mgmt_ext_adv = True
 
     def diagnostic_dump(self) -> dict[str, Any]:
         """Diagnostic dump."""
-        return {**super().diagnostic_dump(), "extended_adv": self._use_ext_adv, "mgmt_adv": self._use_mgmt_adv}
+        return {
+            **super().diagnostic_dump(),
+            "extended_adv": self._use_ext_adv,
+            "timed_adv": self._use_ext_adv and self._timed_ext_adv,
+            "mgmt_adv": self._use_mgmt_adv,
+            "mgmt_ext_adv": self._use_mgmt_adv and self._use_mgmt_ext_adv,
+        }
 
     async def open(self) -> None:
         """Open the adapters. Can throw exception if invalid."""
@@ -310,7 +627,7 @@ class BluetoothHCIAdapter(BleAdvAdapter):
         fileno = await self._async_socket.async_init(
             self.name,
             self._recv,
-            self._on_error,
+            self._report_error,
             False,
             SOCK_AF_BLUETOOTH,
             socket.SOCK_RAW,
@@ -329,6 +646,14 @@ class BluetoothHCIAdapter(BleAdvAdapter):
             self._use_ext_adv = bool(features & (1 << 12))
             self._add_diag(f"Extended Adv Available: {self._use_ext_adv}")
 
+        self.nb_adv_sets = 1
+        if self._use_ext_adv:
+            # Get the number of advertising sets to advertise several queues concurrently
+            ret_code, data = await self._send_hci_cmd(self.OCF_LE_READ_NUMBER_OF_SUPPORTED_ADV_SETS)
+            if ret_code == self.HCI_SUCCESS and data:
+                self.nb_adv_sets = max(1, min(data[0], self.MAX_ADV_SETS))
+            self._add_diag(f"Extended Adv Sets used: {self.nb_adv_sets}")
+
         if not self._use_ext_adv:
             # Check if the HCI Raw advertising is possible or if we need to use mgmt:
             ret_enable = await self._set_advertise_enable(enabled=True)
@@ -336,6 +661,13 @@ class BluetoothHCIAdapter(BleAdvAdapter):
             self._use_mgmt_adv = (ret_enable == self.HCI_DISALLOWED) and (ret_disable == self.HCI_DISALLOWED)
             self._add_diag(f"Forced MGMT for ADV: {self._use_mgmt_adv}")
 
+        if self._use_mgmt_adv and self.MAX_MGMT_ADV_INSTANCES > 1:
+            # Read Advertising Features: Supported Flags, Max Adv / Scan Rsp Data Len, Max Instances, ...
+            ret_code, data = await self._send_mgmt_cmd(0x003D, b"")
+            if ret_code == 0 and len(data) > 6:
+                self.nb_adv_sets = max(1, min(data[6], self.MAX_MGMT_ADV_INSTANCES))
+            self._add_diag(f"MGMT Adv Instances used: {self.nb_adv_sets}")
+
         # Start Scan
         await self._start_scan()
 
@@ -343,6 +675,14 @@ class BluetoothHCIAdapter(BleAdvAdapter):
         """Close Adapter."""
         self._opened = False
         self._async_socket.close()
+        for fut in self._pending_cmds.values():
+            fut.cancel()
+        self._pending_cmds.clear()
+        self._cmd_credits = 1
+        self._adv_states.clear()
+        for fut in self._adv_terminated.values():
+            fut.cancel()
+        self._adv_terminated.clear()
 
     async def _recv(self, data: bytes) -> None:
         if data[0] != self.HCI_EVENT_PKT:
@@ -354,27 +694,74 @@ class BluetoothHCIAdapter(BleAdvAdapter):
             if data[3] == self.EVT_LE_EXTENDED_ADVERTISING_REPORT:
                 orig = ":".join([f"{x:02X}" for x in reversed(data[8:14])])
                 await self._on_adv_recv(self.name, orig, data[29 : 29 + data[28]])
-        elif (data[1] == self.EVT_CMD_COMPLETE) and (int.from_bytes(data[4:6], "little") == self._on_going_cmd):
-            self._ret_code = data[6]
-            self._ret_data = data[7:]
-            self._cmd_event.set()
-
-    async def _send_hci_cmd(self, cmd_type: int, cmd_data: bytes = bytearray(), *, log_on_error: bool = True) -> tuple[int, bytes | None]:
+            if data[3] == self.EVT_LE_ADVERTISING_SET_TERMINATED:
+                # Status, Advertising_Handle, Connection_Handle, Num_Completed_Extended_Advertising_Events
+                if (fut := self._adv_terminated.pop(data[5], None)) is not None and not fut.done():
+                    fut.set_result(data[4])
+        elif data[1] == self.EVT_CMD_COMPLETE:
+            # Num_HCI_Command_Packets, Opcode, Status, Return Parameters (no Status for the credit update opcode 0)
+            self._on_cmd_result(data[3], int.from_bytes(data[4:6], "little"), data[6] if len(data) > 6 else self.HCI_SUCCESS, data[7:])
+        elif data[1] == self.EVT_CMD_STATUS:
+            # Status, Num_HCI_Command_Packets, Opcode: the command is pending, or failed if status is not success
+            self._on_cmd_result(data[4], int.from_bytes(data[5:7], "little"), data[3], None)
+
+    def _on_cmd_result(self, nb_credits: int, op_code: int, ret_code: int, ret_data: bytes | None) -> None:
+        """Update the controller credits and complete the outstanding command, if any (op_code 0 is a credit update only)."""
+        self._cmd_credits = nb_credits
+        if nb_credits > 0:
+            self._credits_event.set()
+        if (fut := self._pending_cmds.pop(op_code, None)) is not None and not fut.done():
+            fut.set_result((ret_code, ret_data))
+
+    async def _submit_hci_cmd(self, cmd_type: int, cmd_data: bytes = bytearray()) -> tuple[int, asyncio.Future[tuple[int, bytes | None]]]:
+        """Send a command as soon as the controller accepts it, without waiting for its result.
+
+        The commands are sent in submission order, within the Num_HCI_Command_Packets credits of the controller.
+        A single command per opcode is outstanding as the results are only identified by their opcode.
+        Return the opcode and the future of the (return code, return data) of the command.
+        """
         if not self._opened:
             raise AdapterError("Adapter not available")
         data_len = len(cmd_data)
         op_code = cmd_type + (self.OGF_LE_CTL << 10)  # OCF on 10 bits, OGF on 6 bits
         cmd = struct.pack(f"<BHB{data_len}B", self.HCI_COMMAND_PKT, op_code, data_len, *cmd_data)
         async with self._cmd_lock:
-            self._cmd_event.clear()
-            self._on_going_cmd = op_code
-            self._ret_code = 0
-            self._ret_data = None
+            if (prev := self._pending_cmds.get(op_code)) is not None:
+                await asyncio.wait([prev], timeout=self.CMD_RTO)
+            while self._cmd_credits <= 0:
+                self._credits_event.clear()
+                await asyncio.wait_for(self._credits_event.wait(), self.CMD_RTO)
+            self._cmd_credits -= 1
+            fut: asyncio.Future[tuple[int, bytes | None]] = asyncio.get_running_loop().create_future()
+            self._pending_cmds[op_code] = fut
             await self._async_socket.async_sendall(cmd)
-            await asyncio.wait_for(self._cmd_event.wait(), self.CMD_RTO)
-            if self._ret_code != self.HCI_SUCCESS and log_on_error:
-                self._add_diag(f"HCI command {hex(op_code).upper()} failed with return code {hex(self._ret_code).upper()}")
-            return self._ret_code, self._ret_data
+        sent = asyncio.get_running_loop().time()
+        fut.add_done_callback(lambda x: None if x.cancelled() else self.stats.cmd_rtt.record(asyncio.get_running_loop().time() - sent))
+        return op_code, fut
+
+    async def _wait_hci_cmd(
+        self, op_code: int, fut: asyncio.Future[tuple[int, bytes | None]], *, log_on_error: bool = True
+    ) -> tuple[int, bytes | None]:
+        """Wait for the result of a submitted command."""
+        try:
+            ret_code, ret_data = await asyncio.wait_for(fut, self.CMD_RTO)
+        except TimeoutError:
+            if self._pending_cmds.get(op_code) is fut:
+                del self._pending_cmds[op_code]
+            self._cmd_credits = max(self._cmd_credits, 1)  # result lost: give back the credit
+            raise
+        if ret_code != self.HCI_SUCCESS and log_on_error:
+            self._add_diag(f"HCI command {hex(op_code).upper()} failed with return code {hex(ret_code).upper()}")
+        return ret_code, ret_data
+
+    async def _send_hci_cmd(self, cmd_type: int, cmd_data: bytes = bytearray(), *, log_on_error: bool = True) -> tuple[int, bytes | None]:
+        op_code, fut = await self._submit_hci_cmd(cmd_type, cmd_data)
+        return await self._wait_hci_cmd(op_code, fut, log_on_error=log_on_error)
+
+    async def _send_hci_cmds(self, cmds: list[tuple[int, bytes, bool]]) -> list[int]:
+        """Send several (cmd_type, cmd_data, log_on_error) commands in order, pipelined, and get their return codes."""
+        futs = [(*(await self._submit_hci_cmd(cmd_type, cmd_data)), log_on_error) for cmd_type, cmd_data, log_on_error in cmds]
+        return [(await self._wait_hci_cmd(op_code, fut, log_on_error=log_on_error))[0] for op_code, fut, log_on_error in futs]
 
     async def _set_scan_parameters(self, scan_type: int = 0x00, interval: int = 0x10, window: int = 0x10) -> None:
         cmd = bytearray([scan_type]) + interval.to_bytes(2, "little") + window.to_bytes(2, "little")
@@ -390,55 +777,120 @@ class BluetoothHCIAdapter(BleAdvAdapter):
         else:
             await self._send_hci_cmd(self.OCF_LE_SET_SCAN_ENABLE, bytearray([en_int, 0x00]))
 
-    async def _advertise(self, item: BleAdvAdapterAdvItem) -> None:
+    async def _advertise(self, item: BleAdvAdapterAdvItem, adv_set: int = 0) -> None:
         """Advertise the 'data' for the given interval."""
         # Patch the adv data to have full len 31
         patched_data = bytearray(item.data) + bytearray([0x00] * (31 - len(item.data)))
-        async with self._adv_lock:
-            min_adv = max(0x20, int(item.interval * 1.6))
-            duration = float(0.0009 * item.repeat * item.interval)
-            if self._use_ext_adv:
-                await self._hci_ext_advertise(min_adv, duration, patched_data)
-            elif self._use_mgmt_adv:
-                await self._mgmt_advertise(duration, patched_data)
+        min_adv = max(0x20, int(item.interval * 1.6))
+        duration = float(0.0009 * item.repeat * item.interval)
+        if self._use_ext_adv:
+            # one advertising handle per set, the sets advertise concurrently
+            handle = self.ADV_INST + adv_set
+            if self._timed_ext_adv:
+                await self._timed_ext_advertise(handle, min_adv, duration, patched_data, min(item.repeat, 0xFF))
             else:
-                await self._hci_advertise(min_adv, duration, patched_data)
+                await self._update_adv_set(handle, min_adv, patched_data, enabled=True)
+                await asyncio.sleep(duration)
+            return
+        if self._use_mgmt_adv:
+            # one instance per set
+            await self._mgmt_advertise(self.ADV_INST + adv_set, min_adv, duration, patched_data)
+            return
+        async with self._adv_lock:
+            await self._update_adv_set(None, min_adv, patched_data, enabled=True)
+            await asyncio.sleep(duration)
+
+    async def _advertise_idle(self, adv_set: int = 0) -> None:
+        """Disable the advertising set and set a fake adv, just in case it would be re enabled."""
+        if self._use_ext_adv:
+            await self._update_adv_set(self.ADV_INST + adv_set, None, self.FAKE_ADV, enabled=False)
+        elif self._use_mgmt_adv:
+            await self._send_mgmt_cmd(0x003F, bytes([self.ADV_INST + adv_set]))  # Remove Advertising
+        else:
+            async with self._adv_lock:
+                await self._update_adv_set(None, None, self.FAKE_ADV, enabled=False)
+
+    async def _timed_ext_advertise(self, handle: int, min_adv: int, duration: float, data: bytes, max_events: int) -> None:
+        """Advertise for max_events advertising events, the controller disabling the set by itself."""
+        terminated = asyncio.get_running_loop().create_future()
+        self._adv_terminated[handle] = terminated
+        try:
+            await self._update_adv_set(handle, min_adv, data, enabled=True, max_events=max_events)
+            if (state := self._adv_states.get(handle)) is None:
+                return  # failed command
+            done, _ = await asyncio.wait([terminated], timeout=duration + self.TERMINATED_RTO)
+        finally:
+            if self._adv_terminated.get(handle) is terminated:
+                del self._adv_terminated[handle]
+        if done:
+            state.enabled = False
+        else:
+            state.enabled = None  # disabled by the controller or not, the next msg enables the set again
+            self._timed_ext_adv = False
+            self._add_diag("No Advertising Set Terminated event, falling back to host timed advertising", logging.WARNING)
+
+    async def _update_adv_set(self, handle: int | None, min_adv: int | None, data: bytes, *, enabled: bool, max_events: int = 0) -> None:
+        """Send the commands changing the state of the advertising set, pipelined: handle None for legacy advertising, min_adv None to keep.
+
+        A non 0 max_events (extended advertising only) always (re)enables the set, for this number of advertising events.
+        """
+        state = self._adv_states.setdefault(handle, _AdvSetState())
+        if handle is None:
+            enable_cmd, params_cmd, data_cmd = self._advertise_enable_cmd, self._advertising_parameter_cmd, self._advertising_data_cmd
+        else:
+            enable_cmd = partial(self._ext_advertise_enable_cmd, handle)
+            params_cmd = partial(self._ext_advertising_parameter_cmd, handle)
+            data_cmd = partial(self._ext_advertising_data_cmd, handle)
+        new_params = min_adv is not None and min_adv != state.interval
+        cmds = []
+        # the parameters cannot be changed while enabled, the data can
+        if state.enabled is not False and (new_params or not enabled):
+            cmds.append(enable_cmd(enabled=False))
+        if new_params:
+            cmds.append(params_cmd(min_adv, min_adv))
+        if data != state.data:
+            cmds.append(data_cmd(data))
+        if enabled and (state.enabled is not True or new_params or max_events):
+            cmds.append(enable_cmd(max_events=max_events) if max_events else enable_cmd())
+        try:
+            ret_codes = await self._send_hci_cmds(cmds)
+        except BaseException:
+            self._adv_states.pop(handle, None)  # unknown state
+            raise
+        # a failing disable is not relevant: the set may not exist yet
+        if any(ret_code != self.HCI_SUCCESS and log_on_error for (_, _, log_on_error), ret_code in zip(cmds, ret_codes, strict=True)):
+            self._adv_states.pop(handle, None)
+            return
+        state.interval = min_adv if new_params else state.interval
+        state.data = data
+        state.enabled = enabled
+
+    def _advertise_enable_cmd(self, *, enabled: bool = True) -> tuple[int, bytes, bool]:
+        return self.OCF_LE_SET_ADVERTISE_ENABLE, bytearray([0x01 if enabled else 0x00]), enabled
 
     async def _set_advertise_enable(self, *, enabled: bool = True) -> int:
-        ret, _ = await self._send_hci_cmd(self.OCF_LE_SET_ADVERTISE_ENABLE, bytearray([0x01 if enabled else 0x00]), log_on_error=enabled)
-        return ret
+        return (await self._send_hci_cmds([self._advertise_enable_cmd(enabled=enabled)]))[0]
 
-    async def _set_advertising_parameter(self, min_interval: int = 0xA0, max_interval: int = 0xA0) -> None:
+    def _advertising_parameter_cmd(self, min_interval: int = 0xA0, max_interval: int = 0xA0) -> tuple[int, bytes, bool]:
         params = bytearray()
         params += min_interval.to_bytes(2, "little")
         params += max_interval.to_bytes(2, "little")
         params += bytes([0, 0, 0, 0, 0, 0, 0, 0, 0, 0x07, 0])
-        await self._send_hci_cmd(self.OCF_LE_SET_ADVERTISING_PARAMETERS, params)
+        return self.OCF_LE_SET_ADVERTISING_PARAMETERS, params, True
 
-    async def _set_advertising_data(self, data: bytes) -> None:
+    def _advertising_data_cmd(self, data: bytes) -> tuple[int, bytes, bool]:
         # btmon will give error 'invalid packet size' if data not of len 31, but the command is successful.
-        await self._send_hci_cmd(self.OCF_LE_SET_ADVERTISING_DATA, bytearray([len(data), *data]))
+        return self.OCF_LE_SET_ADVERTISING_DATA, bytearray([len(data), *data]), True
 
-    async def _hci_advertise(self, min_adv: int, duration: float, data: bytes) -> None:
-        await self._set_advertise_enable(enabled=False)
-        await self._set_advertising_parameter(min_adv, min_adv)
-        await self._set_advertising_data(data)
-        await self._set_advertise_enable()
-        await asyncio.sleep(duration)
-        await self._set_advertise_enable(enabled=False)
-        # set a fake adv, just in case it would be re enabled
-        await self._set_advertising_data(self.FAKE_ADV)
+    def _ext_advertise_enable_cmd(self, handle: int, *, enabled: bool = True, max_events: int = 0) -> tuple[int, bytes, bool]:
+        # Enable, Number of Sets, Advertising Handle, Duration: no limit, Max Extended Advertising Events
+        return self.OCF_LE_SET_EXT_ADVERTISE_ENABLE, bytearray([0x01 if enabled else 0x00, 0x01, handle, 0x00, 0x00, max_events]), enabled
 
-    async def _set_ext_advertise_enable(self, *, enabled: bool = True) -> int:
-        cmd = bytearray([0x01 if enabled else 0x00, 0x01, self.ADV_INST, 0x00, 0x00, 0x00])
-        ret, _ = await self._send_hci_cmd(self.OCF_LE_SET_EXT_ADVERTISE_ENABLE, cmd, log_on_error=enabled)
-        return ret
-
-    async def _set_ext_advertising_parameter(self, min_interval: int = 0xA0, max_interval: int = 0xA0) -> None:
+    def _ext_advertising_parameter_cmd(self, handle: int, min_interval: int = 0xA0, max_interval: int = 0xA0) -> tuple[int, bytes, bool]:
         btaddr = [0x00] * 6
         cmd = struct.pack(
             "<BHHBHBBBB6BBBBBBBB",
-            self.ADV_INST,
+            handle,
             0x0013,  # Properties (Use legacy advertising PDUs / ADV_IND)
             min_interval,  # Min advertising interval
             0x00,
@@ -456,28 +908,52 @@ class BluetoothHCIAdapter(BleAdvAdapter):
             0x00,  # SID
             0x00,  # Scan request notifications: Disabled
         )
-        await self._send_hci_cmd(self.OCF_LE_SET_EXT_ADVERTISING_PARAMETERS, cmd)
+        return self.OCF_LE_SET_EXT_ADVERTISING_PARAMETERS, cmd, True
 
-    async def _set_ext_advertising_data(self, data: bytes) -> None:
+    def _ext_advertising_data_cmd(self, handle: int, data: bytes) -> tuple[int, bytes, bool]:
         data_len = len(data)
-        cmd = struct.pack(f"<BBBB{data_len}B", self.ADV_INST, 0x03, 0x01, data_len, *data)
-        await self._send_hci_cmd(self.OCF_LE_SET_EXT_ADVERTISING_DATA, cmd)
-
-    async def _hci_ext_advertise(self, min_adv: int, duration: float, data: bytes) -> None:
-        await self._set_ext_advertise_enable(enabled=False)
-        await self._set_ext_advertising_parameter(min_adv, min_adv)
-        await self._set_ext_advertising_data(data)
-        await self._set_ext_advertise_enable()
-        await asyncio.sleep(duration)
-        await self._set_ext_advertise_enable(enabled=False)
-        # set a fake adv, just in case it would be re enabled
-        await self._set_ext_advertising_data(self.FAKE_ADV)
-
-    async def _mgmt_advertise(self, duration: float, data: bytes) -> None:
+        return self.OCF_LE_SET_EXT_ADVERTISING_DATA, struct.pack(f"<BBBB{data_len}B", handle, 0x03, 0x01, data_len, *data), True
+
+    async def _mgmt_advertise(self, instance: int, min_adv: int, duration: float, data: bytes) -> None:
+        """Advertise with the MGMT Add Extended Advertising Parameters / Data commands.
+
+        The advertising is timed by the host, sleeping for its duration: the MGMT duration is in seconds, too coarse for
+        the repeat trains, so no duration is given to the kernel. Only a timeout is, as a safety net removing the instance
+        should the host not do it. The instance is kept between consecutive msgs and removed when idle.
+        If the kernel does not know the extended commands, the Add Advertising command is used from then on,
+        with the kernel default interval. A failed command raises an AdapterError.
+        """
+        timeout = ceil(duration) + self.MGMT_ADV_TIMEOUT
         data_len = len(data)
-        await self._mgmt_send(self.device_id, 0x003E, struct.pack(f"<BIHHBB{data_len}B", self.ADV_INST, 0, 0, 0, data_len, 0, *data))
+        if self._use_mgmt_ext_adv:
+            # Instance, Flags: Timeout and Intervals specified, Duration (none: host timed), Timeout (s), Min / Max Interval, TX Power
+            flags = (1 << 13) | (1 << 14)
+            ret_code, _ = await self._send_mgmt_cmd(0x0054, struct.pack("<BIHHIIb", instance, flags, 0, timeout, min_adv, min_adv, 0))
+            if ret_code == self.MGMT_UNKNOWN_COMMAND:
+                self._use_mgmt_ext_adv = False
+                self._add_diag("MGMT Extended Advertising not supported, using MGMT Add Advertising", logging.INFO)
+            else:
+                self._check_mgmt_status(0x0054, ret_code)
+                # Instance, Adv Data Len, Scan Rsp Len, Adv Data
+                ret_code, _ = await self._send_mgmt_cmd(0x0055, struct.pack(f"<BBB{data_len}B", instance, data_len, 0, *data))
+                self._check_mgmt_status(0x0055, ret_code)
+        if not self._use_mgmt_ext_adv:
+            # Instance, Flags, Duration, Timeout (s), Adv Data Len, Scan Rsp Len, Adv Data
+            ret_code, _ = await self._send_mgmt_cmd(0x003E, struct.pack(f"<BIHHBB{data_len}B", instance, 0, 0, timeout, data_len, 0, *data))
+            self._check_mgmt_status(0x003E, ret_code)
         await asyncio.sleep(duration)
-        await self._mgmt_send(self.device_id, 0x003F, bytes([self.ADV_INST]))
+
+    def _check_mgmt_status(self, cmd_type: int, ret_code: int) -> None:
+        if ret_code != self.MGMT_SUCCESS:
+            msg = f"MGMT command {hex(cmd_type).upper()} failed with status {hex(ret_code).upper()}"
+            raise AdapterError(msg)
+
+    async def _send_mgmt_cmd(self, cmd_type: int, data: bytes) -> tuple[int, bytes]:
+        """Send a MGMT command to the adapter, measuring its round trip."""
+        start = asyncio.get_running_loop().time()
+        ret = await self._mgmt_send(self.device_id, cmd_type, data)
+        self.stats.cmd_rtt.record(asyncio.get_running_loop().time() - start)
+        return ret
 
     async def _start_scan(self) -> None:
         await self._set_scan_enable(enabled=False)
@@ -500,6 +976,7 @@ class BleAdvBtManager:
         self._adapters: dict[str, BleAdvAdapter] = {}
         self._id_to_name: dict[str, str] = {}
         self._diags: deque[str] = deque(maxlen=30)
+        self._stats: dict[str, BleAdvAdapterStats] = {}  # by adapter name, kept across the reconnections
         self._adapter_event_callback: AdapterEventCallback = adapter_event_callback
 
     @property
@@ -533,7 +1010,9 @@ class BleAdvBtManager:
 
     async def _add_adapter(self, adapter_name: str, adapter_id: str, adapter: BleAdvAdapter) -> None:
         self._add_diag(f"Adding adapter '{adapter_name}'/'{adapter_id}' of type {type(adapter).__name__}")
+        adapter.stats = self._stats.setdefault(adapter_name, BleAdvAdapterStats())
         await adapter.async_init()
+        adapter.stats.connections += 1
         self._id_to_name[adapter_id] = adapter_name
         self._adapters[adapter_name] = adapter
         await self._adapter_event_callback(adapter_name, True)
@@ -0,0 +1,277 @@
+"""Capture and replay of the received advertisements, in a compact binary format.
+
+A capture starts with MAGIC, followed by records, each prefixed by its length (uint16) and its type (uint8):
+    - REC_ADAPTER: adapter index (uint8), adapter id (utf-8). Declares an adapter before its first advertisement.
+    - REC_ADV: timestamp in ms since the start of the capture (uint32), adapter index (uint8), orig mac (6 bytes),
+      raw reference (uint8), then the raw adv if the reference is 0.
+      A non 0 reference designates a slot of the table of the last NB_RAW_SLOTS distinct raw advs written in full,
+      filled round robin: repeated advertisements cost 15 bytes only.
+Each capture is self-contained: a new file of a rotating capture starts with a new adapter declaration and raw table.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import struct
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import Iterator
+from dataclasses import dataclass
+from hashlib import blake2b
+from io import BytesIO
+from pathlib import Path
+from queue import Full, Queue
+from typing import Any, BinaryIO
+
+_LOGGER = logging.getLogger(__name__)
+
+MAGIC = b"BLEADVC1"
+REC_ADAPTER = 0x01
+REC_ADV = 0x02
+NB_RAW_SLOTS = 255
+
+_LEN_TYPE = struct.Struct("<HB")
+_ADV_HEADER = struct.Struct("<IB6sB")
+
+
+@dataclass(slots=True)
+class BleAdvCaptureRecord:
+    """Captured advertisement: timestamp in seconds since the start of the capture, adapter id, orig mac and raw adv."""
+
+    ts: float
+    adapter_id: str
+    orig: str
+    raw: bytes
+
+
+def hash_mac(orig: str, salt: bytes) -> str:
+    """Pseudonymize a mac with a keyed hash: the same mac gives the same hash for a given salt only."""
+    return ":".join(f"{x:02X}" for x in blake2b(orig.encode(), key=salt, digest_size=6).digest())
+
+
+def _mac_to_bytes(orig: str) -> bytes:
+    try:
+        mac = bytes.fromhex(orig.replace(":", ""))
+    except ValueError:
+        mac = b""
+    return mac if len(mac) == 6 else bytes(6)
+
+
+class BleAdvCaptureWriter:
+    """Encoder of advertisements to a binary stream, in capture format."""
+
+    def __init__(self, stream: BinaryIO, t0: float) -> None:
+        self._stream: BinaryIO = stream
+        self._t0: float = t0
+        self._adapters: dict[str, int] = {}
+        self._raw_slots: list[bytes] = []
+        self._raw_refs: dict[bytes, int] = {}
+        self._next_slot: int = 0
+        self.size: int = self._stream.write(MAGIC)
+
+    def _write_record(self, rec_type: int, data: bytes) -> None:
+        self.size += self._stream.write(_LEN_TYPE.pack(len(data) + 1, rec_type) + data)
+
+    def _raw_ref(self, raw: bytes) -> int:
+        """Get the reference of an already written raw adv, or 0 after having stored it in the next slot."""
+        if (slot := self._raw_refs.get(raw)) is not None:
+            return slot + 1
+        if len(self._raw_slots) < NB_RAW_SLOTS:
+            self._raw_slots.append(raw)
+        else:
+            del self._raw_refs[self._raw_slots[self._next_slot]]
+            self._raw_slots[self._next_slot] = raw
+        self._raw_refs[raw] = self._next_slot
+        self._next_slot = (self._next_slot + 1) % NB_RAW_SLOTS
+        return 0
+
+    def write(self, ts: float, adapter_id: str, orig: str, raw: bytes) -> None:
+        """Write an advertisement received at monotonic time ts."""
+        if (index := self._adapters.get(adapter_id)) is None:
+            index = self._adapters[adapter_id] = len(self._adapters) & 0xFF
+            self._write_record(REC_ADAPTER, bytes([index]) + adapter_id.encode())
+        ts_ms = max(0, round((ts - self._t0) * 1000.0)) & 0xFFFFFFFF
+        ref = self._raw_ref(raw)
+        self._write_record(REC_ADV, _ADV_HEADER.pack(ts_ms, index, _mac_to_bytes(orig), ref) + (raw if ref == 0 else b""))
+
+
+def read_capture(stream: BinaryIO) -> Iterator[BleAdvCaptureRecord]:
+    """Stream the advertisements of a binary capture stream."""
+    if stream.read(len(MAGIC)) != MAGIC:
+        msg = "Not a BLE ADV capture"
+        raise ValueError(msg)
+    adapters: dict[int, str] = {}
+    raw_slots: list[bytes] = []
+    next_slot = 0
+    while len(header := stream.read(_LEN_TYPE.size)) == _LEN_TYPE.size:
+        rec_len, rec_type = _LEN_TYPE.unpack(header)
+        if len(data := stream.read(rec_len - 1)) != rec_len - 1:
+            return  # truncated last record: capture interrupted
+        if rec_type == REC_ADAPTER:
+            adapters[data[0]] = data[1:].decode()
+        elif rec_type == REC_ADV:
+            ts_ms, index, mac, ref = _ADV_HEADER.unpack_from(data)
+            if ref == 0:
+                raw = data[_ADV_HEADER.size :]
+                if len(raw_slots) < NB_RAW_SLOTS:
+                    raw_slots.append(raw)
+                else:
+                    raw_slots[next_slot] = raw
+                next_slot = (next_slot + 1) % NB_RAW_SLOTS
+            else:
+                raw = raw_slots[ref - 1]
+            yield BleAdvCaptureRecord(ts_ms / 1000.0, adapters[index], ":".join(f"{x:02X}" for x in mac), raw)
+
+
+def read_capture_files(path: Path) -> Iterator[BleAdvCaptureRecord]:
+    """Stream the advertisements of a rotating capture, from the oldest file 'path.<n>' to the current one 'path'."""
+    backups = [x for x in path.parent.glob(f"{path.name}.*") if x.suffix[1:].isdigit()]
+    for file_path in [*sorted(backups, key=lambda x: int(x.suffix[1:]), reverse=True), path]:
+        if file_path.exists():
+            with file_path.open("rb") as file:
+                yield from read_capture(file)
+
+
+class BleAdvCaptureRecorder(ABC):
+    """Base recorder of the advertisements received by the coordinator."""
+
+    def __init__(self) -> None:
+        self.nb_records: int = 0
+
+    @abstractmethod
+    def record(self, ts: float, adapter_id: str, orig: str, raw: bytes) -> None:
+        """Record an advertisement received at monotonic time ts."""
+
+    @abstractmethod
+    def close(self) -> None:
+        """Close the recorder."""
+
+    def diagnostic_dump(self) -> dict[str, Any]:
+        """Diagnostic dump."""
+        return {"type": type(self).__name__, "records": self.nb_records}
+
+
+class BleAdvCaptureFile(BleAdvCaptureRecorder):
+    """Recorder to a size bounded rotating capture file: 'path', then 'path.1' ... 'path.<backups>' from the newest.
+
+    The records are queued to a writer thread doing the writes and rotations: recording does not block.
+    Up to MAX_QUEUED records are pending: the records received beyond are dropped and counted, should the writes be too slow.
+    Blocking file operations: build and close it in an executor.
+    """
+
+    MAX_QUEUED: int = 10000
+
+    def __init__(self, path: Path, max_size: int, backups: int) -> None:
+        super().__init__()
+        self.path: Path = path
+        self.max_size: int = max_size
+        self.backups: int = backups
+        self._file: BinaryIO = self.path.open("wb")
+        self._writer: BleAdvCaptureWriter | None = None
+        self._t0: float | None = None  # common to all the files, for a continuous time line
+        self._queue: Queue[tuple[float, str, str, bytes] | None] = Queue(self.MAX_QUEUED)
+        self.nb_dropped: int = 0
+        self._failed: bool = False
+        self._thread: threading.Thread = threading.Thread(target=self._run, name="ble_adv_capture", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        """Write the queued records until the None end marker, in the writer thread."""
+        try:
+            while (rec := self._queue.get()) is not None:
+                self._write(*rec)
+        except OSError:
+            _LOGGER.exception(f"Capture to '{self.path}' stopped")
+            self._failed = True
+        finally:
+            self._file.close()
+
+    def _write(self, ts: float, adapter_id: str, orig: str, raw: bytes) -> None:
+        if self._writer is None:
+            self._writer = BleAdvCaptureWriter(self._file, self._t0 if self._t0 is not None else ts)
+        self._writer.write(ts, adapter_id, orig, raw)
+        if self._writer.size >= self.max_size:
+            self._rotate()
+
+    def _rotate(self) -> None:
+        self._file.close()
+        for i in range(self.backups, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i - 1}") if i > 1 else self.path
+            if src.exists():
+                src.replace(self.path.with_name(f"{self.path.name}.{i}"))
+        self._file = self.path.open("wb")
+        self._writer = None
+
+    def record(self, ts: float, adapter_id: str, orig: str, raw: bytes) -> None:
+        """Queue an advertisement to the writer thread, the file being rotated when full."""
+        if self._failed:
+            return
+        if self._t0 is None:
+            self._t0 = ts
+        try:
+            self._queue.put_nowait((ts, adapter_id, orig, raw))
+        except Full:
+            self.nb_dropped += 1
+            return
+        self.nb_records += 1
+
+    def close(self) -> None:
+        """Write the queued records, then close the file and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def diagnostic_dump(self) -> dict[str, Any]:
+        """Diagnostic dump."""
+        size = writer.size if (writer := self._writer) is not None else 0
+        return {
+            **super().diagnostic_dump(),
+            "path": str(self.path),
+            "size": size,
+            "max_size": self.max_size,
+            "backups": self.backups,
+            "failed": self._failed,
+            "dropped": self.nb_dropped,
+        }
+
+
+class BleAdvCaptureRing(BleAdvCaptureRecorder):
+    """Recorder to a size bounded in memory ring, keeping the last advertisements.
+
+    Its content is not part of the diagnostics: it is exported on demand, with the macs of the emitters hashed.
+    """
+
+    REC_SIZE: int = _LEN_TYPE.size + _ADV_HEADER.size  # max encoded size of an adv record, without its raw
+
+    def __init__(self, max_size: int) -> None:
+        super().__init__()
+        self.max_size: int = max_size
+        self._records: deque[tuple[float, str, str, bytes]] = deque()
+        self._size: int = 0
+
+    def record(self, ts: float, adapter_id: str, orig: str, raw: bytes) -> None:
+        """Record an advertisement, dropping the oldest ones when full."""
+        self._records.append((ts, adapter_id, orig, raw))
+        self._size += self.REC_SIZE + len(raw)
+        self.nb_records += 1
+        while self._size > self.max_size:
+            self._size -= self.REC_SIZE + len(self._records.popleft()[3])
+
+    def close(self) -> None:
+        """Drop the kept advertisements."""
+        self._records.clear()
+        self._size = 0
+
+    def dump(self, *, hash_macs: bool = False) -> bytes:
+        """Dump the ring as a capture, the orig macs being hashed with a random salt if hash_macs."""
+        stream = BytesIO()
+        writer = BleAdvCaptureWriter(stream, self._records[0][0] if self._records else 0.0)
+        salt = os.urandom(16)
+        for ts, adapter_id, orig, raw in self._records:
+            writer.write(ts, adapter_id, hash_mac(orig, salt) if hash_macs else orig, raw)
+        return stream.getvalue()
+
+    def diagnostic_dump(self) -> dict[str, Any]:
+        """Diagnostic dump."""
+        return {**super().diagnostic_dump(), "kept": len(self._records), "size": self._size, "max_size": self.max_size}
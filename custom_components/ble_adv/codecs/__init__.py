@@ -1,18 +1,16 @@
-"""Codecs Package."""
+"""Codecs Package.
 
+The codec families are only imported and built on first use, through the BleAdvCodecRegistry.
+"""
+
+import sys
+from collections.abc import Iterator, Mapping
+from importlib import import_module
+from threading import Lock
 from typing import Any
 
-from .agarce import CODECS as AGARCE_CODECS
-from .fanlamp import FLCODECS, LSCODECS
-from .le import CODECS as LE_CODECS
-from .mantra import CODECS as MANTRA_CODECS
+from .families import FAMILY_MATCH_IDS
 from .models import BleAdvCodec
-from .remotes import CODECS as REMOTES_CODECS
-from .ruixin import CODECS as RUIXIN_CODECS
-from .rw import CODECS as RW_CODECS
-from .smartelfin import CODECS as SMARTELFIN_CODECS
-from .zhijia import CODECS as ZHIJIA_CODECS
-from .zhimei import CODECS as ZHIMEI_CODECS
 
 _PHONE_APPS_BASE = {
     "Fan Lamp Pro": ["fanlamp_pro_v3", "fanlamp_pro_v2", "fanlamp_pro_v1"],
@@ -30,26 +28,151 @@ _PHONE_APPS_BASE = {
 }
 
 
-def get_codec_list() -> list[BleAdvCodec]:
-    """Get codec list."""
-    return [
-        *FLCODECS,
-        *LSCODECS,
-        *ZHIJIA_CODECS,
-        *ZHIMEI_CODECS,
-        *AGARCE_CODECS,
-        *REMOTES_CODECS,
-        *MANTRA_CODECS,
-        *LE_CODECS,
-        *RUIXIN_CODECS,
-        *RW_CODECS,
-        *SMARTELFIN_CODECS,
+class BleAdvCodecFamily:
+    """Lightweight descriptor of a family of codecs: the module defining them, its codec lists and their codec_id / match_id."""
+
+    def __init__(self, module: str, attrs: list[str], match_ids: dict[str, str]) -> None:
+        self.module: str = module
+        self.attrs: list[str] = attrs
+        self.match_ids: dict[str, str] = match_ids
+
+    def build(self) -> list[BleAdvCodec]:
+        """Import the family module and get its codecs."""
+        module = import_module(f"{__name__}.{self.module}")
+        return [codec for attr in self.attrs for codec in getattr(module, attr)]
+
+
+_FAMILY_ATTRS: dict[str, list[str]] = {
+    "fanlamp": ["FLCODECS", "LSCODECS"],
+    "zhijia": ["CODECS"],
+    "zhimei": ["CODECS"],
+    "agarce": ["CODECS"],
+    "remotes": ["CODECS"],
+    "mantra": ["CODECS"],
+    "le": ["CODECS"],
+    "ruixin": ["CODECS"],
+    "rw": ["CODECS"],
+    "smartelfin": ["CODECS"],
+}
+
+CODEC_FAMILIES: list[BleAdvCodecFamily] = [BleAdvCodecFamily(module, attrs, FAMILY_MATCH_IDS[module]) for module, attrs in _FAMILY_ATTRS.items()]
+
+
+def render_families() -> str:
+    """Render the 'families' module from the codecs built by each family module."""
+    lines = [
+        '"""Codec ids and match ids of the codecs of each family module.',
+        "",
+        "Generated from the codec modules, do not edit. Regenerate with:",
+        "    PYTHONPATH=:custom_components python -m ble_adv.codecs",
+        '"""',
+        "",
+        "FAMILY_MATCH_IDS: dict[str, dict[str, str]] = {",
     ]
+    for module, attrs in _FAMILY_ATTRS.items():
+        lines.append(f'    "{module}": {{')
+        lines.extend(f'        "{codec.codec_id}": "{codec.match_id}",' for codec in BleAdvCodecFamily(module, attrs, {}).build())
+        lines.append("    },")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+class BleAdvCodecRegistry(Mapping[str, BleAdvCodec]):
+    """Map of codecs by codec_id, building a codec family only on first access to one of its codecs.
+
+    The codec ids and match ids are known from the family descriptors, without building the codecs.
+    Building a family imports its module: from the event loop, use warm / warm_all in an executor first.
+    The map of built codecs is replaced on each build, never updated, so that it can be iterated without lock.
+    """
+
+    def __init__(self, families: list[BleAdvCodecFamily] | None = None, codecs: list[BleAdvCodec] | None = None) -> None:
+        self._match_ids: dict[str, str] = {}
+        self._pending: dict[str, BleAdvCodecFamily] = {}
+        self._codecs: dict[str, BleAdvCodec] = {}
+        self._lock: Lock = Lock()
+        for family in families if families is not None else []:
+            for codec_id, match_id in family.match_ids.items():
+                self._match_ids[codec_id] = match_id
+                self._pending[codec_id] = family
+        for codec in codecs if codecs is not None else []:
+            self._match_ids[codec.codec_id] = codec.match_id
+            self._codecs[codec.codec_id] = codec
+
+    def __getitem__(self, codec_id: str) -> BleAdvCodec:
+        if (codec := self._codecs.get(codec_id)) is None:
+            codec = self._load(codec_id)
+        return codec
+
+    def __contains__(self, codec_id: object) -> bool:
+        return codec_id in self._match_ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._match_ids)
+
+    def __len__(self) -> int:
+        return len(self._match_ids)
+
+    def _load(self, codec_id: str) -> BleAdvCodec:
+        with self._lock:
+            if (codec := self._codecs.get(codec_id)) is not None:
+                return codec  # built in the meantime
+            family = self._pending[codec_id]
+            codecs = {codec.codec_id: codec for codec in family.build()}
+            if codecs.keys() != family.match_ids.keys():
+                msg = f"Codec family '{family.module}' descriptor does not match its codecs: {list(codecs.keys())}"
+                raise ValueError(msg)
+            self._codecs = {**self._codecs, **codecs}
+            for built_id in codecs:
+                self._pending.pop(built_id, None)
+            return codecs[codec_id]
+
+    def match_id(self, codec_id: str) -> str:
+        """Get the match_id of a codec, without building it."""
+        return self._match_ids[codec_id]
+
+    def is_loaded(self, codec_id: str) -> bool:
+        """Check if a codec was already built."""
+        return codec_id in self._codecs
+
+    def built_items(self) -> list[tuple[str, BleAdvCodec]]:
+        """Get the (codec_id, codec) of the already built codecs, without building any codec."""
+        codecs = self._codecs
+        return [(codec_id, codecs[codec_id]) for codec_id in self._match_ids if codec_id in codecs]
+
+    def warm(self, codec_ids: list[str]) -> None:
+        """Build the families of the given codecs, ignoring unknown codec ids."""
+        for codec_id in codec_ids:
+            if codec_id in self._match_ids and codec_id not in self._codecs:
+                self._load(codec_id)
+
+    def warm_all(self) -> None:
+        """Build all the codec families."""
+        self.warm(list(self._match_ids))
+
+
+def get_codecs() -> BleAdvCodecRegistry:
+    """Get codec map, lazily built."""
+    return BleAdvCodecRegistry(CODEC_FAMILIES)
+
+
+def get_codec_list() -> list[BleAdvCodec]:
+    """Get codec list, building all the codecs."""
+    return list(get_codecs().values())
+
+
+def set_keystream_cache_size(size: int) -> None:
+    """Set the max number of keystreams cached by the codecs. Builds the mantra family."""
+    import_module(f"{__name__}.mantra").MantraEncoder.KEYSTREAMS.resize(size)
 
 
-def get_codecs() -> dict[str, BleAdvCodec]:
-    """Get codec map."""
-    return {x.codec_id: x for x in get_codec_list()}
+def get_cache_stats() -> dict[str, dict[str, Any]]:
+    """Get the statistics of the caches used by the already built codec families."""
+    stats = {}
+    if (mantra := sys.modules.get(f"{__name__}.mantra")) is not None:
+        stats["mantra_keystreams"] = mantra.MantraEncoder.KEYSTREAMS.stats()
+    if (fanlamp := sys.modules.get(f"{__name__}.fanlamp")) is not None:
+        stats["fanlamp_v2_ciphers"] = fanlamp.FanLampEncoderV2.CIPHERS.stats()
+    return stats
 
 
 DYN_CODEC_PARAM_MAP: dict[str, tuple[str, list[Any]]] = {
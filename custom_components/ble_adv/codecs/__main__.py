@@ -0,0 +1,7 @@
+"""Regenerate the 'families' module from the codec modules."""
+
+from pathlib import Path
+
+from . import render_families
+
+Path(__file__).with_name("families.py").write_text(render_families())
@@ -0,0 +1,75 @@
+"""Codec ids and match ids of the codecs of each family module.
+
+Generated from the codec modules, do not edit. Regenerate with:
+    PYTHONPATH=:custom_components python -m ble_adv.codecs
+"""
+
+FAMILY_MATCH_IDS: dict[str, dict[str, str]] = {
+    "fanlamp": {
+        "fanlamp_pro_v1": "fanlamp_pro_v1",
+        "fanlamp_pro_v2": "fanlamp_pro_v2",
+        "remote_v1": "fanlamp_pro_v1",
+        "fanlamp_pro_v1/r0": "fanlamp_pro_v1",
+        "fanlamp_pro_v1/r1": "fanlamp_pro_v1",
+        "fanlamp_pro_v1/r3": "fanlamp_pro_v1",
+        "fanlamp_pro_v2/r": "fanlamp_pro_v2",
+        "lampsmart_pro_v1": "lampsmart_pro_v1",
+        "lampsmart_pro_vi1": "lampsmart_pro_v1",
+        "lampsmart_pro_v2": "lampsmart_pro_v2",
+        "lampsmart_pro_v1/r1": "lampsmart_pro_v1",
+        "other_v1b": "lampsmart_pro_v1",
+        "other_v1a": "lampsmart_pro_v1",
+        "lampsmart_pro_v2/r": "lampsmart_pro_v2",
+    },
+    "zhijia": {
+        "zhijia_v0": "zhijia_v0",
+        "zhijia_v1": "zhijia_v1",
+        "zhijia_v2": "zhijia_v2",
+        "zhiguang_v0": "zhiguang_v0",
+        "zhiguang_v1": "zhiguang_v1",
+        "zhiguang_v2": "zhiguang_v2",
+        "zhijia_vr1": "zhijia_v1",
+    },
+    "zhimei": {
+        "zhimei_fan_v0": "zhimei_fan_v0",
+        "zhimei_fan_v1": "zhimei_fan_v1",
+        "zhimei_v1": "zhimei_v1",
+        "zhimei_v2": "zhimei_v2",
+        "zhimei_fan_vr0": "zhimei_fan_v0",
+        "zhimei_fan_vr1": "zhimei_fan_v1",
+        "zhimei_fan_v1b": "zhimei_fan_v1",
+        "zhimei_v1b": "zhimei_v1",
+        "zhimei_vr1": "zhimei_v1",
+        "zhiguang2_v2": "zhiguang2_v2",
+    },
+    "agarce": {
+        "agarce_v3": "agarce_v3",
+        "agarce_v4": "agarce_v4",
+        "agarce_vr3": "agarce_vr3",
+        "agarce_vr4": "agarce_vr4",
+    },
+    "remotes": {
+        "remote_v4": "remote_v4",
+    },
+    "mantra": {
+        "mantra_v0": "mantra_v0",
+        "mantra_v0/ios": "mantra_v0",
+        "mantra_v1": "mantra_v1",
+        "mantra_v1/ios": "mantra_v1",
+    },
+    "le": {
+        "lelight": "lelight",
+    },
+    "ruixin": {
+        "ruixin_v0": "ruixin_v0",
+        "ruixin_v0/r1": "ruixin_v0",
+    },
+    "rw": {
+        "rwlight_mix": "rwlight_mix",
+        "rwlight_mix/ios": "rwlight_mix",
+    },
+    "smartelfin": {
+        "smartelfin_v0": "smartelfin_v0",
+        "smartelfin_fl_vr0": "smartelfin_fl_vr0",
+    },
+}
@@ -1,7 +1,7 @@
 """Fanlamp Pro Encoders."""
 
 from binascii import crc_hqx
-from typing import ClassVar, Self
+from typing import Any, ClassVar, Self
 
 from Crypto.Cipher import AES
 
@@ -48,7 +48,7 @@ from .models import (
     TranslatorSet,
 )
 from .models import EncoderMatcher as EncCmd
-from .utils import reverse_all, whiten
+from .utils import LruCache, reverse_all, whiten
 
 
 class FanLampEncoder(BleAdvCodec):
@@ -260,6 +260,8 @@ class FanLampEncoderV2(FanLampEncoder):
 
     _seed_max = 0xFFF5
 
+    CIPHERS: ClassVar[LruCache] = LruCache(256)
+    KEY_TAIL: ClassVar[bytes] = bytes([0x0D, 0xBF, 0xE6, 0x42, 0x68, 0x41, 0x99, 0x2D, 0x0F, 0xB0, 0x54, 0xBB, 0x16])
     XBOXES: ClassVar[list[int]] = [
         0xB7, 0xFD, 0x93, 0x26, 0x36, 0x3F, 0xF7, 0xCC, 0x34, 0xA5, 0xE5, 0xF1, 0x71, 0xD8, 0x31, 0x15,
         0x04, 0xC7, 0x23, 0xC3, 0x18, 0x96, 0x05, 0x9A, 0x07, 0x12, 0x80, 0xE2, 0xEB, 0x27, 0xB2, 0x75,
@@ -281,13 +283,21 @@ class FanLampEncoderV2(FanLampEncoder):
         """Whiten / Unwhiten buffer with seed."""
         return bytes([(self.XBOXES[((seed + i + 9) & 0x1F) + salt]) ^ seed ^ val for i, val in enumerate(buffer)])
 
+    def _cipher(self, tx_count: int, seed: int) -> Any:  # noqa: ANN401
+        """Get the AES ECB cipher context for the key derived from seed / tx_count, from the cache."""
+        return self.CIPHERS.get(
+            (seed & 0xFFFF, tx_count), lambda: AES.new(bytes([seed & 0xFF, (seed >> 8) & 0xFF, tx_count]) + self.KEY_TAIL, AES.MODE_ECB)
+        )
+
     def _sign(self, buffer: bytes, tx_count: int, seed: int) -> int:
         """Compute uint16 AES ECB sign."""
-        key = bytes([seed & 0xFF, (seed >> 8) & 0xFF, tx_count, 0x0D, 0xBF, 0xE6, 0x42, 0x68, 0x41, 0x99, 0x2D, 0x0F, 0xB0, 0x54, 0xBB, 0x16])
-        cipher = AES.new(key, AES.MODE_ECB)
-        ciphertext = cipher.encrypt(buffer)
-        sign = int.from_bytes(ciphertext[0:2], "little")
-        return sign if sign != 0 else 0xFFFF
+        return self.sign_batch([buffer], tx_count, seed)[0]
+
+    def sign_batch(self, buffers: list[bytes], tx_count: int, seed: int) -> list[int]:
+        """Compute the uint16 AES ECB signs of several 16 bytes blocks, with a single cipher context and call."""
+        ciphertext = self._cipher(tx_count, seed).encrypt(b"".join(buffers))
+        signs = [int.from_bytes(ciphertext[i : i + 2], "little") for i in range(0, len(ciphertext), 16)]
+        return [sign if sign != 0 else 0xFFFF for sign in signs]
 
     def decrypt(self, buffer: bytes) -> bytes | None:
         """Decrypt / unwhiten an incoming raw buffer into a readable buffer."""
@@ -1,5 +1,7 @@
 """Mantra Lighting Application."""
 
+from typing import ClassVar
+
 from .const import (
     ATTR_BR,
     ATTR_CMD,
@@ -37,6 +39,25 @@ from .models import (
     TranslatorSet,
 )
 from .models import EncoderMatcher as EncCmd
+from .utils import KeystreamCache
+
+
+def whiten16_keystream(seed: int, param: int, xorer: int, length: int) -> bytes:
+    """Compute the 16 bits LFSR keystream, including the constant xorer."""
+    obuf = bytearray()
+    r = seed
+    for _ in range(length):
+        b = 0
+        for j in range(8):
+            high_bit = 0x8000 & r
+            r = (r << 1) & 0xFFFF
+            if high_bit != 0:
+                r ^= param
+                b |= 1 << (7 - j)
+            if r == 0:
+                r = 1061
+        obuf.append(xorer ^ b)
+    return obuf
 
 
 class MantraEncoder(BleAdvCodec):
@@ -49,21 +70,10 @@ class MantraEncoder(BleAdvCodec):
     _tx_max: int = 0xFFFF
     _family = bytes([0x12, 0x34, 0x56, 0x78])
 
-    def _whiten16(self, buffer: bytes, seed: int, param: int = 4777, xorer: int = 73) -> bytearray:
-        obuf = bytearray()
-        r = seed
-        for val in buffer:
-            b = 0
-            for j in range(8):
-                high_bit = 0x8000 & r
-                r = (r << 1) & 0xFFFF
-                if high_bit != 0:
-                    r ^= param
-                    b |= 1 << (7 - j)
-                if r == 0:
-                    r = 1061
-            obuf.append(val ^ xorer ^ b)
-        return obuf
+    KEYSTREAMS: ClassVar[KeystreamCache] = KeystreamCache(whiten16_keystream, 1024)
+
+    def _whiten16(self, buffer: bytes, seed: int, param: int = 4777, xorer: int = 73) -> bytes:
+        return self.KEYSTREAMS.xor(buffer, seed, param, xorer)
 
     def decrypt(self, buffer: bytes) -> bytes | None:
         """Decrypt / unwhiten an incoming raw buffer into a readable buffer."""
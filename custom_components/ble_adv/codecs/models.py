@@ -4,7 +4,9 @@ import copy
 import logging
 from abc import ABC, abstractmethod
 from binascii import hexlify
+from collections.abc import Callable
 from dataclasses import dataclass
+from functools import wraps
 from random import randint
 from typing import Any, Self
 
@@ -30,28 +32,36 @@ def as_hex(buffer: bytes) -> str:
 class BleAdvAdvertisement:
     """Model and Advertisement."""
 
+    __slots__ = ("ad_flag", "ble_type", "raw", "second_raw", "second_type")
+
+    AD_TYPES: frozenset[int] = frozenset([0x03, 0x05, 0x07, 0x16, 0xFF])
+
     @classmethod
     def FromRaw(cls, raw_adv: bytes) -> Self:  # noqa: N802
-        """Build an Advertisement from raw."""
+        """Build an Advertisement from raw.
+
+        The AD structures are walked by offset, only the data of the kept structures are copied: the data of the main
+        structure is needed as bytes anyway, being hashed as the key of the coordinator dedup on each reception.
+        """
         ble_type = 0x00
         sec_type = 0x00
         sec_raw = None
-        rem_data = raw_adv
-        while len(rem_data) > 2:
-            part_len = rem_data[0]
-            if part_len > len(rem_data):
+        raw_data = raw_adv
+        pos = 0
+        end = len(raw_adv)
+        while end - pos > 2:
+            part_len = raw_adv[pos]
+            if part_len > end - pos:
                 break
-            part_type = rem_data[1]
-            if part_type in [0x03, 0x05, 0x07, 0x16, 0xFF]:
+            part_type = raw_adv[pos + 1]
+            if part_type in cls.AD_TYPES:
                 if ble_type == 0x00:
                     ble_type = part_type
-                    raw_data = rem_data[2 : part_len + 1]
+                    raw_data = raw_adv[pos + 2 : pos + part_len + 1]
                 else:
                     sec_type = part_type
-                    sec_raw = rem_data[2 : part_len + 1]
-            rem_data = rem_data[part_len + 1 :]
-        if ble_type == 0:
-            raw_data = raw_adv
+                    sec_raw = raw_adv[pos + 2 : pos + part_len + 1]
+            pos += part_len + 1
         return cls(ble_type, raw_data, 0, sec_type, sec_raw)
 
     def __init__(self, ble_type: int, raw: bytes, ad_flag: int = 0, sec_type: int = 0, sec_raw: bytes | None = None) -> None:
@@ -79,7 +89,7 @@ class BleAdvAdvertisement:
         return bytes(full_raw if self.ad_flag == 0 else bytearray([0x02, 0x01, self.ad_flag]) + full_raw + second_raw)
 
 
-@dataclass
+@dataclass(slots=True)
 class BleAdvEncCmd:
     """Ble ADV Encoder command."""
 
@@ -93,6 +103,34 @@ class BleAdvEncCmd:
 
     def __init__(self, cmd: int) -> None:
         self.cmd = cmd
+        self.param = 0
+        self.arg0 = 0
+        self.arg1 = 0
+        self.arg2 = 0
+        self.arg3 = 0
+        self.arg4 = 0
+
+    def __copy__(self) -> Self:
+        enc_cmd = self.__class__(self.cmd)
+        enc_cmd.param = self.param
+        enc_cmd.arg0 = self.arg0
+        enc_cmd.arg1 = self.arg1
+        enc_cmd.arg2 = self.arg2
+        enc_cmd.arg3 = self.arg3
+        enc_cmd.arg4 = self.arg4
+        return enc_cmd
+
+    def to_dict(self) -> dict[str, int]:
+        """Get the command as a dict, same as dataclasses.asdict."""
+        return {
+            "cmd": self.cmd,
+            "param": self.param,
+            "arg0": self.arg0,
+            "arg1": self.arg1,
+            "arg2": self.arg2,
+            "arg3": self.arg3,
+            "arg4": self.arg4,
+        }
 
     def __repr__(self) -> str:
         args = f"{self.arg0},{self.arg1},{self.arg2}"
@@ -107,6 +145,8 @@ type AttrType = str | bool | int | float | None
 class BleAdvEntAttr:
     """Ble Adv Entity Attributes."""
 
+    __slots__ = ("attrs", "base_type", "chg_attrs", "index")
+
     def __init__(self, changed_attrs: list[str], attrs: dict[str, Any], base_type: str, index: int) -> None:
         self.chg_attrs: list[str] = changed_attrs
         self.attrs: dict[str, Any] = attrs
@@ -123,7 +163,14 @@ class BleAdvEntAttr:
 
     def __hash__(self) -> int:
         """Hash."""
-        return hash((*set(self.chg_attrs), *self.attrs, self.base_type, self.index))
+        return hash((frozenset(self.chg_attrs), frozenset(self.attrs), self.base_type, self.index))
+
+    def __copy__(self) -> Self:
+        return self.__class__(self.chg_attrs, self.attrs, self.base_type, self.index)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Get the entity attributes as a dict."""
+        return {"chg_attrs": self.chg_attrs, "attrs": self.attrs, "base_type": self.base_type, "index": self.index}
 
     def __eq__(self, comp: Self) -> bool:
         return (
@@ -138,23 +185,64 @@ class BleAdvEntAttr:
         return float(self.attrs[attr])
 
 
-@dataclass
 class BleAdvConfig:
     """Ble Adv Encoder Config."""
 
-    tx_count: int = 0
-    app_restart_count: int = 1
-    seed: int = 0
+    __slots__ = ("app_restart_count", "codec_params", "id", "index", "seed", "translator_set", "tx_count")
 
     def __init__(self, config_id: int = 0, index: int = 0, codec_params: list[Any] | None = None, translator_set: str | None = None) -> None:
         self.id: int = config_id
         self.index: int = index
         self.codec_params: list[Any] = codec_params if codec_params is not None else []
         self.translator_set: str | None = translator_set
+        self.tx_count: int = 0
+        self.app_restart_count: int = 1
+        self.seed: int = 0
 
     def __repr__(self) -> str:
         return f"id: 0x{self.id:08X}, index: {self.index}, tx: {self.tx_count}, seed: 0x{self.seed:04X}"
 
+    def __eq__(self, comp: object) -> bool:
+        # Equality on the counters only: id / index / params are not compared
+        if comp.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.tx_count, self.app_restart_count, self.seed) == (comp.tx_count, comp.app_restart_count, comp.seed)  # type: ignore[attr-defined]
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __copy__(self) -> Self:
+        conf = self.__class__(self.id, self.index, self.codec_params, self.translator_set)
+        conf.tx_count = self.tx_count
+        conf.app_restart_count = self.app_restart_count
+        conf.seed = self.seed
+        return conf
+
+    def to_dict(self) -> dict[str, Any]:
+        """Get the config as a dict."""
+        return {
+            "id": self.id,
+            "index": self.index,
+            "codec_params": self.codec_params,
+            "translator_set": self.translator_set,
+            "tx_count": self.tx_count,
+            "app_restart_count": self.app_restart_count,
+            "seed": self.seed,
+        }
+
+
+class _TranslatorsGeneration:
+    """Generation of the translators, incremented on any change of a matcher, a translator or a translator set.
+
+    The matchers and translators are shared by several sets: a set compiled for a previous generation is compiled again.
+    """
+
+    value: int = 0
+
+    @classmethod
+    def changed(cls) -> None:
+        """Increment the generation."""
+        cls.value += 1
+
 
 class CommonMatcher:
     """Matcher Base."""
@@ -167,18 +255,41 @@ class CommonMatcher:
     def eq(self, attr: str, attr_val: AttrType) -> Self:
         """Force Entity to have attribute equal to this value."""
         self.eqs[attr] = attr_val
+        _TranslatorsGeneration.changed()
         return self
 
     def min(self, attr: str, attr_val: float) -> Self:
         """Force Entity to have attribute of maximum this value."""
         self.mins[attr] = attr_val
+        _TranslatorsGeneration.changed()
         return self
 
     def max(self, attr: str, attr_val: float) -> Self:
         """Force Entity to have attribute of minimum this value."""
         self.maxs[attr] = attr_val
+        _TranslatorsGeneration.changed()
         return self
 
+    def _compile_checks(self, getter: Callable[[Any, str], Any]) -> Callable[[Any], bool]:
+        """Compile the eq / min / max checks into a single predicate, with the same comparisons as the matchers."""
+        eqs = tuple(self.eqs.items())
+        mins = tuple(self.mins.items())
+        maxs = tuple(self.maxs.items())
+
+        def _check(obj: Any) -> bool:  # noqa: ANN401
+            for attr, val in eqs:
+                if not getter(obj, attr) == val:  # noqa: SIM201
+                    return False
+            for attr, val in mins:
+                if not getter(obj, attr) >= val:
+                    return False
+            for attr, val in maxs:  # noqa: SIM110
+                if not getter(obj, attr) <= val:
+                    return False
+            return True
+
+        return _check
+
 
 class EntityMatcher(CommonMatcher):
     """Matcher for Entity."""
@@ -195,6 +306,7 @@ class EntityMatcher(CommonMatcher):
     def act(self, action: str, action_value: AttrType = None) -> Self:
         """Match Activity on given attribute, with value."""
         self._actions.append(action)
+        _TranslatorsGeneration.changed()
         return self.eq(action, action_value) if action_value is not None else self
 
     def matches(self, ent_attr: BleAdvEntAttr) -> bool:
@@ -208,6 +320,14 @@ class EntityMatcher(CommonMatcher):
             and all(ent_attr.attrs.get(attr) <= val for attr, val in self.maxs.items())  # type: ignore[none]
         )
 
+    def dispatch_keys(self) -> list[tuple[str, int, str]]:
+        """Get the (base_type, index, action) keys this matcher can match."""
+        return [(self._base_type, self._index, action) for action in self._actions]
+
+    def compile_checks(self) -> Callable[[BleAdvEntAttr], bool]:
+        """Compile the attribute checks, to be used once the keys matched."""
+        return self._compile_checks(lambda ent_attr, attr: ent_attr.attrs.get(attr))
+
     def create(self) -> BleAdvEntAttr:
         """Create Ble Adv Entity Features from self."""
         ent_attr: BleAdvEntAttr = BleAdvEntAttr(self._actions.copy(), self.eqs.copy(), self._base_type, self._index)
@@ -322,6 +442,15 @@ class EncoderMatcher(CommonMatcher):
             and all(getattr(enc_cmd, attr) <= val for attr, val in self.maxs.items())
         )
 
+    @property
+    def cmd(self) -> int:
+        """Command matched."""
+        return self._cmd
+
+    def compile_checks(self) -> Callable[[BleAdvEncCmd], bool]:
+        """Compile the attribute checks, to be used once the cmd matched."""
+        return self._compile_checks(getattr)
+
     def create(self) -> BleAdvEncCmd:
         """Create a Ble Adv Encoder Cmd from self."""
         enc_cmd: BleAdvEncCmd = BleAdvEncCmd(self._cmd)
@@ -348,21 +477,25 @@ class Trans:
     def copy(self, attr_ent: str, attr_enc: str, factor: float = 1.0) -> Self:
         """Apply copy from attr_ent to attr_enc, with factor."""
         self._copies.append((attr_ent, attr_enc, factor))
+        _TranslatorsGeneration.changed()
         return self
 
     def split_copy(self, attr_ent: str, dests: list[str], factor: float = 1.0, modulo: int = 256) -> Self:
         """Split the value in src iteratively to dests with each time applying a modulo."""
         self._scopy = (attr_ent, dests, factor, modulo)
+        _TranslatorsGeneration.changed()
         return self
 
     def no_direct(self) -> Self:
         """Do not consider this translator for direct translation."""
         self.direct = False
+        _TranslatorsGeneration.changed()
         return self
 
     def no_reverse(self) -> Self:
         """Do not consider this translator for reverse translation."""
         self.reverse = False
+        _TranslatorsGeneration.changed()
         return self
 
     def matches_ent(self, ent_attr: BleAdvEntAttr) -> bool:
@@ -401,12 +534,72 @@ class Trans:
 
 
 class TranslatorSet(list[Trans]):
-    """Set of translator."""
+    """Set of translator.
+
+    The translators are compiled on first use into dispatch tables:
+        - direct: by (base_type, index, action), with the translator position in the set to keep its order
+        - reverse: by encoder cmd
+    The tables are rebuilt on first use after any change of the set or of a translator / matcher, whatever the set.
+    """
 
     def __init__(self, translators: list[Trans] | None = None) -> None:
+        super().__init__()
+        self._compiled_gen: int = -1
+        self._direct: dict[tuple[str, int, str], list[tuple[int, Trans, Callable[[BleAdvEntAttr], bool]]]] = {}
+        self._reverse: dict[int, list[tuple[Trans, Callable[[BleAdvEncCmd], bool]]]] = {}
+        self._features: dict[str, list[dict[str, set[Any]]]] = {}
         if translators is not None:
             self.add_translators(translators)
 
+    def _compile(self) -> None:
+        if self._compiled_gen == (generation := _TranslatorsGeneration.value):
+            return
+        self._direct = {}
+        self._reverse = {}
+        self._features = {}
+        for pos, trans in enumerate(self):
+            if trans.direct:
+                ent_check = trans.ent.compile_checks()
+                for key in trans.ent.dispatch_keys():
+                    self._direct.setdefault(key, []).append((pos, trans, ent_check))
+            if trans.reverse:
+                self._reverse.setdefault(trans.enc.cmd, []).append((trans, trans.enc.compile_checks()))
+        self._compiled_gen = generation
+
+    def ent_to_enc(self, ent_attr: BleAdvEntAttr) -> list[BleAdvEncCmd]:
+        """Convert Entity Attributes to list of Encoder Attributes, using the direct table."""
+        self._compile()
+        candidates: dict[int, tuple[Trans, Callable[[BleAdvEntAttr], bool]]] = {}
+        for attr in ent_attr.chg_attrs:
+            for pos, trans, ent_check in self._direct.get((ent_attr.base_type, ent_attr.index, attr), ()):
+                candidates[pos] = (trans, ent_check)
+        return [trans.ent_to_enc(ent_attr) for trans, ent_check in (candidates[pos] for pos in sorted(candidates)) if ent_check(ent_attr)]
+
+    def enc_to_ent(self, enc_cmd: BleAdvEncCmd) -> list[BleAdvEntAttr]:
+        """Convert Encoder Attributes to list of Entity Attributes, using the reverse table."""
+        self._compile()
+        return [trans.enc_to_ent(enc_cmd) for trans, enc_check in self._reverse.get(enc_cmd.cmd, ()) if enc_check(enc_cmd)]
+
+    def get_supported_features(self, base_type: str) -> list[dict[str, set[Any]]]:
+        """Get the features supported by the translators in DIRECT mode only, cached by base_type. See BleAdvCodec."""
+        self._compile()
+        if (capa := self._features.get(base_type)) is not None:
+            return capa
+        capa = []
+        for trans in self:
+            if not trans.direct:
+                continue
+            (bt, ind, feats) = trans.ent.get_supported_features()
+            if bt == base_type:
+                missing = ind - len(capa) + 1
+                if missing > 0:
+                    capa = capa + [{} for i in range(missing)]
+                for feat, val in feats.items():
+                    if val is not None:
+                        capa[ind].setdefault(feat, set()).add(val)
+        self._features[base_type] = capa
+        return capa
+
     def add_translators(self, translators: list[Trans]) -> Self:
         """Add Translators."""
         self.extend(translators)
@@ -418,6 +611,19 @@ class TranslatorSet(list[Trans]):
         return self
 
 
+def _changing(method: Callable[..., Any]) -> Callable[..., Any]:
+    @wraps(method)
+    def _changing_method(*args: Any, **kwargs: Any) -> Any:  # noqa: ANN401
+        _TranslatorsGeneration.changed()
+        return method(*args, **kwargs)
+
+    return _changing_method
+
+
+for _name in ("__setitem__", "__delitem__", "__iadd__", "__imul__", "append", "extend", "insert", "pop", "remove", "clear", "sort", "reverse"):
+    setattr(TranslatorSet, _name, _changing(getattr(list, _name)))
+
+
 class BleAdvCodec(ABC):
     """Class representing a base encoder / decoder."""
 
@@ -533,24 +739,13 @@ class BleAdvCodec(ABC):
                 {attr_name1: set(value011 value012, ...), attr_name2: set(value021 value022, ...),}, # For entity 0 of type base_type
                 {attr_name1: set(value111 value112, ...), attr_name2: set(value121 value122, ...),}, # For entity 1 of type base_type
            ]
+        The result is cached by the translator set and must not be modified.
         """
-        capa: list[dict[str, set[Any]]] = []
-        for trans in self.get_translators(translator_set_name):
-            if not trans.direct:
-                continue
-            (bt, ind, feats) = trans.ent.get_supported_features()
-            if bt == base_type:
-                missing = ind - len(capa) + 1
-                if missing > 0:
-                    capa = capa + [{} for i in range(missing)]
-                for feat, val in feats.items():
-                    if val is not None:
-                        capa[ind].setdefault(feat, set()).add(val)
-        return capa
+        return self.get_translators(translator_set_name).get_supported_features(base_type)
 
     def ent_to_enc(self, ent_attr: BleAdvEntAttr, translator_set_name: str) -> list[BleAdvEncCmd]:
         """Convert Entity Attributes to list of Encoder Attributes."""
-        return [trans.ent_to_enc(ent_attr) for trans in self.get_translators(translator_set_name) if trans.matches_ent(ent_attr)]
+        return self.get_translators(translator_set_name).ent_to_enc(ent_attr)
 
     def consolidate(self, enc_cmd: BleAdvEncCmd, __: BleAdvEncCmd | None) -> BleAdvEncCmd | None:  # enc_cmd is first param, prev_cmd is second
         """Check if the enc_cmd should be kept, discarded or updated based on prev_cmd. Returns None if to be discarded."""
@@ -558,20 +753,31 @@ class BleAdvCodec(ABC):
 
     def enc_to_ent(self, enc_cmd: BleAdvEncCmd, translator_set_name: str) -> list[BleAdvEntAttr]:
         """Convert Encoder Attributes to list of Entity Attributes."""
-        return [trans.enc_to_ent(enc_cmd) for trans in self.get_translators(translator_set_name) if trans.matches_enc(enc_cmd)]
+        return self.get_translators(translator_set_name).enc_to_ent(enc_cmd)
+
+    def signature(self) -> tuple[int, int, int, bytes]:
+        """Get the static signature of the advs this codec can decode: (ble_type, full length, header start position, header)."""
+        full_len = self._header_start_pos + len(self._header) + self._len + len(self._footer)
+        return self._ble_type, full_len, self._header_start_pos, bytes(self._header)
 
     def decode_adv(self, adv: BleAdvAdvertisement) -> tuple[BleAdvEncCmd | None, BleAdvConfig | None]:
-        """Decode Adv into Encoder Attributes / Config."""
-        last_pos = len(adv.raw) - len(self._footer)
+        """Decode Adv into Encoder Attributes / Config.
+
+        Header and footer are checked in place, the payload is only copied once all the checks passed.
+        """
+        raw = adv.raw
+        header_end = self._header_start_pos + len(self._header)
+        last_pos = len(raw) - len(self._footer)
         if (
             not self.is_eq(self._ble_type, adv.ble_type, "BLE Type")
-            or not self.is_eq(self._len, last_pos - len(self._header) - self._header_start_pos, "Length")
-            or not self.is_eq_buf(self._header, adv.raw[self._header_start_pos :], "Header")
-            or not self.is_eq_buf(self._footer, adv.raw[last_pos:], "footer")
+            or not self.is_eq(self._len, last_pos - header_end, "Length")
+            or not self.is_eq_at(self._header, raw, self._header_start_pos, "Header")
+            or not self.is_eq_at(self._footer, raw, last_pos, "footer")
         ):
             return None, None
-        self.log_buffer(adv.raw, "Decode/Full")
-        read_buffer = self.decrypt(adv.raw[: self._header_start_pos] + adv.raw[self._header_start_pos + len(self._header) : last_pos])
+        self.log_buffer(raw, "Decode/Full")
+        raw_view = memoryview(raw)
+        read_buffer = self.decrypt(b"".join((raw_view[: self._header_start_pos], raw_view[header_end:last_pos])))
         if read_buffer is None or not self.is_eq_buf(self._prefix, read_buffer, "Prefix"):
             return None, None
         read_buffer = read_buffer[len(self._prefix) :]
@@ -611,6 +817,14 @@ class BleAdvCodec(ABC):
             return False
         return True
 
+    def is_eq_at(self, ref_buf: bytes, comp_buf: bytes, pos: int, msg: str) -> bool:
+        """Check buffer equal at position, without copy, and log if not."""
+        if comp_buf.startswith(ref_buf, pos):
+            return True
+        if self.debug_mode:
+            _LOGGER.debug(f"[{self.codec_id}] '{msg}' differs - expected: {as_hex(ref_buf)}, received: {as_hex(comp_buf[pos : pos + len(ref_buf)])}")
+        return False
+
     def log_buffer(self, buf: bytes, msg: str) -> None:
         """Log buffer."""
         if self.debug_mode:
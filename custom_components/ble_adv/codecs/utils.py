@@ -1,20 +1,94 @@
 """Utils for codecs."""
 
+from binascii import crc_hqx
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from functools import lru_cache
+from typing import Any
 
-def whiten(buffer: bytes, seed: int) -> bytes:
-    """Whiten / Unwiten buffer with seed."""
-    obuf = []
-    r = seed
-    for val in buffer:
-        b = 0
-        for j in range(8):
-            r <<= 1
-            if r & 0x80:
-                r ^= 0x11
-                b |= 1 << j
-            r &= 0x7F
-        obuf.append(val ^ b)
-    return bytes(obuf)
+
+@lru_cache(maxsize=128)
+def _whiten_keystream(seeds: tuple[int, ...], length: int) -> int:
+    """Compute the whitening keystream of the chained seeds for a buffer of given length, as a big endian int."""
+    keystream = bytearray(length)
+    for seed in seeds:
+        r = seed
+        for i in range(length):
+            b = 0
+            for j in range(8):
+                r <<= 1
+                if r & 0x80:
+                    r ^= 0x11
+                    b |= 1 << j
+                r &= 0x7F
+            keystream[i] ^= b
+    return int.from_bytes(keystream)
+
+
+def whiten(buffer: bytes, *seeds: int) -> bytes:
+    """Whiten / Unwiten buffer with seed, or with several chained seeds.
+
+    The keystream only depends on the seeds and the buffer length, it is cached and applied with a single XOR.
+    """
+    length = len(buffer)
+    return (int.from_bytes(buffer) ^ _whiten_keystream(seeds, length)).to_bytes(length)
+
+
+class LruCache:
+    """Bounded LRU cache, with hit / miss counters."""
+
+    def __init__(self, maxsize: int) -> None:
+        self._items: OrderedDict[Hashable, Any] = OrderedDict()
+        self.maxsize: int = maxsize
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def resize(self, maxsize: int) -> None:
+        """Change the max number of cached items, evicting the least recently used ones if needed."""
+        self.maxsize = maxsize
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        """Clear the cached items and the counters."""
+        self._items.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, create: Callable[[], Any]) -> Any:  # noqa: ANN401
+        """Get the item from the cache, or create it and cache it."""
+        if (item := self._items.get(key)) is not None:
+            self.hits += 1
+            self._items.move_to_end(key)
+            return item
+        self.misses += 1
+        item = create()
+        if self.maxsize > 0:
+            self._items[key] = item
+            if len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return item
+
+    def stats(self) -> dict[str, Any]:
+        """Get the cache statistics."""
+        return {"size": len(self._items), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+class KeystreamCache(LruCache):
+    """Bounded LRU cache of keystreams, applied to buffers with a single XOR.
+
+    The keystreams are built by the generator from the key params and the buffer length.
+    """
+
+    def __init__(self, generator: Callable[..., bytes], maxsize: int) -> None:
+        super().__init__(maxsize)
+        self._generator: Callable[..., bytes] = generator
+
+    def xor(self, buffer: bytes, *params: int) -> bytes:
+        """XOR the buffer with the keystream built from params."""
+        length = len(buffer)
+        keystream = self.get((*params, length), lambda: int.from_bytes(self._generator(*params, length)))
+        return (int.from_bytes(buffer) ^ keystream).to_bytes(length)
 
 
 def reverse_byte(x: int) -> int:
@@ -24,19 +98,74 @@ def reverse_byte(x: int) -> int:
     return ((x & 0x0F) << 4) | ((x & 0xF0) >> 4)
 
 
+_REVERSE_TABLE = bytes([reverse_byte(x) for x in range(256)])
+
+
+def reverse_short(x: int) -> int:
+    """Reverse a 16 bits integer: 1100 1010 0000 0001 => 1000 0000 0101 0011."""
+    return (_REVERSE_TABLE[x & 0xFF] << 8) | _REVERSE_TABLE[(x >> 8) & 0xFF]
+
+
 def reverse_all(buffer: bytes) -> bytes:
     """Reverse All bytes in buffer."""
-    return bytes([reverse_byte(x) for x in buffer])
+    return bytes(buffer).translate(_REVERSE_TABLE)
+
+
+class Crc16:
+    """Table driven CRC16 supporting any polynomial, seed, input and output reflection.
+
+    The polynomial is given in its normal (MSB first) form, the seed is the initial value of the CRC register.
+    The CCITT polynomial 0x1021 is computed by the C implementation of binascii, on reversed bytes if reflected.
+    """
+
+    CCITT_POLY: int = 0x1021
+
+    def __init__(self, poly: int, ref_in: bool = False, ref_out: bool = False, xor_out: int = 0x0000) -> None:
+        self.poly: int = poly
+        self.ref_in: bool = ref_in
+        self.ref_out: bool = ref_out
+        self.xor_out: int = xor_out
+        self._table: tuple[int, ...] = tuple(self._ref_entry(x, reverse_short(poly)) if ref_in else self._entry(x, poly) for x in range(256))
+
+    @staticmethod
+    def _entry(byte: int, poly: int) -> int:
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly) if crc & 0x8000 else (crc << 1)
+        return crc & 0xFFFF
+
+    @staticmethod
+    def _ref_entry(byte: int, ref_poly: int) -> int:
+        crc = byte
+        for _ in range(8):
+            crc = ((crc >> 1) ^ ref_poly) if crc & 0x0001 else (crc >> 1)
+        return crc
+
+    def __call__(self, buffer: bytes, seed: int) -> int:
+        """Compute the CRC of the buffer starting from seed."""
+        if self.poly == self.CCITT_POLY:
+            crc = reverse_short(crc_hqx(reverse_all(buffer), reverse_short(seed))) if self.ref_in else crc_hqx(buffer, seed)
+        elif self.ref_in:
+            table = self._table
+            crc = seed
+            for byte in buffer:
+                crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+        else:
+            table = self._table
+            crc = seed
+            for byte in buffer:
+                crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ byte]
+        if self.ref_in != self.ref_out:
+            crc = reverse_short(crc)
+        return crc ^ self.xor_out
+
+
+@lru_cache(maxsize=8)
+def _crc16_le_engine(poly: int) -> Crc16:
+    return Crc16(reverse_short(poly), ref_in=True, ref_out=True)
 
 
 def crc16_le(buffer: bytes, seed: int, poly: int = 0x8408, ref_in: bool = True, ref_out: bool = True) -> int:
     """CRC16 ISO14443AB computing."""
-    crc = seed if not ref_in else seed ^ 0xFFFF
-    for byte in buffer:
-        crc = crc ^ byte
-        for _ in range(8):
-            if crc & 0x0001:
-                crc = (crc >> 1) ^ poly
-            else:
-                crc = crc >> 1
+    crc = _crc16_le_engine(poly)(buffer, seed if not ref_in else seed ^ 0xFFFF)
     return crc if not ref_out else crc ^ 0xFFFF
@@ -66,7 +66,7 @@ class ZhijiaEncoderV0(ZhijiaEncoder):
 
     def decrypt(self, buffer: bytes) -> bytes | None:
         """Decrypt / unwhiten an incoming raw buffer into a readable buffer."""
-        decoded_base = whiten(whiten(buffer, 0x37), 0x7F)
+        decoded_base = whiten(buffer, 0x37, 0x7F)
         if not self.is_eq(int.from_bytes(decoded_base[-2:], "little"), self._crc16(decoded_base[:-2], 0), "CRC"):
             return None
         return decoded_base[:-2]
@@ -75,7 +75,7 @@ class ZhijiaEncoderV0(ZhijiaEncoder):
         """Encrypt / whiten a readable buffer."""
         decoded_base = bytearray(buffer)
         decoded_base += self._crc16(decoded_base, 0).to_bytes(2, "little")
-        return whiten(whiten(decoded_base, 0x7F), 0x37)
+        return whiten(decoded_base, 0x7F, 0x37)
 
     def convert_to_enc(self, decoded: bytes) -> tuple[BleAdvEncCmd | None, BleAdvConfig | None]:
         """Convert a readable buffer into an encoder command and a config."""
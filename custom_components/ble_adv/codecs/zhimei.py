@@ -43,7 +43,7 @@ from .models import (
     Trans,
 )
 from .models import EncoderMatcher as EncCmd
-from .utils import reverse_all, reverse_byte, whiten
+from .utils import Crc16, whiten
 
 
 class ZhimeiEncoderV0(BleAdvCodec):
@@ -164,9 +164,10 @@ class ZhimeiEncoderV2(BleAdvCodec):
         super().__init__()
         self.footer([0x10, 0x11, 0x12, 0x13, 0x14, 0x15, 0x16, 0x17, 0x18, 0x19])
 
+    CRC: ClassVar[Crc16] = Crc16(0x1021, ref_in=True, ref_out=True, xor_out=0xFFFF)  # CRC-16/X-25
+
     def _crc16(self, buffer: bytes) -> int:
-        pre_cec: int = crc_hqx(reverse_all(buffer), 0xFFFF)
-        return 0xFFFF ^ (((reverse_byte(pre_cec & 0xFF) << 8) & 0xFF00) | (reverse_byte(pre_cec >> 8) & 0xFF))
+        return self.CRC(buffer, 0xFFFF)
 
     def decrypt(self, buffer: bytes) -> bytes | None:
         """Decrypt / unwhiten an incoming raw buffer into a readable buffer."""
@@ -74,10 +74,15 @@ from .const import (
     CONF_REVERSED,
     CONF_TECHNICAL,
     CONF_TRANS_SET,
+    CONF_TX_ADAPTERS,
+    CONF_TX_POLICY,
     CONF_TYPE_NONE,
     CONF_USE_DIR,
     CONF_USE_OSC,
     DOMAIN,
+    TX_POLICY_ALL,
+    TX_POLICY_BEST_N,
+    TX_POLICY_LEAST_LOADED,
 )
 from .coordinator import BleAdvBaseDevice, BleAdvCoordinator
 
@@ -377,6 +382,10 @@ class BleAdvConfigFlow(ConfigFlow, domain=DOMAIN):
         duration = duration if duration is not None else codec.duration
         return BleAdvBaseDevice(self.coordinator, name, config.codec_id, [adapter_id], codec.repeat, codec.interval, duration, config)
 
+    async def _async_advertise(self, device: BleAdvBaseDevice, ent_attr: BleAdvEntAttr, min_duration: float = 0.0) -> None:
+        """Advertise and wait for the advertising to be processed by all the adapters, and at least for min_duration."""
+        await asyncio.gather(asyncio.sleep(min_duration), *(await device.advertise(ent_attr)))
+
     async def async_blink_light(self) -> None:
         """Blink."""
         self._add_diag(f"Start blink - {self._confs.selected_adapter()} / {self._confs.selected()}.")
@@ -384,17 +393,13 @@ class BleAdvConfigFlow(ConfigFlow, domain=DOMAIN):
         on_cmd = BleAdvEntAttr([ATTR_ON], {ATTR_ON: True}, LIGHT_TYPE, 0)
         off_cmd = BleAdvEntAttr([ATTR_ON], {ATTR_ON: False}, LIGHT_TYPE, 0)
         self.async_update_progress(0)
-        await tmp_device.advertise(on_cmd)
-        await asyncio.sleep(1)
+        await self._async_advertise(tmp_device, on_cmd, 1)
         self.async_update_progress(0.25)
-        await tmp_device.advertise(off_cmd)
-        await asyncio.sleep(1)
+        await self._async_advertise(tmp_device, off_cmd, 1)
         self.async_update_progress(0.50)
-        await tmp_device.advertise(on_cmd)
-        await asyncio.sleep(1)
+        await self._async_advertise(tmp_device, on_cmd, 1)
         self.async_update_progress(0.75)
-        await tmp_device.advertise(off_cmd)
-        await asyncio.sleep(1)
+        await self._async_advertise(tmp_device, off_cmd, 1)
         self.async_update_progress(1)
         self._add_diag("Stop blink.")
 
@@ -405,9 +410,7 @@ class BleAdvConfigFlow(ConfigFlow, domain=DOMAIN):
         adapter_id = self._confs.selected_adapter()
         for i, config in enumerate(self._confs.selected_confs()):
             tmp_device: BleAdvBaseDevice = self._get_device(f"cf{i}", adapter_id, config, 300)
-            await tmp_device.advertise(pair_cmd)
-            await asyncio.sleep(0.3)
-        await asyncio.sleep(2)
+            await self._async_advertise(tmp_device, pair_cmd)
         self._add_diag("Stop pair.")
 
     def _create_api_view(self, response: web.Response) -> str:
@@ -432,6 +435,7 @@ class BleAdvConfigFlow(ConfigFlow, domain=DOMAIN):
         """Handle the user step to setup a device."""
         self._add_diag("Config flow 'user' started.")
         self.coordinator: BleAdvCoordinator = await get_coordinator(self.hass)
+        await self.hass.async_add_executor_job(self.coordinator.codecs.warm_all)  # the flow may use any codec
         if not self.coordinator.has_available_adapters():
             return await self.async_step_no_adapters()
         return self.async_show_menu(step_id="user", menu_options=["wait_config", "pair", "tools"])
@@ -826,6 +830,12 @@ class BleAdvConfigFlow(ConfigFlow, domain=DOMAIN):
                 vol.Optional(CONF_REPEATS, default=def_tech[CONF_REPEATS]): selector.NumberSelector(
                     selector.NumberSelectorConfig(step=1, min=1, max=20, mode=selector.NumberSelectorMode.BOX)
                 ),
+                vol.Required(CONF_TX_POLICY, default=def_tech.get(CONF_TX_POLICY, TX_POLICY_ALL)): self._get_selector(
+                    CONF_TX_POLICY, [TX_POLICY_ALL, TX_POLICY_LEAST_LOADED, TX_POLICY_BEST_N]
+                ),
+                vol.Optional(CONF_TX_ADAPTERS, default=def_tech.get(CONF_TX_ADAPTERS, 2)): selector.NumberSelector(
+                    selector.NumberSelectorConfig(step=1, min=1, max=5, mode=selector.NumberSelectorMode.BOX)
+                ),
             }
         )
         return self.async_show_form(step_id="config_technical", data_schema=data_schema, errors=errors)
@@ -848,6 +858,7 @@ class BleAdvConfigFlow(ConfigFlow, domain=DOMAIN):
         """Reconfigure Step."""
         self._add_diag("'Reconfigure' flow started")
         self.coordinator = await get_coordinator(self.hass)
+        await self.hass.async_add_executor_job(self.coordinator.codecs.warm_all)  # the flow may use any codec
         self._data = {**self._get_reconfigure_entry().data}
         return await self.async_step_configure()
 
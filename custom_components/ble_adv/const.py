@@ -3,10 +3,11 @@
 from homeassistant.const import Platform
 
 DOMAIN = "ble_adv"
-PLATFORMS = [Platform.LIGHT, Platform.FAN, Platform.EVENT, Platform.SWITCH]
+PLATFORMS = [Platform.LIGHT, Platform.FAN, Platform.EVENT, Platform.SWITCH, Platform.SENSOR]
 
 EVENT_TYPE = "event"
 SILENT_SWITCH_TYPE = "silent"
+ADAPTER_SENSOR_TYPE = "adapter"
 
 CONF_COORDINATOR_ID = "coordinator_unique_id"
 
@@ -16,6 +17,12 @@ CONF_IGN_ADAPTERS = "ignored_adapters"
 CONF_IGN_DURATION = "ignored_duration"
 CONF_IGN_CIDS = "ignored_cids"
 CONF_IGN_MACS = "ignored_macs"
+CONF_KEYSTREAM_CACHE_SIZE = "keystream_cache_size"
+CONF_CAPTURE_FILE = "capture_file"
+CONF_CAPTURE_MAX_SIZE = "capture_max_size"
+CONF_CAPTURE_BACKUPS = "capture_backups"
+CONF_CAPTURE_RING_SIZE = "capture_ring_size"
+CONF_DEBOUNCE = "debounce"
 
 CONF_INDEX = "index"
 CONF_CODEC_ID = "codec_id_dyn"
@@ -33,6 +40,8 @@ CONF_INTERVAL = "interval"
 CONF_REPEAT = "repeat"
 CONF_REPEATS = "repeats"
 CONF_DURATION = "duration"
+CONF_TX_POLICY = "tx_policy"
+CONF_TX_ADAPTERS = "tx_adapters"
 CONF_FORCED_CMDS = "forced_cmds"
 CONF_FORCED_ON = "turn_on"
 CONF_FORCED_OFF = "turn_off"
@@ -50,6 +59,9 @@ CONF_LIGHTS = "lights"
 CONF_FANS = "fans"
 CONF_REMOTE = "remote"
 CONF_PAIRED = "paired"
+TX_POLICY_ALL = "all"
+TX_POLICY_LEAST_LOADED = "least_loaded"
+TX_POLICY_BEST_N = "best_n"
 CONF_MAX_ENTITY_NB = 3  # The max nb of entity that the config can handle in translations json files
 
 # Taken from https://www.bluetooth.com/specifications/assigned-numbers/
@@ -2,23 +2,40 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import sys
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterable, Iterator
 from copy import copy
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+from heapq import heapify, heappop, heappush
+from pathlib import Path
+from time import monotonic
 from typing import Any
 
 from homeassistant.components.diagnostics import async_format_manifest
-from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.const import CONF_FILE_PATH, EVENT_HOMEASSISTANT_STOP
 from homeassistant.core import Event, HomeAssistant
 from homeassistant.helpers.system_info import async_get_system_info
 from homeassistant.loader import async_get_integration
 
-from .adapters import BleAdvBtHciManager, BleAdvQueueItem
-from .codecs import codec_from_dyn_base
+from .adapters import PRIO_COMMAND, BleAdvAdapter, BleAdvBtHciManager, BleAdvQueueItem
+from .capture import BleAdvCaptureRecord, BleAdvCaptureRecorder, BleAdvCaptureRing
+from .codecs import BleAdvCodecRegistry, codec_from_dyn_base, get_cache_stats
 from .codecs.models import BleAdvAdvertisement, BleAdvCodec, BleAdvConfig, BleAdvEncCmd, BleAdvEntAttr
-from .const import CONF_ADAPTER_ID, CONF_DEVICE_QUEUE, CONF_DURATION, CONF_INTERVAL, CONF_RAW, CONF_REPEAT, DOMAIN
+from .const import (
+    CONF_ADAPTER_ID,
+    CONF_DEVICE_QUEUE,
+    CONF_DURATION,
+    CONF_INTERVAL,
+    CONF_RAW,
+    CONF_REPEAT,
+    DOMAIN,
+    TX_POLICY_ALL,
+    TX_POLICY_BEST_N,
+)
 from .esp_adapters import BleAdvEspBtManager
 
 _LOGGER = logging.getLogger(__name__)
@@ -47,6 +64,11 @@ class BleAdvBaseDevice:
         self.repeat: int = repeat
         self.interval: int = interval
         self.duration: int = duration
+        self.tx_policy: str = TX_POLICY_ALL
+        self.tx_adapters: int = 2  # number of adapters used by the TX_POLICY_BEST_N policy
+        self._tx_seq: int = 0
+        self._last_tx: dict[Hashable, int] = {}  # sequence of the last command applied by key and by (entity, class)
+        self._fallback_tasks: set[asyncio.Task] = set()
 
         self.in_use_codec_ids: set[str] = set()
         self._listeners: list[tuple[str, BleAdvConfig, bool]] = []
@@ -72,7 +94,23 @@ class BleAdvBaseDevice:
     def add_listener(self, codec_id: str, config: BleAdvConfig, control_device: bool) -> None:
         """Add a listener to this device."""
         self.in_use_codec_ids.add(codec_id)
-        self._listeners.append((self.coordinator.codecs[codec_id].match_id, config, control_device))
+        self._listeners.append((self.coordinator.codecs.match_id(codec_id), config, control_device))
+        self.coordinator.update_device(self)
+
+    def routes(self) -> dict[tuple[str, int, int, str], bool]:
+        """Get the routes to this device.
+
+        Return a dict with:
+            - key: (match_id, config id, config index, adapter_id) of each listener and adapter
+            - value: True if all the listeners matching this key control the device.
+
+        """
+        routes: dict[tuple[str, int, int, str], bool] = {}
+        for m_id, conf, ct in self._listeners:
+            for adapter_id in self.adapter_ids:
+                key = (m_id, conf.id, conf.index, adapter_id)
+                routes[key] = routes.get(key, True) and ct
+        return routes
 
     def match(self, match_id: str, adapter_id: str, config: BleAdvConfig) -> bool | None:
         """Match a given adapter / config.
@@ -98,22 +136,68 @@ class BleAdvBaseDevice:
     async def async_on_command(self, ent_attrs: list[BleAdvEntAttr], publish_command: bool) -> None:
         """Call on matching command received."""
 
-    async def apply_cmd(self, enc_cmd: BleAdvEncCmd) -> None:
-        """Apply command."""
+    def tx_adapter_ids(self) -> list[str]:
+        """Select the adapters to advertise on from the TX policy: all of them, or the available ones with the lowest estimated delay."""
+        if self.tx_policy == TX_POLICY_ALL or len(self.adapter_ids) < 2:
+            return list(self.adapter_ids)
+        delays = {x: delay for x in sorted(self.adapter_ids) if (delay := self.coordinator.adapter_tx_delay(x)) is not None}
+        if not delays:
+            return list(self.adapter_ids)
+        return sorted(delays, key=lambda x: delays[x])[: self.tx_adapters if self.tx_policy == TX_POLICY_BEST_N else 1]
+
+    async def _enqueue(
+        self, adapter_ids: list[str], enc_cmd: BleAdvEncCmd, raws: list[bytes], priority: int, entity: Hashable | None
+    ) -> list[asyncio.Future[bool]]:
+        completions = []
+        for adapter_id in adapter_ids:
+            qi = BleAdvQueueItem(enc_cmd.cmd, self.repeat, self.duration, self.interval, raws, self.codec.ign_duration, priority, entity)
+            completions.append(await self.coordinator.advertise(adapter_id, self.unique_id, qi))
+        return completions
+
+    async def apply_cmd(self, enc_cmd: BleAdvEncCmd, priority: int = PRIO_COMMAND, entity: Hashable | None = None) -> list[asyncio.Future[bool]]:
+        """Apply command, returning the completion futures of the advertising on the adapters selected by the TX policy.
+
+        The entity changed allows the command to preempt the pending ones of the same entity and a lower class.
+
+        If none of the selected adapters transmits the command, it is advertised on all the other adapters,
+        unless a newer command with the same key, or with the same entity and a higher class, was applied meanwhile.
+        """
         self.config.seed = 0
         advs: list[BleAdvAdvertisement] = self.codec.encode_advs(enc_cmd, self.config)
-        for adapter_id in self.adapter_ids:
-            qi = BleAdvQueueItem(enc_cmd.cmd, self.repeat, self.duration, self.interval, [x.to_raw() for x in advs], self.codec.ign_duration)
-            await self.coordinator.advertise(adapter_id, self.unique_id, qi)
-
-    async def advertise(self, ent_attr: BleAdvEntAttr) -> None:
-        """Encode and Advertise a message."""
+        raws = [x.to_raw() for x in advs]
+        self._tx_seq += 1
+        seq = self._last_tx[enc_cmd.cmd] = self._tx_seq
+        if entity is not None:
+            self._last_tx[(entity, priority)] = seq
+        selected = self.tx_adapter_ids()
+        completions = await self._enqueue(selected, enc_cmd, raws, priority, entity)
+        if others := [x for x in self.adapter_ids if x not in selected]:
+            pending = set(completions)
+
+            def _on_completion(completion: asyncio.Future[bool]) -> None:
+                pending.discard(completion)
+                if pending or any(not x.cancelled() and x.result() for x in completions):
+                    return
+                if self._last_tx.get(enc_cmd.cmd) != seq or any(self._last_tx.get((entity, prio), 0) > seq for prio in range(priority)):
+                    return  # superseded or preempted by a newer command
+                task = asyncio.get_running_loop().create_task(self._enqueue(others, enc_cmd, raws, priority, entity))
+                self._fallback_tasks.add(task)
+                task.add_done_callback(self._fallback_tasks.discard)
+
+            for completion in completions:
+                completion.add_done_callback(_on_completion)
+        return completions
+
+    async def advertise(self, ent_attr: BleAdvEntAttr, priority: int = PRIO_COMMAND) -> list[asyncio.Future[bool]]:
+        """Encode and Advertise a message with the given priority class, returning the completion futures of the advertising.
+
+        The message preempts the pending ones of the same entity and a lower class: a turn off drops the pending brightness changes.
+        """
         enc_cmds = self.codec.ent_to_enc(ent_attr, self.translator_set)
-        for enc_cmd in enc_cmds:
-            await self.apply_cmd(enc_cmd)
+        return [completion for enc_cmd in enc_cmds for completion in await self.apply_cmd(enc_cmd, priority, ent_attr.id)]
 
 
-@dataclass
+@dataclass(slots=True)
 class BleAdvRecvItem:
     """Received Adv and its related info."""
 
@@ -124,13 +208,70 @@ class BleAdvRecvItem:
     enc_cmd: BleAdvEncCmd
 
 
+class BleAdvExpiringMap:
+    """Map of items expiring at a given monotonic time, capped in size.
+
+    Expiry is handled by a heap with lazy deletion: amortized O(1) per item instead of a full scan.
+    When the max size is reached, the Least Recently Used item is evicted.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size: int = max_size
+        self._items: OrderedDict[bytes, tuple[float, Any]] = OrderedDict()
+        self._heap: list[tuple[float, bytes]] = []
+
+    def __contains__(self, key: bytes) -> bool:
+        return key in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: bytes) -> Any:  # noqa: ANN401
+        """Get the value of a non expired item, None if not present."""
+        if (item := self._items.get(key)) is None:
+            return None
+        self._items.move_to_end(key)
+        return item[1]
+
+    def set(self, key: bytes, value: Any, expiry: float) -> None:  # noqa: ANN401
+        """Add or replace an item, or extend its expiry."""
+        self._items[key] = (expiry, value)
+        self._items.move_to_end(key)
+        heappush(self._heap, (expiry, key))
+        if len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+        if len(self._heap) > 2 * max(self.max_size, 16):
+            # too many outdated entries in the heap (extended / evicted items): rebuild it from the items
+            self._heap = [(exp, x) for x, (exp, _) in self._items.items()]
+            heapify(self._heap)
+
+    def expire(self, now: float) -> None:
+        """Remove the items expired at monotonic time 'now'."""
+        while self._heap and self._heap[0][0] <= now:
+            expiry, key = heappop(self._heap)
+            if (item := self._items.get(key)) is not None and item[0] == expiry:
+                del self._items[key]
+
+    def clear(self) -> None:
+        """Remove all items."""
+        self._items.clear()
+        self._heap.clear()
+
+    def items(self) -> Iterator[tuple[bytes, float, Any]]:
+        """Iterate over the items as (key, expiry, value)."""
+        return ((key, expiry, value) for key, (expiry, value) in self._items.items())
+
+
 class BleAdvCoordinator:
     """Class to manage fetching any BLE ADV data."""
 
+    MAX_RAW_ADVS: int = 2048
+    MAX_DEC_ADVS: int = 512
+
     def __init__(
         self,
         hass: HomeAssistant,
-        codecs: dict[str, BleAdvCodec],
+        codecs: BleAdvCodecRegistry,
         ign_adapters: list[str],
         ign_duration: int,
         ign_cids: list[int],
@@ -138,17 +279,22 @@ class BleAdvCoordinator:
     ) -> None:
         """Init."""
         self.hass: HomeAssistant = hass
-        self.codecs: dict[str, BleAdvCodec] = codecs
+        self.codecs: BleAdvCodecRegistry = codecs
         self.ign_cids: set[int] = set(ign_cids)
         self.ign_macs: set[str] = set(ign_macs)
         self.ign_duration: int = ign_duration
         self.ign_adapters = ign_adapters
 
-        self._raw_last_advs: dict[bytes, datetime] = {}
-        self._dec_last_advs: dict[bytes, BleAdvRecvItem] = {}
+        self.clock: Callable[[], float] = monotonic  # time source of the expiries, a virtual clock for a replay coordinator
+        self.recorder: BleAdvCaptureRecorder | None = None
+        self.debounce: int = 0  # coalescing window of the continuous changes of the devices, in ms, 0 to disable
+        self._raw_last_advs: BleAdvExpiringMap = BleAdvExpiringMap(self.MAX_RAW_ADVS)
+        self._dec_last_advs: BleAdvExpiringMap = BleAdvExpiringMap(self.MAX_DEC_ADVS)
 
         self._devices: list[BleAdvBaseDevice] = []
         self._in_use_codecs: set[str] = set()
+        self._codec_index: dict[tuple[int, int], list[tuple[int, bytes, str]]] = {}
+        self._routes: dict[tuple[str, int, int, str], dict[str, tuple[BleAdvBaseDevice, bool]]] = {}
         self._adapter_macs: set[str] = set()
 
         self._hci_bt_manager: BleAdvBtHciManager = BleAdvBtHciManager(self.handle_raw_adv, self.on_adapter_change, ign_adapters)
@@ -159,9 +305,11 @@ class BleAdvCoordinator:
         self._stop_listening_time: datetime | None = None
         self.listened_raw_advs: list[bytes] = []
         self.listened_decoded_confs: list[tuple[str, str, str, list[Any], BleAdvConfig]] = []
+        self._live: bool = False
 
     async def async_init(self) -> None:
         """Async Init."""
+        self._live = True
         await self._esp_bt_manager.async_init()
         self.hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, self.on_stop_event)
         if not self._hci_bt_manager.supported_by_host:
@@ -177,6 +325,9 @@ class BleAdvCoordinator:
         _LOGGER.info("Cleaning BT Connections.")
         await self._hci_bt_manager.async_final()
         await self._esp_bt_manager.async_final()
+        if (recorder := self.recorder) is not None:
+            self.recorder = None
+            await self.hass.async_add_executor_job(recorder.close)
 
     def get_adapter_ids(self) -> list[str]:
         """List bt adapters."""
@@ -206,18 +357,54 @@ class BleAdvCoordinator:
         return self._stop_listening_time is not None
 
     def start_listening(self, max_duration: float) -> None:
-        """Start listening to raw and decoded ADVs."""
+        """Start listening to raw and decoded ADVs. Only the built codecs decode: warm the codec registry in an executor first."""
         self._stop_listening_time = datetime.now() + timedelta(seconds=max_duration)
         self.listened_raw_advs.clear()
         self.listened_decoded_confs.clear()
 
     def _recompute_in_use_codecs(self) -> None:
-        match_ids = {self.codecs[codec_id].match_id for x in self._devices for codec_id in x.in_use_codec_ids}
-        self._in_use_codecs = {x.codec_id for x in self.codecs.values() if x.match_id in match_ids}
+        # Match ids are known without building the codecs: only the in use codec families get built
+        match_ids = {self.codecs.match_id(codec_id) for x in self._devices for codec_id in x.in_use_codec_ids}
+        in_use_codecs = {codec_id for codec_id in self.codecs if self.codecs.match_id(codec_id) in match_ids}
+        # Update the signature index incrementally: only the codecs no more / newly in use
+        for codec_id in self._in_use_codecs - in_use_codecs:
+            self._unindex_codec(codec_id)
+        for codec_id in in_use_codecs - self._in_use_codecs:
+            self._index_codec(codec_id)
+        self._in_use_codecs = in_use_codecs
+
+    def _index_codec(self, codec_id: str) -> None:
+        ble_type, full_len, header_start_pos, header = self.codecs[codec_id].signature()
+        self._codec_index.setdefault((ble_type, full_len), []).append((header_start_pos, header, codec_id))
+
+    def _unindex_codec(self, codec_id: str) -> None:
+        for key, candidates in list(self._codec_index.items()):
+            self._codec_index[key] = [x for x in candidates if x[2] != codec_id]
+            if not self._codec_index[key]:
+                del self._codec_index[key]
+
+    def _candidate_codecs(self, adv: BleAdvAdvertisement) -> list[BleAdvCodec]:
+        """Get the in use codecs whose signature matches the adv: ble_type, full length and header."""
+        return [
+            self.codecs[codec_id]
+            for header_start_pos, header, codec_id in self._codec_index.get((adv.ble_type, len(adv.raw)), [])
+            if adv.raw.startswith(header, header_start_pos)
+        ]
+
+    def _route_device(self, device: BleAdvBaseDevice) -> None:
+        for key, ct in device.routes().items():
+            self._routes.setdefault(key, {})[device.unique_id] = (device, ct)
+
+    def _unroute_device(self, unique_id: str) -> None:
+        for key, devices in list(self._routes.items()):
+            devices.pop(unique_id, None)
+            if not devices:
+                del self._routes[key]
 
     def add_device(self, device: BleAdvBaseDevice) -> None:
         """Register a device."""
         self._devices.append(device)
+        self._route_device(device)
         self._recompute_in_use_codecs()
         self._raw_last_advs.clear()
         _LOGGER.debug(f"Registered device '{device.unique_id}'")
@@ -225,18 +412,43 @@ class BleAdvCoordinator:
     def remove_device(self, device: BleAdvBaseDevice) -> None:
         """Unregister a device."""
         self._devices = [x for x in self._devices if x.unique_id != device.unique_id]
+        self._unroute_device(device.unique_id)
         self._recompute_in_use_codecs()
         self._dec_last_advs.clear()
         _LOGGER.debug(f"Unregistered device '{device.unique_id}'")
 
-    async def advertise(self, adapter_id: str | None, queue_id: str, qi: BleAdvQueueItem) -> None:
-        """Advertise."""
-        if adapter_id in self._hci_bt_manager.adapters:
-            await self._hci_bt_manager.adapters[adapter_id].enqueue(queue_id, qi)
-        elif adapter_id in self._esp_bt_manager.adapters:
-            await self._esp_bt_manager.adapters[adapter_id].enqueue(queue_id, qi)
-        else:
-            _LOGGER.error(f"Cannot process advertising: adapter '{adapter_id}' is not available.")
+    def update_device(self, device: BleAdvBaseDevice) -> None:
+        """Update the routes and in use codecs of a registered device, following a listener addition."""
+        if device in self._devices:
+            self._unroute_device(device.unique_id)
+            self._route_device(device)
+            self._recompute_in_use_codecs()
+
+    def _get_adapter(self, adapter_id: str | None) -> BleAdvAdapter | None:
+        if adapter_id is None:
+            return None
+        return self._hci_bt_manager.adapters.get(adapter_id, self._esp_bt_manager.adapters.get(adapter_id))
+
+    def adapter_tx_delay(self, adapter_id: str) -> float | None:
+        """Get the estimated delay before a msg advertised now on the adapter is transmitted, None if not available."""
+        if (adapter := self._get_adapter(adapter_id)) is None or not adapter.available:
+            return None
+        return adapter.tx_delay()
+
+    def adapter_stats(self, adapter_id: str) -> dict[str, Any] | None:
+        """Get the queue depth, estimated tx delay and performance counters of the adapter, None if not available."""
+        if (adapter := self._get_adapter(adapter_id)) is None or not adapter.available:
+            return None
+        return {"queued": adapter.nb_queued, "tx_delay": round(adapter.tx_delay(), 3), **adapter.stats.diagnostic_dump()}
+
+    async def advertise(self, adapter_id: str | None, queue_id: str, qi: BleAdvQueueItem) -> asyncio.Future[bool]:
+        """Advertise, returning the completion future of the advertising: True once transmitted, False if not."""
+        if (adapter := self._get_adapter(adapter_id)) is not None:
+            return await adapter.enqueue(queue_id, qi)
+        _LOGGER.error(f"Cannot process advertising: adapter '{adapter_id}' is not available.")
+        completion = asyncio.get_running_loop().create_future()
+        completion.set_result(False)
+        return completion
 
     async def inject_raw(self, dt: dict[str, Any]) -> dict[str, str]:
         """Injects a raw advertisement."""
@@ -252,13 +464,13 @@ class BleAdvCoordinator:
         return {}
 
     def decode_raw(self, raw_adv_str: str) -> list[str]:
-        """Decode a Raw ADV."""
+        """Decode a Raw ADV with the built codecs: warm the codec registry in an executor first."""
         try:
             raw_adv = bytes.fromhex(raw_adv_str.replace(".", ""))
         except ValueError:
             return ["Cannot convert to bytes"]
         adv = BleAdvAdvertisement.FromRaw(raw_adv)
-        for codec_id, acodec in self.codecs.items():
+        for codec_id, acodec in self.codecs.built_items():
             enc_cmd, conf = acodec.decode_adv(adv)
             if conf is not None and enc_cmd is not None:
                 old_codec = codec_from_dyn_base(codec_id, conf.codec_params) if conf.codec_params else codec_id
@@ -271,9 +483,10 @@ class BleAdvCoordinator:
         return ["Could not be decoded by any known codec"]
 
     async def _publish_to_devices(self, adapter_id: str, recv: BleAdvRecvItem) -> None:
-        # Publish to any device that matches, if not already done
-        for device in self._devices:
-            if device.unique_id not in recv.pub_devices and (ct := device.match(recv.codec.match_id, adapter_id, recv.conf)) is not None:
+        # Publish to any device routed from this codec / config / adapter, if not already done
+        routes = self._routes.get((recv.codec.match_id, recv.conf.id, recv.conf.index, adapter_id), {})
+        for device, ct in list(routes.values()):
+            if device.unique_id not in recv.pub_devices:
                 cons_cmd = copy(recv.enc_cmd)  # work on a copy to avoid the alteration of the command
                 if (cons_cmd := recv.codec.consolidate(cons_cmd, device.prev_cmd)) is not None:
                     if (
@@ -293,16 +506,54 @@ class BleAdvCoordinator:
     def _handle_listening(self, adapter_id: str, _: str, raw_adv: bytes) -> None:
         if raw_adv not in self.listened_raw_advs:
             self.listened_raw_advs.append(raw_adv)
-        for codec_id, acodec in self.codecs.items():
+        for codec_id, acodec in self.codecs.built_items():
             __, conf = acodec.decode_adv(BleAdvAdvertisement.FromRaw(raw_adv))
             if conf is not None:
                 data = (adapter_id, codec_id, acodec.match_id, acodec.match_params, conf)
                 if data not in self.listened_decoded_confs:
                     self.listened_decoded_confs.append(data)
 
+    async def export_capture(self, path: Path) -> dict[str, str]:
+        """Export the capture ring to a capture file, the macs of the emitters being hashed."""
+        if not isinstance(self.recorder, BleAdvCaptureRing):
+            return {CONF_FILE_PATH: "No capture ring configured"}
+        if not await self.hass.async_add_executor_job(self._write_export, path, self.recorder.dump(hash_macs=True)):
+            return {CONF_FILE_PATH: f"Path '{path}' not allowed"}
+        return {}
+
+    def _write_export(self, path: Path, data: bytes) -> bool:
+        """Write an export if in the configuration directory or an allowed one. Blocking, to be run in an executor."""
+        config_dir = Path(self.hass.config.config_dir).resolve()
+        if not path.resolve().is_relative_to(config_dir) and not self.hass.config.is_allowed_path(str(path)):
+            return False
+        path.write_bytes(data)
+        return True
+
+    def create_replay_coordinator(self) -> BleAdvCoordinator:
+        """Create a coordinator dedicated to replays, with the same codecs and filters, but no adapter, device or recorder."""
+        return BleAdvCoordinator(self.hass, self.codecs, self.ign_adapters, self.ign_duration, list(self.ign_cids), list(self.ign_macs))
+
+    async def replay(self, records: Iterable[BleAdvCaptureRecord]) -> None:
+        """Replay captured advertisements, on a virtual clock following their timestamps.
+
+        Only on a coordinator dedicated to replays, never initialized: its own devices receive the replayed commands,
+        and its dedup maps only hold virtual expiries.
+        """
+        if self._live:
+            msg = "Cannot replay advertisements on a live coordinator"
+            raise RuntimeError(msg)
+        now = 0.0
+        self.clock = lambda: now
+        for rec in records:
+            now = rec.ts
+            await self.handle_raw_adv(rec.adapter_id, rec.orig, rec.raw)
+
     async def handle_raw_adv(self, adapter_id: str, orig: str, raw_adv: bytes) -> None:
         """Handle a raw advertising."""
         try:
+            if self.recorder is not None:
+                self.recorder.record(self.clock(), adapter_id, orig, raw_adv)
+
             # check if the received orig is in the ignored macs, adapter macs, or if too short to be considered
             if orig in self.ign_macs or orig in self._adapter_macs or len(raw_adv) < 8:
                 return
@@ -314,37 +565,36 @@ class BleAdvCoordinator:
             if int.from_bytes(adv.raw[:2], "little") in self.ign_cids:
                 return
 
-            # Clean-up last raw / decoded advs based on expiry date
-            now = datetime.now()
-            self._raw_last_advs = {x: y for x, y in self._raw_last_advs.items() if (y > now)}
-            self._dec_last_advs = {x: y for x, y in self._dec_last_advs.items() if (y.del_time > now)}
+            # Clean-up last raw / decoded advs based on expiry time
+            now = self.clock()
+            self._raw_last_advs.expire(now)
+            self._dec_last_advs.expire(now)
 
             # Check if already present in last raw advs: extend exclusion duration
             if raw_adv in self._raw_last_advs:
-                self._raw_last_advs[raw_adv] = now + timedelta(milliseconds=self.ign_duration)
+                self._raw_last_advs.set(raw_adv, None, now + self.ign_duration / 1000.0)
                 return
 
             if self.is_listening():
                 self._handle_listening(adapter_id, orig, raw_adv)
 
             # Check if already present in last decoded advs: re check another matching device with different adapter
-            if adv.raw in self._dec_last_advs:
-                await self._publish_to_devices(adapter_id, self._dec_last_advs[adv.raw])
+            if (last_recv := self._dec_last_advs.get(adv.raw)) is not None:
+                await self._publish_to_devices(adapter_id, last_recv)
                 return
 
-            # Try to decode Adv with in used codecs only
+            # Try to decode Adv with the in used codecs matching its signature only
             recv = None
-            for codec_id in self._in_use_codecs:
-                acodec = self.codecs[codec_id]
+            for acodec in self._candidate_codecs(adv):
                 enc_cmd, conf = acodec.decode_adv(adv)
                 if conf is not None and enc_cmd is not None:
-                    recv = BleAdvRecvItem(now + timedelta(milliseconds=acodec.ign_duration), acodec, set(), conf, enc_cmd)
+                    recv = BleAdvRecvItem(datetime.now() + timedelta(milliseconds=acodec.ign_duration), acodec, set(), conf, enc_cmd)
                     await self._publish_to_devices(adapter_id, recv)
-                    self._dec_last_advs[adv.raw] = recv
+                    self._dec_last_advs.set(adv.raw, recv, now + acodec.ign_duration / 1000.0)
 
             # Not decoded by in_used codecs: consider raw and ignored during the next standard ign_duration
             if not recv:
-                self._raw_last_advs[raw_adv] = now + timedelta(milliseconds=self.ign_duration)
+                self._raw_last_advs.set(raw_adv, None, now + self.ign_duration / 1000.0)
 
         except Exception:
             _LOGGER.exception(f"[{adapter_id}] Exception handling raw adv message")
@@ -359,8 +609,10 @@ class BleAdvCoordinator:
             "ign_cids": list(self.ign_cids),
             "ign_macs": list(self.ign_macs),
             "adapter_macs": list(self._adapter_macs),
-            "last_unk_raw": {x.hex().upper(): y for x, y in self._raw_last_advs.items()},
-            "last_dec_raw": {x.hex().upper(): y for x, y in self._dec_last_advs.items()},
+            "last_unk_raw": {x.hex().upper(): datetime.now() + timedelta(seconds=exp - self.clock()) for x, exp, _ in self._raw_last_advs.items()},
+            "last_dec_raw": {x.hex().upper(): y for x, _, y in self._dec_last_advs.items()},
+            "codec_caches": get_cache_stats(),
+            "capture": self.recorder.diagnostic_dump() if self.recorder is not None else None,
         }
 
     async def full_diagnostic_dump(self) -> dict[str, Any]:
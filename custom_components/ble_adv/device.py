@@ -4,7 +4,6 @@ from __future__ import annotations
 
 import logging
 from collections.abc import MutableMapping
-from dataclasses import asdict
 from datetime import datetime, timedelta
 from typing import Any
 
@@ -13,20 +12,33 @@ from homeassistant.components.switch import SwitchDeviceClass, SwitchEntity
 from homeassistant.const import EntityCategory
 from homeassistant.core import CALLBACK_TYPE, HomeAssistant
 from homeassistant.helpers.device_registry import DeviceInfo
-from homeassistant.helpers.event import async_track_point_in_utc_time
+from homeassistant.helpers.event import async_call_later, async_track_point_in_utc_time
 from homeassistant.helpers.restore_state import RestoreEntity
 from homeassistant.util import dt as dt_util
 
+from .adapters import PRIO_ADJUST, PRIO_COMMAND, PRIO_REFRESH
 from .codecs import codec_from_dyn
 from .codecs.const import (
+    ATTR_BLUE,
+    ATTR_BLUE_F,
+    ATTR_BR,
     ATTR_CMD,
     ATTR_CMD_PAIR,
     ATTR_CMD_TIMER,
     ATTR_CMD_TOGGLE,
     ATTR_CMD_UNPAIR,
+    ATTR_COLD,
+    ATTR_CT,
+    ATTR_CT_REV,
+    ATTR_GREEN,
+    ATTR_GREEN_F,
     ATTR_ON,
+    ATTR_RED,
+    ATTR_RED_F,
+    ATTR_SPEED,
     ATTR_SUB_TYPE,
     ATTR_TIME,
+    ATTR_WARM,
     DEVICE_TYPE,
 )
 from .codecs.models import BleAdvConfig, BleAdvEncCmd, BleAdvEntAttr
@@ -38,6 +50,14 @@ _LOGGER = logging.getLogger(__name__)
 ATTR_IS_ON = "is_on"
 ATTR_AVAILABLE = "available"
 
+# Families of continuous attributes, changed in bursts by sliders: the changes of a family are coalesced
+COALESCED_FAMILIES: dict[str, frozenset[str]] = {
+    "brightness": frozenset([ATTR_BR, ATTR_WARM, ATTR_COLD, ATTR_RED_F, ATTR_GREEN_F, ATTR_BLUE_F]),
+    "ct": frozenset([ATTR_CT, ATTR_CT_REV, ATTR_WARM, ATTR_COLD]),
+    "rgb": frozenset([ATTR_RED, ATTR_GREEN, ATTR_BLUE, ATTR_RED_F, ATTR_GREEN_F, ATTR_BLUE_F]),
+    "speed": frozenset([ATTR_SPEED]),
+}
+
 
 class _DeviceLoggingAdapter(logging.LoggerAdapter):
     def process(self, msg: str, kwargs: MutableMapping[str, Any]) -> tuple[str, MutableMapping[str, Any]]:
@@ -79,7 +99,7 @@ class BleAdvEvent(BleAdvDeviceEntity, EventEntity):
 
     async def trigger_enc_cmd(self, enc_cmd: BleAdvEncCmd) -> None:
         """Trigger Event when a BleAdvEncCmd is listened."""
-        self._trigger_event("enc_cmd", asdict(enc_cmd))
+        self._trigger_event("enc_cmd", enc_cmd.to_dict())
         self.async_write_ha_state()
 
 
@@ -167,12 +187,12 @@ class BleAdvEntity(BleAdvDeviceEntity):
             chg_attrs = forced_chg_attrs
         await self.handle_change(chg_attrs, attrs)
 
-    async def handle_change(self, chg_attrs: list[str], attrs: dict[str, Any]) -> None:
+    async def handle_change(self, chg_attrs: list[str], attrs: dict[str, Any], priority: int = PRIO_COMMAND) -> None:
         """Process with change based on list of attrs."""
         if chg_attrs:
             if ATTR_ON in chg_attrs and attrs[ATTR_ON]:
                 chg_attrs += self.forced_changed_attr_on_start()
-            await self._device.apply_change(BleAdvEntAttr(list(set(chg_attrs)), attrs, self._base_type, self._index))
+            await self._device.apply_change(BleAdvEntAttr(list(set(chg_attrs)), attrs, self._base_type, self._index), priority)
 
     async def async_turn_off(self, **_) -> None:  # noqa: ANN003
         """Turn off the Entity."""
@@ -254,6 +274,7 @@ class BleAdvDevice(BleAdvBaseDevice):
         self._event_entity: BleAdvEvent | None = None
         self._silent_switch_entity: BleAdvSwitch | None = None
         self._timer_cancel: CALLBACK_TYPE | None = None
+        self._coalescing: dict[tuple[tuple[str, int], str], tuple[CALLBACK_TYPE, BleAdvEntAttr | None]] = {}
         self.logger = _DeviceLoggingAdapter(_LOGGER, {"name": self.name})
 
     @property
@@ -285,18 +306,65 @@ class BleAdvDevice(BleAdvBaseDevice):
         """Add entity to this device."""
         self._entities.append(ent)
 
-    async def apply_change(self, ent_attr: BleAdvEntAttr) -> None:
-        """Apply changes."""
+    async def apply_change(self, ent_attr: BleAdvEntAttr, priority: int = PRIO_COMMAND) -> None:
+        """Apply changes, advertised with the given priority class, lowered to continuous adjustment for such changes.
+
+        The changes of a single family of continuous attributes (brightness, ct, rgb, speed) of an entity are coalesced:
+        the first one is advertised at once, then only the latest one received during each debounce window.
+        Any other change of the entity first flushes its pending coalesced changes, to keep the order.
+        """
         if self._silent_switch_entity is not None and self._silent_switch_entity.is_on:
             self.logger.info(f"Skipped Changes as Silent Mode activated: {ent_attr}")
             return
+        if (family := self._continuous_family(ent_attr)) is not None:
+            priority = max(priority, PRIO_ADJUST)
+            if self.coordinator.debounce > 0:
+                key = (ent_attr.id, family)
+                if (window := self._coalescing.get(key)) is not None:
+                    self.logger.debug(f"Coalescing Changes: {ent_attr}")
+                    self._coalescing[key] = (window[0], ent_attr)
+                    return
+                self._open_coalescing_window(key)
+        else:
+            await self._async_flush_coalescing(ent_attr.id)
+        await self._async_apply_change(ent_attr, priority)
+
+    async def _async_apply_change(self, ent_attr: BleAdvEntAttr, priority: int) -> None:
         self.logger.info(f"Applying Changes: {ent_attr}")
         await self._async_cancel_timer()
         try:
-            await self.advertise(ent_attr)
+            await self.advertise(ent_attr, priority)
         except Exception:
             self.logger.exception("Exception applying changes")
 
+    def _continuous_family(self, ent_attr: BleAdvEntAttr) -> str | None:
+        if not ent_attr.chg_attrs:
+            return None
+        return next((name for name, attrs in COALESCED_FAMILIES.items() if attrs.issuperset(ent_attr.chg_attrs)), None)
+
+    def _open_coalescing_window(self, key: tuple[tuple[str, int], str]) -> None:
+        async def _async_close_window(_: datetime) -> None:
+            if (pending := self._coalescing.pop(key, (None, None))[1]) is not None:
+                self._open_coalescing_window(key)
+                await self._async_apply_change(pending, PRIO_ADJUST)
+
+        self._coalescing[key] = (async_call_later(self.hass, self.coordinator.debounce / 1000.0, _async_close_window), None)
+
+    async def _async_flush_coalescing(self, ent_id: tuple[str, int]) -> None:
+        """Close the coalescing windows of an entity (all entities for a device command), applying their pending changes."""
+        for key in [x for x in self._coalescing if ent_id[0] == DEVICE_TYPE or x[0] == ent_id]:
+            cancel, pending = self._coalescing.pop(key)
+            cancel()
+            if pending is not None:
+                await self._async_apply_change(pending, PRIO_ADJUST)
+
+    async def async_final(self) -> None:
+        """Cancel the timer and the coalescing windows, dropping their pending changes, on unload."""
+        await self._async_cancel_timer()
+        for cancel, _ in self._coalescing.values():
+            cancel()
+        self._coalescing.clear()
+
     async def async_on_enc_cmd(self, enc_cmd: BleAdvEncCmd) -> None:
         """Call on matching command received."""
         if self._event_entity is not None:
@@ -323,7 +391,7 @@ class BleAdvDevice(BleAdvBaseDevice):
             new_attrs = ent.get_attrs()
             chg_attrs = [attr for attr, val in prev_attrs.items() if new_attrs[attr] != val]
             if chg_attrs:
-                await ent.handle_change(chg_attrs, new_attrs)
+                await ent.handle_change(chg_attrs, new_attrs, PRIO_REFRESH)
 
     async def _async_on_device_command(self, ent_attr: BleAdvEntAttr) -> None:
         self.logger.debug(f"Device Command received: {ent_attr}")
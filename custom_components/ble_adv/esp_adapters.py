@@ -98,8 +98,8 @@ class BleAdvEsphomeAdapterV2(BleAdvAdapter):
     async def _on_error(self, message: str) -> None:
         await self.manager.reset_adapter(self.name, f"Unhandled error: {message}")
 
-    async def _advertise(self, item: BleAdvAdapterAdvItem) -> None:
-        """Advertise the msg."""
+    async def _advertise(self, item: BleAdvAdapterAdvItem, adv_set: int = 0) -> None:  # noqa: ARG002
+        """Advertise the msg, single advertising set."""
         params = {
             CONF_ATTR_RAW: item.data.hex(),
             CONF_ATTR_DURATION: item.interval,
@@ -110,6 +110,9 @@ class BleAdvEsphomeAdapterV2(BleAdvAdapter):
         await self._adv_svc.call(params)
         await asyncio.sleep(0.0009 * item.repeat * item.interval)
 
+    async def _advertise_idle(self, adv_set: int = 0) -> None:
+        """Nothing to do, the proxy stops advertising by itself."""
+
 
 class BleAdvEspBtManager(BleAdvBtManager):
     """Class to manage ESPHome BLE ADV Proxies Bluetooth Adapters."""
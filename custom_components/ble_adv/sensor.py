@@ -0,0 +1,99 @@
+"""Sensor Handling."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from datetime import timedelta
+from typing import Any
+
+from homeassistant.components.sensor import SensorEntity, SensorStateClass
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.device_registry import DeviceEntryType, DeviceInfo
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.singleton import singleton
+
+from .const import ADAPTER_SENSOR_TYPE, CONF_COORDINATOR_ID, DOMAIN
+from .coordinator import BleAdvCoordinator
+from .device import BleAdvDevice
+
+SCAN_INTERVAL = timedelta(seconds=30)
+
+
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> None:
+    """Entry setup."""
+    device: BleAdvDevice = hass.data[DOMAIN][entry.entry_id]
+    adapter_sensors = _get_adapter_sensors(hass)
+
+    def add_sensors(adapter_ids: list[str]) -> None:
+        async_add_entities([BleAdvAdapterSensor(device.coordinator, adapter_id) for adapter_id in adapter_ids], True)
+
+    adapter_sensors.add_entry(entry.entry_id, device.adapter_ids, add_sensors)
+    entry.async_on_unload(lambda: adapter_sensors.remove_entry(entry.entry_id))
+
+
+@singleton(f"{DOMAIN}/{ADAPTER_SENSOR_TYPE}")
+def _get_adapter_sensors(_: HomeAssistant) -> BleAdvAdapterSensors:
+    return BleAdvAdapterSensors()
+
+
+class BleAdvAdapterSensors:
+    """Owners of the adapter sensors: a single sensor per adapter, added by one of the entries using the adapter.
+
+    When the owner entry is unloaded, its sensors are added again by another entry still using their adapter, if any.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[str, tuple[list[str], Callable[[list[str]], None]]] = {}
+        self._owners: dict[str, str] = {}
+
+    def add_entry(self, entry_id: str, adapter_ids: list[str], add_sensors: Callable[[list[str]], None]) -> None:
+        """Register the adapters of an entry, and add the sensors of the adapters without owner."""
+        self._entries[entry_id] = (adapter_ids, add_sensors)
+        self._claim(entry_id, adapter_ids)
+
+    def remove_entry(self, entry_id: str) -> None:
+        """Unregister an entry, handing over its sensors to the other entries."""
+        self._entries.pop(entry_id, None)
+        released = [adapter_id for adapter_id, owner in self._owners.items() if owner == entry_id]
+        for adapter_id in released:
+            del self._owners[adapter_id]
+        for other_id, (adapter_ids, _) in list(self._entries.items()):
+            self._claim(other_id, [adapter_id for adapter_id in released if adapter_id in adapter_ids])
+
+    def _claim(self, entry_id: str, adapter_ids: list[str]) -> None:
+        if not (claimed := sorted(adapter_id for adapter_id in adapter_ids if adapter_id not in self._owners)):
+            return
+        for adapter_id in claimed:
+            self._owners[adapter_id] = entry_id
+        self._entries[entry_id][1](claimed)
+
+
+class BleAdvAdapterSensor(SensorEntity):
+    """Diagnostic Sensor of an adapter, attached to the coordinator device: number of queued msgs, with the adapter performance counters as attributes."""
+
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_should_poll = True
+    _unrecorded_attributes = frozenset(
+        {"enqueued", "advertised", "superseded", "dropped", "errors", "reconnects", "tx_delay", "cmd_rtt", "queue_wait", "on_air"}
+    )
+
+    def __init__(self, coordinator: BleAdvCoordinator, adapter_id: str) -> None:
+        self._coordinator: BleAdvCoordinator = coordinator
+        self._adapter_id: str = adapter_id
+        self._attr_unique_id = f"{CONF_COORDINATOR_ID}_{ADAPTER_SENSOR_TYPE}_{adapter_id}"
+        self._attr_device_info = DeviceInfo(identifiers={(DOMAIN, CONF_COORDINATOR_ID)}, name="BLE ADV", entry_type=DeviceEntryType.SERVICE)
+        self._attr_translation_key = ADAPTER_SENSOR_TYPE
+        self._attr_translation_placeholders = {"adapter_id": adapter_id}
+
+    async def async_update(self) -> None:
+        """Poll the adapter stats."""
+        stats: dict[str, Any] | None = self._coordinator.adapter_stats(self._adapter_id)
+        self._attr_available = stats is not None
+        if stats is not None:
+            self._attr_native_value = stats.pop("queued")
+            self._attr_extra_state_attributes = stats
@@ -18,6 +18,10 @@ class _AsyncSocketMock(AsyncSocketBase):
         self._recv_queue: asyncio.Queue = asyncio.Queue()
         self.hci_adv_not_allowed: bool = False
         self.hci_ext_adv: bool = False
+        self.hci_credits: int = 1
+        self.hci_adv_sets: int = 0
+        self.hci_adv_terminated: bool = True
+        self.hci_cmd_status: list[int] = []
         self._calls = []
 
     async def _async_open_socket(self, _: str, *__) -> int:  # noqa: ANN002
@@ -43,11 +47,18 @@ class _AsyncSocketMock(AsyncSocketBase):
                     return
                 ret_code = 0x0C if self.hci_adv_not_allowed and data[1] in [0x06, 0x08, 0x0A] else 0x00
                 self._calls.append(("op_call", data[1], data[4:]))
-                if data[1] == 0x03 and self.hci_ext_adv:
+                if data[1] in self.hci_cmd_status:
+                    self.simulate_recv(bytearray([0x04, 0x0F, 0x04, ret_code, self.hci_credits, data[1], 0x20]))
+                elif data[1] == 0x3B:
+                    self.simulate_recv(bytearray([0x04, 0x0E, 0x00, self.hci_credits, data[1], 0x20, ret_code, self.hci_adv_sets]))
+                elif data[1] == 0x03 and self.hci_ext_adv:
                     features = (1 << 12).to_bytes(8, "little")
-                    self.simulate_recv(bytearray([0x04, 0x0E, 0x00, 0x00, data[1], 0x20, ret_code, *features]))
+                    self.simulate_recv(bytearray([0x04, 0x0E, 0x00, self.hci_credits, data[1], 0x20, ret_code, *features]))
                 else:
-                    self.simulate_recv(bytearray([0x04, 0x0E, 0x00, 0x00, data[1], 0x20, ret_code, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00]))
+                    self.simulate_recv(bytearray([0x04, 0x0E, 0x00, self.hci_credits, data[1], 0x20, ret_code, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00]))
+                if data[1] == 0x39 and data[4] == 0x01 and data[9] > 0 and self.hci_adv_terminated:
+                    # Advertising Set Terminated after Max_Extended_Advertising_Events: Limit Reached
+                    self.simulate_recv(bytearray([0x04, 0x3E, 0x06, 0x12, 0x43, data[6], 0x00, 0x00, data[9]]))
                 self._base_call_result(None)
                 return
             self._calls.append(("mgmt", data[0], data))
@@ -5,7 +5,18 @@ import asyncio
 from unittest import mock
 
 import pytest
-from ble_adv.adapters import AdapterError, BleAdvAdapterAdvItem, BleAdvBtHciManager, BleAdvQueueItem, BluetoothHCIAdapter
+from ble_adv.adapters import (
+    PRIO_ADJUST,
+    PRIO_COMMAND,
+    PRIO_REFRESH,
+    AdapterError,
+    BleAdvAdapter,
+    BleAdvAdapterAdvItem,
+    BleAdvBtHciManager,
+    BleAdvHistogram,
+    BleAdvQueueItem,
+    BluetoothHCIAdapter,
+)
 
 from .conftest import _AsyncSocketMock
 
@@ -17,33 +28,61 @@ def adv_msg(interval: int, data: bytes) -> list[tuple[str, int, bytes]]:
         ("op_call", 0x06, inter + inter + b"\x00\x00\x00\x00\x00\x00\x00\x00\x00\x07\x00"),  # SET ADV PARAM
         ("op_call", 0x08, b"\x1f" + data + bytes([0] * (31 - len(data)))),  # SET ADV DATA
         ("op_call", 0x0A, b"\x01"),  # ENABLE ADV
-        ("op_call", 0x0A, b"\x00"),  # DISABLE ADV
-        ("op_call", 0x08, b"\x1f\x1d\xff\xff\xff" + bytes([0] * 27)),  # RESET ADV DATA
     ]
 
 
-def adv_ext_msg(interval: int, data: bytes) -> list[tuple[str, int, bytes]]:
+def adv_swap_msg(data: bytes, *, enable: bool = False) -> list[tuple[str, int, bytes]]:
+    return [
+        ("op_call", 0x08, b"\x1f" + data + bytes([0] * (31 - len(data)))),  # SET ADV DATA
+        *([("op_call", 0x0A, b"\x01")] if enable else []),  # ENABLE ADV
+    ]
+
+
+ADV_IDLE_MSG = [
+    ("op_call", 0x0A, b"\x00"),  # DISABLE ADV
+    ("op_call", 0x08, b"\x1f\x1d\xff\xff\xff" + bytes([0] * 27)),  # RESET ADV DATA
+]
+
+
+def adv_ext_msg(interval: int, data: bytes, handle: int = 1, max_events: int = 0) -> list[tuple[str, int, bytes]]:
     inter = int(interval * 1.6).to_bytes(2, "little")
+    hdl = bytes([handle])
+    return [
+        ("op_call", 0x39, b"\x00\x01" + hdl + b"\x00\x00\x00"),  # DISABLE ADV EXT
+        ("op_call", 0x36, hdl + b"\x13\x00" + inter + b"\x00" + inter + b"\x00\x07\x00\x00\x00\x00\x00\x00\x00\x00\x00\x7f\x01\x00\x01\x00\x00"),
+        ("op_call", 0x37, hdl + b"\x03\x01" + b"\x1f" + data + bytes([0] * (31 - len(data)))),  # SET ADV DATA EXT
+        ("op_call", 0x39, b"\x01\x01" + hdl + b"\x00\x00" + bytes([max_events])),  # ENABLE ADV EXT
+    ]
+
+
+def adv_ext_swap_msg(data: bytes | None, handle: int = 1, *, enable: bool = False, max_events: int = 0) -> list[tuple[str, int, bytes]]:
+    hdl = bytes([handle])
     return [
-        ("op_call", 0x39, b"\x00\x01\x01\x00\x00\x00"),  # DISABLE ADV EXT
-        ("op_call", 0x36, b"\x01\x13\x00" + inter + b"\x00" + inter + b"\x00\x07\x00\x00\x00\x00\x00\x00\x00\x00\x00\x7f\x01\x00\x01\x00\x00"),
-        ("op_call", 0x37, b"\x01\x03\x01" + b"\x1f" + data + bytes([0] * (31 - len(data)))),  # SET ADV DATA EXT
-        ("op_call", 0x39, b"\x01\x01\x01\x00\x00\x00"),  # ENABLE ADV EXT
-        ("op_call", 0x39, b"\x00\x01\x01\x00\x00\x00"),  # DISABLE ADV EXT
-        ("op_call", 0x37, b"\x01\x03\x01\x1f\x1d\xff\xff\xff" + bytes([0] * 27)),  # RESET ADV DATA  EXT
+        *([("op_call", 0x37, hdl + b"\x03\x01" + b"\x1f" + data + bytes([0] * (31 - len(data))))] if data else []),  # SET ADV DATA EXT
+        *([("op_call", 0x39, b"\x01\x01" + hdl + b"\x00\x00" + bytes([max_events]))] if enable else []),  # ENABLE ADV EXT
     ]
 
 
-def adv_mgmt_msg(data: bytes) -> list[mock._Call]:
+def adv_ext_idle_msg(handle: int = 1, *, disable: bool = True) -> list[tuple[str, int, bytes]]:
+    hdl = bytes([handle])
     return [
-        mock.call(0, 0x3E, b"\x01\x00\x00\x00\x00\x00\x00\x00\x00" + b"\x1f\x00" + data + bytes([0] * (31 - len(data)))),
-        mock.call(0, 0x3F, b"\x01"),
+        *([("op_call", 0x39, b"\x00\x01" + hdl + b"\x00\x00\x00")] if disable else []),  # DISABLE ADV EXT
+        ("op_call", 0x37, hdl + b"\x03\x01\x1f\x1d\xff\xff\xff" + bytes([0] * 27)),  # RESET ADV DATA  EXT
+    ]
+
+
+def adv_mgmt_msg(interval: int, data: bytes, instance: int = 1) -> list[mock._Call]:
+    inter = int(interval * 1.6).to_bytes(4, "little")
+    inst = bytes([instance])
+    return [
+        mock.call(0, 0x54, inst + b"\x00\x60\x00\x00" + b"\x00\x00\x02\x00" + inter + inter + b"\x00"),  # ADD EXT ADV PARAMS
+        mock.call(0, 0x55, inst + b"\x1f\x00" + data + bytes([0] * (31 - len(data)))),  # ADD EXT ADV DATA
     ]
 
 
 INIT_CALLS = [
     ("bind", ((0,),)),
-    ("setsockopt", (0, 2, b"\x10\x00\x00\x00\x00@\x00\x00\x00\x00\x00@\x00\x00\x00\x00")),
+    ("setsockopt", (0, 2, b"\x10\x00\x00\x00\x00\xc0\x00\x00\x00\x00\x00@\x00\x00\x00\x00")),
     ("op_call", 0x03, b""),  # LE Features
     ("op_call", 0x0A, b"\x01"),  # Test ADV Enabled
     ("op_call", 0x0A, b"\x00"),  # Test ADV Disabled
@@ -88,6 +127,181 @@ async def test_split_queue() -> None:
     ]
 
 
+class _RecAdapter(BleAdvAdapter):
+    ADV_DURATION: float = 0.01
+
+    def __init__(self) -> None:
+        super().__init__("rec", "mac", mock.AsyncMock(), 100)
+        self.advertised: list[bytes] = []
+
+    async def open(self) -> None:
+        self._opened = True
+
+    def close(self) -> None:
+        self._opened = False
+
+    async def _advertise(self, item: BleAdvAdapterAdvItem, adv_set: int = 0) -> None:  # noqa: ARG002
+        self.advertised.append(item.data)
+        await asyncio.sleep(self.ADV_DURATION)
+
+    async def _advertise_idle(self, adv_set: int = 0) -> None:  # noqa: ARG002
+        self.advertised.append(b"idle")
+
+
+async def test_scheduler() -> None:
+    adapter = _RecAdapter()
+    await adapter.async_init()
+    await adapter.enqueue("q1", BleAdvQueueItem(None, 1, 100, 10, [b"A1"], 2))
+    await adapter.enqueue("q1", BleAdvQueueItem(None, 1, 0, 10, [b"A2"], 2))
+    await adapter.enqueue("q2", BleAdvQueueItem(1, 1, 0, 10, [b"B0"], 2))
+    await adapter.enqueue("q2", BleAdvQueueItem(2, 1, 0, 10, [b"B2"], 2))
+    await adapter.enqueue("q2", BleAdvQueueItem(1, 1, 0, 10, [b"B1"], 2))  # replaces B0
+    await adapter.enqueue("q3", BleAdvQueueItem(None, 1, 30, 10, [b"C1"], 2))
+    await adapter.enqueue("q3", BleAdvQueueItem(None, 1, 0, 10, [b"C2"], 2))
+    await asyncio.sleep(0.08)
+    assert adapter._locked_queues == {0}
+    assert adapter._unlock_timer is not None
+    await adapter.drain()
+    # round robin on the ready queues, q1 and q3 locked for their delay_after
+    assert adapter.advertised == [b"A1", b"B2", b"C1", b"B1", b"idle", b"C2", b"idle", b"A2", b"idle"]
+    assert adapter._locked == []
+    assert adapter._unlock_timer is None
+    await adapter.async_final()
+
+
+async def test_scheduler_priorities() -> None:
+    adapter = _RecAdapter()
+    await adapter.async_init()
+    await adapter.enqueue("q4", BleAdvQueueItem(1, 1, 0, 10, [b"D1"], 2, PRIO_ADJUST))
+    preempted = await adapter.enqueue("q4", BleAdvQueueItem(2, 1, 0, 10, [b"D2"], 2, PRIO_ADJUST, "ent"))
+    await asyncio.sleep(0.005)  # D1 being advertised
+    await adapter.enqueue("q1", BleAdvQueueItem(1, 1, 0, 10, [b"A1"], 2, PRIO_ADJUST))
+    await adapter.enqueue("q2", BleAdvQueueItem(1, 1, 0, 10, [b"B1"], 2, PRIO_ADJUST))
+    await adapter.enqueue("q2", BleAdvQueueItem(2, 1, 0, 10, [b"B2"], 2, PRIO_ADJUST))
+    await adapter.enqueue("q3", BleAdvQueueItem(1, 1, 0, 10, [b"C1"], 2, PRIO_REFRESH))
+    await adapter.enqueue("q4", BleAdvQueueItem(3, 1, 0, 10, [b"D3"], 2, PRIO_COMMAND, "ent"))  # preempts D2, same entity
+    assert preempted.done() and not preempted.result()
+    await adapter.drain()
+    # by class: D3 then C1 before A1, B1, B2
+    assert adapter.advertised == [b"D1", b"D3", b"C1", b"A1", b"B1", b"B2", b"idle"]
+    await adapter.async_final()
+
+
+async def test_scheduler_no_preemption() -> None:
+    adapter = _RecAdapter()
+    await adapter.async_init()
+    await adapter.enqueue("q1", BleAdvQueueItem(1, 1, 0, 10, [b"A1"], 2, PRIO_ADJUST, "ent1"))
+    await asyncio.sleep(0.005)  # A1 being advertised
+    kept = await adapter.enqueue("q1", BleAdvQueueItem(2, 1, 0, 10, [b"A2"], 2, PRIO_ADJUST, "ent1"))
+    await adapter.enqueue("q2", BleAdvQueueItem(1, 1, 0, 10, [b"B1"], 2, PRIO_REFRESH))
+    refresh = await adapter.enqueue("q1", BleAdvQueueItem(3, 1, 0, 10, [b"A3"], 2, PRIO_REFRESH))
+    await adapter.enqueue("q1", BleAdvQueueItem(4, 1, 0, 10, [b"A4"], 2, PRIO_COMMAND, "ent2"))  # other key and entity
+    assert not kept.done()
+    assert not refresh.done()
+    await adapter.drain()
+    assert await kept
+    assert await refresh
+    # q1 served first in the command class, its items kept in order
+    assert adapter.advertised == [b"A1", b"A2", b"A3", b"A4", b"B1", b"idle"]
+    await adapter.async_final()
+
+
+async def test_scheduler_starvation() -> None:
+    adapter = _RecAdapter()
+    adapter.ADV_DURATION = 0.05
+    adapter.MAX_PRIO_WAIT = 0.075  # B1 starving after the end of A1 only, with a 25ms margin on both sides
+    await adapter.async_init()
+    await adapter.enqueue("q0", BleAdvQueueItem(None, 1, 0, 10, [b"A0"], 2))
+    await adapter.enqueue("q1", BleAdvQueueItem(None, 1, 0, 10, [b"B1"], 2, PRIO_ADJUST))
+    for i in range(1, 4):
+        await adapter.enqueue("q0", BleAdvQueueItem(None, 1, 0, 10, [f"A{i}".encode()], 2))
+    await adapter.drain()
+    # B1 waiting for more than MAX_PRIO_WAIT is served before the last commands
+    assert adapter.advertised == [b"A0", b"A1", b"B1", b"A2", b"A3", b"idle"]
+    await adapter.async_final()
+
+
+async def test_completion() -> None:
+    adapter = _RecAdapter()
+    await adapter.async_init()
+    await asyncio.wait_for(adapter.drain(), 0.1)  # idle: drain returns at once
+    done1 = await adapter.enqueue("q1", BleAdvQueueItem(1, 1, 0, 10, [b"A1"], 2))
+    repl = await adapter.enqueue("q2", BleAdvQueueItem(1, 1, 0, 10, [b"B0"], 2))
+    done2 = await adapter.enqueue("q2", BleAdvQueueItem(1, 1, 0, 10, [b"B1"], 2))  # replaces B0
+    assert repl.done() and not repl.result()
+    assert not done1.done()
+    assert await done1
+    assert await done2
+    await adapter.drain()
+    assert adapter.advertised == [b"A1", b"B1", b"idle"]
+    assert adapter.tx_latency >= 0.01
+    assert adapter.tx_delay() == adapter.tx_latency
+    await adapter.enqueue("q1", BleAdvQueueItem(1, 1, 100, 10, [b"A2"], 2))
+    pending = await adapter.enqueue("q1", BleAdvQueueItem(2, 1, 0, 10, [b"A3"], 2))
+    assert adapter.tx_delay() == 3 * adapter.tx_latency
+    await adapter.async_final()
+    assert pending.done() and not pending.result()
+    await asyncio.wait_for(adapter.drain(), 0.1)
+
+
+async def test_completion_failed_adv() -> None:
+    adapter = _RecAdapter()
+    advertise = adapter._advertise
+
+    async def _advertise(item: BleAdvAdapterAdvItem, adv_set: int = 0) -> None:
+        if item.data == b"A1":
+            raise AdapterError("Failing")
+        await advertise(item, adv_set)
+
+    adapter._advertise = _advertise
+    await adapter.async_init()
+    failed = await adapter.enqueue("q1", BleAdvQueueItem(1, 1, 0, 10, [b"A1", b"A2"], 2))
+    done = await adapter.enqueue("q2", BleAdvQueueItem(1, 1, 0, 10, [b"B1", b"B2"], 2))
+    await adapter.drain()
+    # the last adv of A transmitted, but not the first one
+    assert adapter.advertised == [b"B1", b"A2", b"B2", b"idle"]
+    assert not await failed
+    assert await done
+    assert (adapter.stats.advertised, adapter.stats.dropped, adapter.stats.errors) == (1, 1, 1)
+    await adapter.async_final()
+
+
+def test_histogram() -> None:
+    hist = BleAdvHistogram()
+    assert hist.diagnostic_dump() == {"count": 0, "mean_ms": None, "p50_ms": None, "p95_ms": None, "buckets": {}}
+    for duration in [0.001, 0.003, 0.004, 0.015, 10.0]:
+        hist.record(duration)
+    assert hist.diagnostic_dump() == {
+        "count": 5,
+        "mean_ms": 2004.6,
+        "p50_ms": 5,
+        "p95_ms": None,
+        "buckets": {"<=1ms": 1, "<=5ms": 2, "<=20ms": 1, ">5000ms": 1},
+    }
+
+
+async def test_stats() -> None:
+    adapter = _RecAdapter()
+    await adapter.async_init()
+    await adapter.enqueue("q1", BleAdvQueueItem(1, 2, 0, 10, [b"A1"], 2))
+    await adapter.enqueue("q2", BleAdvQueueItem(1, 1, 0, 10, [b"B0"], 2))
+    await adapter.enqueue("q2", BleAdvQueueItem(1, 1, 0, 10, [b"B1"], 2))  # replaces B0
+    await adapter.drain()
+    done = await adapter.enqueue("q1", BleAdvQueueItem(1, 1, 100, 10, [b"A2"], 2))
+    await adapter.enqueue("q1", BleAdvQueueItem(2, 1, 0, 10, [b"A3"], 2))
+    await asyncio.sleep(0.005)
+    await adapter.async_final()  # A2 in flight, A3 dropped
+    assert await done
+    stats = adapter.stats
+    assert (stats.enqueued, stats.advertised, stats.superseded, stats.dropped, stats.errors) == (5, 3, 1, 1, 0)
+    assert stats.queue_wait.count == 3  # A3 never started
+    assert stats.on_air.count == 3
+    diag = adapter.diagnostic_dump()["stats"]
+    assert diag["reconnects"] == 0
+    assert diag["on_air"]["count"] == 3
+    assert sum(diag["on_air"]["buckets"].values()) == 3
+
+
 async def test_adapter(mock_socket: _AsyncSocketMock) -> None:
     hci_adapter = BluetoothHCIAdapter("hci0", 0, "mac", mock.AsyncMock(), mock.AsyncMock(), mock.AsyncMock())
     hci_adapter._async_socket = mock_socket
@@ -110,16 +324,70 @@ async def test_adapter(mock_socket: _AsyncSocketMock) -> None:
     await hci_adapter.enqueue("q1", BleAdvQueueItem(20, 1, 150, 60, [b"msg01"], 2))
     await hci_adapter.enqueue("q1", BleAdvQueueItem(30, 2, 100, 60, [b"msg02"], 2))
     await hci_adapter.drain()
-    assert mock_socket.get_calls() == [*adv_msg(60, b"msg01"), *adv_msg(60, b"msg02"), *adv_msg(60, b"msg02")]
+    # msg01 then idle during delay_after, msg02 twice: data unchanged, then idle
+    assert mock_socket.get_calls() == [*adv_msg(60, b"msg01"), *ADV_IDLE_MSG, *adv_swap_msg(b"msg02", enable=True), *ADV_IDLE_MSG]
+    # data swapped while enabled, parameters changed while disabled
+    await hci_adapter.enqueue("q1", BleAdvQueueItem(None, 1, 0, 60, [b"msg03"], 2))
+    await hci_adapter.enqueue("q1", BleAdvQueueItem(None, 1, 0, 60, [b"msg04"], 2))
+    await hci_adapter.enqueue("q1", BleAdvQueueItem(None, 1, 0, 30, [b"msg05"], 2))
+    await hci_adapter.drain()
+    assert mock_socket.get_calls() == [
+        *adv_swap_msg(b"msg03", enable=True),
+        *adv_swap_msg(b"msg04"),
+        *adv_msg(30, b"msg05"),
+        *ADV_IDLE_MSG,
+    ]
+    assert hci_adapter.stats.advertised == 5
+    assert hci_adapter.stats.cmd_rtt.count > 0
     await hci_adapter.async_final()
     with pytest.raises(AdapterError):
         await hci_adapter._advertise(BleAdvAdapterAdvItem(20, 3, b"", 2))
 
 
+async def test_adapter_pipelined_cmds(mock_socket: _AsyncSocketMock) -> None:
+    hci_adapter = BluetoothHCIAdapter("hci0", 0, "mac", mock.AsyncMock(), mock.AsyncMock(), mock.AsyncMock())
+    hci_adapter._async_socket = mock_socket
+    mock_socket.hci_credits = 4
+    mock_socket.hci_cmd_status = [0x0A]  # ADV ENABLE answered by a Command Status
+    BluetoothHCIAdapter.CMD_RTO = 0.1
+    await hci_adapter.async_init()
+    assert mock_socket.get_calls() == INIT_CALLS
+    assert hci_adapter._cmd_credits == 4
+    await hci_adapter.enqueue("q1", BleAdvQueueItem(20, 1, 150, 60, [b"msg01"], 2))
+    await hci_adapter.drain()
+    assert mock_socket.get_calls() == [*adv_msg(60, b"msg01"), *ADV_IDLE_MSG]
+    assert hci_adapter._pending_cmds == {}
+    # credit only update, no command completed
+    mock_socket.simulate_recv(bytearray([0x04, 0x0E, 0x03, 0x02, 0x00, 0x00]))
+    await asyncio.sleep(0.1)
+    assert hci_adapter._cmd_credits == 2
+    # failed command status
+    mock_socket.hci_adv_not_allowed = True
+    assert await hci_adapter._set_advertise_enable() == BluetoothHCIAdapter.HCI_DISALLOWED
+    await hci_adapter.async_final()
+
+
+async def test_adapter_no_credit(mock_socket: _AsyncSocketMock) -> None:
+    hci_adapter = BluetoothHCIAdapter("hci0", 0, "mac", mock.AsyncMock(), mock.AsyncMock(), mock.AsyncMock())
+    hci_adapter._async_socket = mock_socket
+    BluetoothHCIAdapter.CMD_RTO = 0.1
+    await hci_adapter.async_init()
+    mock_socket.get_calls()
+    hci_adapter._cmd_credits = 0  # controller busy
+    with pytest.raises(TimeoutError):
+        await hci_adapter._set_advertise_enable()
+    assert mock_socket.get_calls() == []
+    mock_socket.simulate_recv(bytearray([0x04, 0x0E, 0x03, 0x01, 0x00, 0x00]))  # controller available again
+    assert await hci_adapter._set_advertise_enable() == BluetoothHCIAdapter.HCI_SUCCESS
+    assert mock_socket.get_calls() == [("op_call", 0x0A, b"\x01")]
+    await hci_adapter.async_final()
+
+
 INIT_CALLS_EXT_ADV = [
     ("bind", ((0,),)),
-    ("setsockopt", (0, 2, b"\x10\x00\x00\x00\x00@\x00\x00\x00\x00\x00@\x00\x00\x00\x00")),
+    ("setsockopt", (0, 2, b"\x10\x00\x00\x00\x00\xc0\x00\x00\x00\x00\x00@\x00\x00\x00\x00")),
     ("op_call", 0x03, b""),  # LE Features
+    ("op_call", 0x3B, b""),  # Number of Supported Advertising Sets
     ("op_call", 0x42, b"\x00\x00\x00\x00\x00\x00"),  # Disable EXT Scan
     ("op_call", 0x41, b"\x00\x00\x01\x00\x10\x00\x10\x00"),  # EXT Scan Parameters
     ("op_call", 0x42, b"\x01\x00\x00\x00\x00\x00"),  # Enable EXT Scan
@@ -137,12 +405,93 @@ async def test_adapter_ext_adv(mock_socket: _AsyncSocketMock) -> None:
     await hci_adapter.enqueue("q1", BleAdvQueueItem(20, 1, 150, 60, [b"msg01"], 2))
     await hci_adapter.enqueue("q1", BleAdvQueueItem(30, 2, 100, 60, [b"msg02"], 2))
     await hci_adapter.drain()
-    assert mock_socket.get_calls() == [*adv_ext_msg(60, b"msg01"), *adv_ext_msg(60, b"msg02"), *adv_ext_msg(60, b"msg02")]
+    # advertising timed by the controller: the set is already disabled when idle
+    assert mock_socket.get_calls() == [
+        *adv_ext_msg(60, b"msg01", max_events=1),
+        *adv_ext_idle_msg(disable=False),
+        *adv_ext_swap_msg(b"msg02", enable=True, max_events=1),
+        *adv_ext_swap_msg(None, enable=True, max_events=1),
+        *adv_ext_idle_msg(disable=False),
+    ]
+    assert hci_adapter.diagnostic_dump()["timed_adv"]
+    await hci_adapter.async_final()
+
+
+async def test_adapter_ext_adv_not_timed(mock_socket: _AsyncSocketMock) -> None:
+    hci_adapter = BluetoothHCIAdapter("hci0", 0, "mac", mock.AsyncMock(), mock.AsyncMock(), mock.AsyncMock())
+    hci_adapter._async_socket = mock_socket
+    mock_socket.hci_ext_adv = True
+    mock_socket.hci_adv_terminated = False
+    BluetoothHCIAdapter.CMD_RTO = 0.1
+    BluetoothHCIAdapter.TERMINATED_RTO = 0.1
+    await hci_adapter.async_init()
+    assert mock_socket.get_calls() == INIT_CALLS_EXT_ADV
+    await hci_adapter.enqueue("q1", BleAdvQueueItem(20, 1, 150, 60, [b"msg01"], 2))
+    await hci_adapter.enqueue("q1", BleAdvQueueItem(30, 2, 100, 60, [b"msg02"], 2))
+    await hci_adapter.drain()
+    # no Advertising Set Terminated event: fallback to host timed advertising after the first msg
+    assert mock_socket.get_calls() == [
+        *adv_ext_msg(60, b"msg01", max_events=1),
+        *adv_ext_idle_msg(),
+        *adv_ext_swap_msg(b"msg02", enable=True),
+        *adv_ext_idle_msg(),
+    ]
+    assert not hci_adapter.diagnostic_dump()["timed_adv"]
+    await hci_adapter.async_final()
+
+
+async def test_adapter_ext_adv_not_timed_next_msg(mock_socket: _AsyncSocketMock) -> None:
+    hci_adapter = BluetoothHCIAdapter("hci0", 0, "mac", mock.AsyncMock(), mock.AsyncMock(), mock.AsyncMock())
+    hci_adapter._async_socket = mock_socket
+    mock_socket.hci_ext_adv = True
+    mock_socket.hci_adv_terminated = False
+    BluetoothHCIAdapter.CMD_RTO = 0.1
+    BluetoothHCIAdapter.TERMINATED_RTO = 0.1
+    await hci_adapter.async_init()
+    assert mock_socket.get_calls() == INIT_CALLS_EXT_ADV
+    await hci_adapter.enqueue("q1", BleAdvQueueItem(20, 1, 0, 60, [b"msg01"], 2))
+    await hci_adapter.enqueue("q2", BleAdvQueueItem(30, 1, 0, 60, [b"msg02"], 2))
+    await hci_adapter.drain()
+    # the set may have been disabled by the controller without event: the next msg enables it again
+    assert mock_socket.get_calls() == [
+        *adv_ext_msg(60, b"msg01", max_events=1),
+        *adv_ext_swap_msg(b"msg02", enable=True),
+        *adv_ext_idle_msg(),
+    ]
+    await hci_adapter.async_final()
+
+
+async def test_adapter_ext_adv_sets(mock_socket: _AsyncSocketMock) -> None:
+    hci_adapter = BluetoothHCIAdapter("hci0", 0, "mac", mock.AsyncMock(), mock.AsyncMock(), mock.AsyncMock())
+    hci_adapter._async_socket = mock_socket
+    mock_socket.hci_ext_adv = True
+    mock_socket.hci_adv_sets = 8
+    BluetoothHCIAdapter.CMD_RTO = 0.1
+    await hci_adapter.async_init()
+    assert mock_socket.get_calls() == INIT_CALLS_EXT_ADV
+    assert hci_adapter.nb_adv_sets == BluetoothHCIAdapter.MAX_ADV_SETS
+    assert len(hci_adapter._dequeue_tasks) == BluetoothHCIAdapter.MAX_ADV_SETS
+    assert hci_adapter.diagnostic_dump()["adv_sets"] == BluetoothHCIAdapter.MAX_ADV_SETS
+    await hci_adapter.enqueue("q1", BleAdvQueueItem(20, 1, 150, 60, [b"msg01"], 2))
+    await hci_adapter.enqueue("q1", BleAdvQueueItem(30, 1, 0, 60, [b"msg02"], 2))
+    await hci_adapter.enqueue("q2", BleAdvQueueItem(20, 1, 0, 60, [b"msg11"], 2))
+    await hci_adapter.drain()
+    calls = mock_socket.get_calls()
+    # one handle per set, the 2 queues advertised concurrently, each set ending idle
+    handle_calls: dict[int, list] = {}
+    for call in calls:
+        handle_calls.setdefault(call[2][2] if call[1] == 0x39 else call[2][0], []).append(call)
+    handles = {call[2][4:9]: handle for handle, hcalls in handle_calls.items() for call in hcalls if call[1] == 0x37 and call[2][4] != 0x1D}
+    assert sorted(handles) == [b"msg01", b"msg02", b"msg11"]
+    assert handles[b"msg01"] != handles[b"msg11"]
+    for handle, hcalls in handle_calls.items():
+        assert hcalls[:4] == adv_ext_msg(60, hcalls[2][2][4:9], handle, max_events=1)
+        assert hcalls[-1:] == adv_ext_idle_msg(handle, disable=False)
     await hci_adapter.async_final()
 
 
 async def test_adapter_mgmt_adv(mock_socket: _AsyncSocketMock) -> None:
-    mock_mgmt_cmd = mock.AsyncMock()
+    mock_mgmt_cmd = mock.AsyncMock(return_value=(0, b""))
     hci_adapter_adv_mgmt = BluetoothHCIAdapter("hci0", 0, "mac", mock_mgmt_cmd, mock.AsyncMock(), mock.AsyncMock())
     hci_adapter_adv_mgmt._async_socket = mock_socket
     hci_adapter_adv_mgmt._async_socket.hci_adv_not_allowed = True
@@ -155,7 +504,77 @@ async def test_adapter_mgmt_adv(mock_socket: _AsyncSocketMock) -> None:
     await hci_adapter_adv_mgmt.enqueue("q1", BleAdvQueueItem(20, 1, 150, 60, [b"msg01"], 2))
     await hci_adapter_adv_mgmt.enqueue("q1", BleAdvQueueItem(30, 2, 100, 60, [b"msg02"], 2))
     await hci_adapter_adv_mgmt.drain()
-    mock_mgmt_cmd.assert_has_calls([*adv_mgmt_msg(b"msg01"), *adv_mgmt_msg(b"msg02"), *adv_mgmt_msg(b"msg02")])
+    # instance removed when idle only, the kernel removing it by itself after its timeout otherwise
+    remove_call = mock.call(0, 0x3F, b"\x01")
+    assert mock_mgmt_cmd.mock_calls == [
+        *adv_mgmt_msg(60, b"msg01"),
+        remove_call,
+        *adv_mgmt_msg(60, b"msg02"),
+        *adv_mgmt_msg(60, b"msg02"),
+        remove_call,
+    ]
+    await hci_adapter_adv_mgmt.async_final()
+
+
+async def test_adapter_mgmt_adv_fallback(mock_socket: _AsyncSocketMock) -> None:
+    # Add Extended Advertising Parameters unknown from the kernel: Add Advertising used from then on
+    mock_mgmt_cmd = mock.AsyncMock(side_effect=lambda _, cmd_type, __: (0x01 if cmd_type == 0x54 else 0x00, b""))
+    hci_adapter_adv_mgmt = BluetoothHCIAdapter("hci0", 0, "mac", mock_mgmt_cmd, mock.AsyncMock(), mock.AsyncMock())
+    hci_adapter_adv_mgmt._async_socket = mock_socket
+    hci_adapter_adv_mgmt._async_socket.hci_adv_not_allowed = True
+    BluetoothHCIAdapter.CMD_RTO = 0.1
+    await hci_adapter_adv_mgmt.async_init()
+    done1 = await hci_adapter_adv_mgmt.enqueue("q1", BleAdvQueueItem(20, 1, 0, 60, [b"msg01"], 2))
+    done2 = await hci_adapter_adv_mgmt.enqueue("q1", BleAdvQueueItem(30, 1, 0, 60, [b"msg02"], 2))
+    await hci_adapter_adv_mgmt.drain()
+    assert await done1 and await done2
+    assert hci_adapter_adv_mgmt.diagnostic_dump()["mgmt_ext_adv"] is False
+
+    def add_adv_call(data: bytes) -> mock._Call:
+        return mock.call(0, 0x3E, b"\x01\x00\x00\x00\x00\x00\x00\x02\x00\x1f\x00" + data + bytes([0] * (31 - len(data))))
+
+    assert [call for call in mock_mgmt_cmd.mock_calls if call.args[1] != 0x3F] == [
+        adv_mgmt_msg(60, b"msg01")[0],
+        add_adv_call(b"msg01"),
+        add_adv_call(b"msg02"),
+    ]
+    await hci_adapter_adv_mgmt.async_final()
+
+
+async def test_adapter_mgmt_adv_failure(mock_socket: _AsyncSocketMock) -> None:
+    # Add Extended Advertising Data rejected: the item is not transmitted and the error is reported
+    on_error = mock.AsyncMock()
+    mock_mgmt_cmd = mock.AsyncMock(side_effect=lambda _, cmd_type, __: (0x0D if cmd_type == 0x55 else 0x00, b""))
+    hci_adapter_adv_mgmt = BluetoothHCIAdapter("hci0", 0, "mac", mock_mgmt_cmd, mock.AsyncMock(), on_error)
+    hci_adapter_adv_mgmt._async_socket = mock_socket
+    hci_adapter_adv_mgmt._async_socket.hci_adv_not_allowed = True
+    BluetoothHCIAdapter.CMD_RTO = 0.1
+    await hci_adapter_adv_mgmt.async_init()
+    done = await hci_adapter_adv_mgmt.enqueue("q1", BleAdvQueueItem(20, 1, 0, 60, [b"msg01"], 2))
+    assert not await done
+    assert hci_adapter_adv_mgmt.stats.dropped == 1
+    on_error.assert_called_once()
+    assert hci_adapter_adv_mgmt.diagnostic_dump()["mgmt_ext_adv"] is True
+    await hci_adapter_adv_mgmt.async_final()
+
+
+async def test_adapter_mgmt_adv_instances(mock_socket: _AsyncSocketMock) -> None:
+    mock_mgmt_cmd = mock.AsyncMock(return_value=(0, b"\x00\x00\x00\x00\x1f\x1f\x05\x00"))
+    hci_adapter_adv_mgmt = BluetoothHCIAdapter("hci0", 0, "mac", mock_mgmt_cmd, mock.AsyncMock(), mock.AsyncMock())
+    hci_adapter_adv_mgmt._async_socket = mock_socket
+    hci_adapter_adv_mgmt._async_socket.hci_adv_not_allowed = True
+    BluetoothHCIAdapter.CMD_RTO = 0.1
+    with mock.patch.object(BluetoothHCIAdapter, "MAX_MGMT_ADV_INSTANCES", 2):
+        await hci_adapter_adv_mgmt.async_init()
+    assert mock_mgmt_cmd.mock_calls == [mock.call(0, 0x3D, b"")]  # Read Advertising Features
+    assert hci_adapter_adv_mgmt.nb_adv_sets == 2
+    mock_mgmt_cmd.reset_mock()
+    await hci_adapter_adv_mgmt.enqueue("q1", BleAdvQueueItem(20, 1, 0, 60, [b"msg01"], 2))
+    await hci_adapter_adv_mgmt.enqueue("q2", BleAdvQueueItem(20, 1, 0, 60, [b"msg11"], 2))
+    await hci_adapter_adv_mgmt.drain()
+    calls = mock_mgmt_cmd.mock_calls
+    assert sorted(call.args[2][0] for call in calls if call.args[1] == 0x3F) == [1, 2]
+    assert {call.args[2][3:8]: call.args[2][0] for call in calls if call.args[1] == 0x55} in [{b"msg01": 1, b"msg11": 2}, {b"msg01": 2, b"msg11": 1}]
     await hci_adapter_adv_mgmt.async_final()
 
 
@@ -3,10 +3,10 @@
 
 from typing import Any
 
-from ble_adv.codecs import dyn_codec_params, get_codecs
+from ble_adv.codecs import BleAdvCodecRegistry, dyn_codec_params, get_codecs
 from ble_adv.codecs.models import BleAdvAdvertisement, BleAdvCodec
 
-CODECS: dict[str, BleAdvCodec] = get_codecs()
+CODECS: BleAdvCodecRegistry = get_codecs()
 # Disable tx_count bump by codecs
 for codec in CODECS.values():
     codec._tx_step = 0  # noqa: SLF001
@@ -30,6 +30,9 @@ class _TestEncoderBaseAll:
         assert conf is not None
         assert conf.codec_params == params
         assert enc_cmd is not None
+        sig_ble_type, sig_len, sig_start_pos, sig_header = codec.signature()
+        assert (sig_ble_type, sig_len) == (adv.ble_type, len(adv.raw))
+        assert adv.raw[sig_start_pos : sig_start_pos + len(sig_header)] == sig_header
         if conf.seed != 0:
             assert codec._seed_max != 0  # noqa: SLF001
         reenc = codec.encode_advs(enc_cmd, conf)[0]
@@ -5,6 +5,7 @@
 from copy import copy
 
 import pytest
+from ble_adv.codecs.fanlamp import FanLampEncoderV2
 from ble_adv.codecs.models import BleAdvAdvertisement, BleAdvCodec, BleAdvEncCmd
 
 from . import CODECS, _TestEncoderBase, _TestEncoderBaseParams, _TestEncoderFull, _TestEncoderFullAll
@@ -1014,3 +1015,16 @@ def test_consolidate_plus() -> None:
     assert enc_cmd4.arg3 == 0x03
     assert codec.consolidate(copy(enc_cmd4), enc_cmd3) is None
     assert codec.consolidate(copy(enc_cmd1), enc_cmd4) is not None
+
+
+def test_sign_cipher_cache() -> None:
+    """Test the AES cipher contexts cache and the batch sign."""
+    codec = CODECS["fanlamp_pro_v2"]
+    assert isinstance(codec, FanLampEncoderV2)
+    codec.CIPHERS.clear()
+    blocks = [bytes(range(i, i + 16)) for i in range(4)]
+    signs = [codec._sign(block, 0x12, 0xABCD) for block in blocks]  # noqa: SLF001
+    assert codec.CIPHERS.stats() == {"size": 1, "maxsize": 256, "hits": 3, "misses": 1}
+    assert codec.sign_batch(blocks, 0x12, 0xABCD) == signs
+    assert codec.sign_batch(blocks, 0x13, 0xABCD) != signs
+    assert codec.CIPHERS.stats() == {"size": 2, "maxsize": 256, "hits": 4, "misses": 2}
@@ -1,7 +1,10 @@
 """Test global init and codec consistency."""
 
 # ruff: noqa: S101
-from ble_adv.codecs import PHONE_APPS, get_codec_list
+from pathlib import Path
+
+import pytest
+from ble_adv.codecs import CODEC_FAMILIES, PHONE_APPS, BleAdvCodecFamily, BleAdvCodecRegistry, families, get_codec_list, get_codecs, render_families
 
 
 def test_codec_unique_id() -> None:
@@ -23,3 +26,45 @@ def test_exist_phone_app() -> None:
     for app_name, phone_app_ids in PHONE_APPS.items():
         ids = [phone_app_id[0] for phone_app_id in phone_app_ids]
         assert all(x in id_list for x in ids), f"Not all id exist for {app_name}"
+
+
+def test_registry_families() -> None:
+    """Check that the lazy registry descriptors match the codecs built by the families."""
+    registry = get_codecs()
+    assert not any(registry.is_loaded(codec_id) for codec_id in registry)
+    for family in CODEC_FAMILIES:
+        assert {x.codec_id: x.match_id for x in family.build()} == family.match_ids
+    assert [x.codec_id for x in get_codec_list()] == list(registry)
+
+
+def test_registry_families_generated() -> None:
+    """Check that the generated 'families' module is up to date with the codec modules."""
+    assert Path(families.__file__).read_text() == render_families(), "Regenerate with: python -m ble_adv.codecs"
+
+
+def test_registry_lazy() -> None:
+    """Check that only the family of an accessed codec is built."""
+    registry = get_codecs()
+    assert "zhijia_v2" in registry
+    assert "not_a_codec" not in registry
+    assert registry.match_id("zhijia_vr1") == "zhijia_v1"
+    assert not registry.is_loaded("zhijia_vr1")
+    assert registry.built_items() == []
+    assert registry["zhijia_v2"].codec_id == "zhijia_v2"
+    assert registry.is_loaded("zhijia_vr1")
+    assert [codec_id for codec_id, _ in registry.built_items()] == list(families.FAMILY_MATCH_IDS["zhijia"])
+    assert not registry.is_loaded("fanlamp_pro_v1")
+    registry.warm(["fanlamp_pro_v1", "not_a_codec"])
+    assert registry.is_loaded("lampsmart_pro_v2")
+    assert not registry.is_loaded("mantra_v0")
+    registry.warm_all()
+    assert all(registry.is_loaded(codec_id) for codec_id in registry)
+    with pytest.raises(KeyError):
+        registry["not_a_codec"]
+
+
+def test_registry_bad_descriptor() -> None:
+    """Check that a descriptor not matching its family is rejected."""
+    registry = BleAdvCodecRegistry([BleAdvCodecFamily("le", ["CODECS"], {"lelight": "lelight", "lelight/bad": "lelight"})])
+    with pytest.raises(ValueError, match="does not match its codecs"):
+        registry["lelight"]
@@ -3,6 +3,8 @@
 # ruff: noqa: S101
 
 import pytest
+from ble_adv.codecs import set_keystream_cache_size
+from ble_adv.codecs.mantra import MantraEncoder
 from ble_adv.codecs.models import BleAdvAdvertisement, BleAdvCodec
 
 from . import CODECS, _TestEncoderBase, _TestEncoderFull, _TestEncoderFullAll
@@ -538,3 +540,35 @@ def test_r00134_translator_set_is_opt_in() -> None:
     assert conf is not None
     assert codec.enc_to_ent(enc_cmd, BleAdvCodec.DEF_TRANS_NAME) == []
     assert len(codec.enc_to_ent(enc_cmd, "R00134 remote")) == 1
+
+
+def _ref_whiten16(buffer: bytes, seed: int, param: int = 4777, xorer: int = 73) -> bytes:
+    """Bit by bit reference 16 bits LFSR whitening."""
+    obuf = bytearray()
+    r = seed
+    for val in buffer:
+        b = 0
+        for j in range(8):
+            high_bit = 0x8000 & r
+            r = (r << 1) & 0xFFFF
+            if high_bit != 0:
+                r ^= param
+                b |= 1 << (7 - j)
+            if r == 0:
+                r = 1061
+        obuf.append(val ^ xorer ^ b)
+    return bytes(obuf)
+
+
+def test_whiten16_keystream_cache() -> None:
+    """Test the Mantra keystream cache gives the same results as the bit by bit whitening."""
+    codec: MantraEncoder = CODECS["mantra_v0"]  # type: ignore[none]
+    buffer = bytes(range(13))
+    codec.KEYSTREAMS.clear()
+    for seed in [0x0000, 0x0001, 0x1234, 0xFFFF]:
+        assert codec._whiten16(buffer, seed) == _ref_whiten16(buffer, seed)  # noqa: SLF001
+        assert codec._whiten16(buffer, seed) == _ref_whiten16(buffer, seed)  # noqa: SLF001
+    assert codec.KEYSTREAMS.stats() == {"size": 4, "maxsize": 1024, "hits": 4, "misses": 4}
+    set_keystream_cache_size(2)
+    assert codec.KEYSTREAMS.stats() == {"size": 2, "maxsize": 2, "hits": 4, "misses": 4}
+    set_keystream_cache_size(1024)
@@ -1,7 +1,10 @@
 """Models Unit Tests."""
 
 # ruff: noqa: S101
+from collections.abc import Callable
 from copy import copy
+from dataclasses import asdict
+from typing import Any
 
 from ble_adv.codecs.const import (
     ATTR_BLUE,
@@ -50,10 +53,11 @@ from ble_adv.codecs.models import (
     LightCmd,
     RGBLightCmd,
     Trans,
+    TranslatorSet,
     as_hex,
 )
 
-from . import _from_dotted
+from . import CODECS, _from_dotted
 
 EncCmd = EncoderMatcher
 
@@ -74,6 +78,8 @@ def test_adv() -> None:
     adv = BleAdvAdvertisement.FromRaw(_from_dotted(raw_msg))
     assert adv.ble_type == 0
     assert adv.to_raw() == _from_dotted(raw_msg)
+    adv = BleAdvAdvertisement.FromRaw(_from_dotted("02.01.1A.03.FF.01.02.04.09.41.42.43.03.16.05.06.09.FF"))
+    assert (adv.ble_type, adv.raw, adv.second_type, adv.second_raw) == (0xFF, b"\x01\x02", 0x16, b"\x05\x06")
 
 
 def test_enc_cmd() -> None:
@@ -84,6 +90,12 @@ def test_enc_cmd() -> None:
     enc_cmd.arg1 = 0x13
     enc_cmd.arg2 = 0x14
     assert repr(enc_cmd) == "cmd: 0x10, param: 0x11, args: [18,19,20]"
+    assert enc_cmd.to_dict() == asdict(enc_cmd)
+    enc_cmd2 = copy(enc_cmd)
+    assert enc_cmd2 == enc_cmd
+    enc_cmd2.arg4 = 1
+    assert enc_cmd2 != enc_cmd
+    assert not hasattr(enc_cmd, "__dict__")
 
 
 def test_ent_attr() -> None:
@@ -95,6 +107,9 @@ def test_ent_attr() -> None:
     assert ent_attr.id == (FAN_TYPE, 0)
     assert ent_attr.get_attr_as_float(ATTR_SPEED) == 6.0
     assert hash(ent_attr) != 0
+    assert hash(ent_attr) == hash(BleAdvEntAttr([ATTR_SPEED, ATTR_ON], dict(reversed(attrs.items())), FAN_TYPE, 0))
+    assert copy(ent_attr) == ent_attr
+    assert ent_attr.to_dict() == {"chg_attrs": [ATTR_ON, ATTR_SPEED], "attrs": attrs, "base_type": FAN_TYPE, "index": 0}
 
 
 def test_config() -> None:
@@ -105,6 +120,11 @@ def test_config() -> None:
     conf.seed = 0x12
     conf.tx_count = 2
     assert repr(conf) == "id: 0x0000000C, index: 1, tx: 2, seed: 0x0012"
+    conf2 = copy(conf)
+    assert conf2.to_dict() == conf.to_dict()
+    assert conf2 == conf
+    conf2.tx_count = 3
+    assert conf2 != conf
 
 
 def test_entity_matcher() -> None:
@@ -302,6 +322,12 @@ def test_codec() -> None:
     assert codec.decode_adv(BleAdvAdvertisement(0x16, _from_dotted("55.56.74.65.73.74"))) == (BleAdvEncCmd(0x10), BleAdvConfig())
     assert codec.decode_adv(BleAdvAdvertisement(0x16, _from_dotted("00.00.74.65.73.74"))) == (None, None)
     assert codec.decode_adv(BleAdvAdvertisement(0x00, _from_dotted("55.56.74.65.73.74"))) == (None, None)
+    codec.debug_mode = True
+    codec.header([0x56], 1).footer([0x74])
+    assert codec.decode_adv(BleAdvAdvertisement(0x16, _from_dotted("11.57.22.33.44.55.74"))) == (None, None)
+    assert codec.decode_adv(BleAdvAdvertisement(0x16, _from_dotted("11.56.22.33.44.55.75"))) == (None, None)
+    assert codec.decode_adv(BleAdvAdvertisement(0x16, _from_dotted("11.56.22.33.44.55.74"))) == (BleAdvEncCmd(0x10), BleAdvConfig())
+    codec.debug_mode = False
     assert codec.ent_to_enc(ent_light_binary, BleAdvCodec.DEF_TRANS_NAME) == [BleAdvEncCmd(0x10)]
     assert codec.enc_to_ent(BleAdvEncCmd(0x10), BleAdvCodec.DEF_TRANS_NAME) == [BleAdvEntAttr([ATTR_ON], {ATTR_ON: True}, LIGHT_TYPE, 0)]
 
@@ -319,3 +345,63 @@ def test_codec_id() -> None:
     assert _TestCodec().fid("tc", "mid").match_id == "mid"
     assert _TestCodec().fid("tc", "mid").match_params == []
     assert _TestCodec().fid("tc", "mid", [True, ["aa"]]).match_params == [True, ["aa"]]
+
+
+def _safe_call(func: Callable[..., Any], *args: Any) -> Any:  # noqa: ANN401
+    try:
+        return func(*args)
+    except (KeyError, TypeError, ValueError) as exc:
+        return type(exc)
+
+
+def _linear_enc_to_ent(tr_set: TranslatorSet, enc_cmd: BleAdvEncCmd) -> list[BleAdvEntAttr]:
+    return [trans.enc_to_ent(enc_cmd) for trans in tr_set if trans.matches_enc(enc_cmd)]
+
+
+def _linear_ent_to_enc(tr_set: TranslatorSet, ent_attr: BleAdvEntAttr) -> list[BleAdvEncCmd]:
+    return [trans.ent_to_enc(ent_attr) for trans in tr_set if trans.matches_ent(ent_attr)]
+
+
+def test_translator_set_dispatch() -> None:
+    """Test the compiled dispatch of all the codecs translators gives the same results as a linear scan."""
+    for codec in CODECS.values():
+        for tr_set in codec.get_translator_sets().values():
+            ent_attrs = []
+            for trans in tr_set:
+                for arg in (0, 1, 50, 255):
+                    enc_cmd = trans.enc.create()
+                    enc_cmd.arg0 = enc_cmd.arg0 or arg
+                    enc_cmd.arg1 = enc_cmd.arg1 or arg
+                    expected = _safe_call(_linear_enc_to_ent, tr_set, enc_cmd)
+                    assert _safe_call(tr_set.enc_to_ent, enc_cmd) == expected
+                    if isinstance(expected, list):
+                        ent_attrs.extend(expected)
+                ent_attrs.append(trans.ent.create())
+            for ent_attr in ent_attrs:
+                assert _safe_call(tr_set.ent_to_enc, ent_attr) == _safe_call(_linear_ent_to_enc, tr_set, ent_attr)
+    tr_set = TranslatorSet([Trans(LightCmd().act(ATTR_ON, True), EncCmd(0x10))])
+    assert tr_set.get_supported_features(LIGHT_TYPE) == [{ATTR_ON: {True}, ATTR_SUB_TYPE: {LIGHT_TYPE_ONOFF}}]
+    assert tr_set.get_supported_features(LIGHT_TYPE) is tr_set.get_supported_features(LIGHT_TYPE)
+    tr_set.add_translators([Trans(LightCmd().act(ATTR_ON, False), EncCmd(0x11))])
+    assert tr_set.get_supported_features(LIGHT_TYPE) == [{ATTR_ON: {False, True}, ATTR_SUB_TYPE: {LIGHT_TYPE_ONOFF}}]
+    assert tr_set.enc_to_ent(BleAdvEncCmd(0x11)) == [BleAdvEntAttr([ATTR_ON], {ATTR_ON: False}, LIGHT_TYPE, 0)]
+
+
+def test_translator_set_changes() -> None:
+    """Test the compiled tables are rebuilt after a change of a translator, a matcher or an item of the set."""
+    trans_on = Trans(LightCmd().act(ATTR_ON, True), EncCmd(0x10))
+    tr_set = TranslatorSet([trans_on, Trans(LightCmd().act(ATTR_ON, False), EncCmd(0x11))])
+    ent_on = BleAdvEntAttr([ATTR_ON], {ATTR_ON: True}, LIGHT_TYPE, 0)
+    assert tr_set.ent_to_enc(ent_on) == [BleAdvEncCmd(0x10)]
+    assert tr_set.enc_to_ent(BleAdvEncCmd(0x10)) == [ent_on]
+    trans_on.no_reverse()
+    assert tr_set.enc_to_ent(BleAdvEncCmd(0x10)) == []
+    trans_on.no_direct()
+    assert tr_set.ent_to_enc(ent_on) == []
+    tr_set[0] = Trans(LightCmd().act(ATTR_ON, True), EncCmd(0x12))
+    assert tr_set.ent_to_enc(ent_on) == [BleAdvEncCmd(0x12)]
+    tr_set[0].enc.eq("param", 1)
+    assert tr_set.enc_to_ent(BleAdvEncCmd(0x12)) == []
+    enc_cmd = BleAdvEncCmd(0x12)
+    enc_cmd.param = 1
+    assert tr_set.enc_to_ent(enc_cmd) == [ent_on]
@@ -0,0 +1,99 @@
+"""Codec Utils Unit Tests."""
+
+# ruff: noqa: S101
+from binascii import crc_hqx
+
+from ble_adv.codecs.utils import Crc16, KeystreamCache, crc16_le, reverse_all, reverse_byte, reverse_short, whiten
+
+from . import _from_dotted
+
+
+def _ref_whiten(buffer: bytes, seed: int) -> bytes:
+    """Bit by bit reference whitening."""
+    obuf = []
+    r = seed
+    for val in buffer:
+        b = 0
+        for j in range(8):
+            r <<= 1
+            if r & 0x80:
+                r ^= 0x11
+                b |= 1 << j
+            r &= 0x7F
+        obuf.append(val ^ b)
+    return bytes(obuf)
+
+
+def test_whiten() -> None:
+    """Test whiten against the reference implementation."""
+    buffer = _from_dotted("F9.08.49.89.E4.E1.A2.3E.6C.95.0B.58.C9.38.28.07.00.FF.AA.55")
+    for seed in [0x0C, 0x2B, 0x37, 0x48, 0x69, 0x6F, 0x7F, 0xD3]:
+        for length in [0, 1, 5, len(buffer)]:
+            assert whiten(buffer[:length], seed) == _ref_whiten(buffer[:length], seed)
+            assert whiten(whiten(buffer[:length], seed), seed) == buffer[:length]
+    assert whiten(bytearray(buffer), 0x37) == _ref_whiten(buffer, 0x37)
+    assert whiten(memoryview(buffer), 0x37) == _ref_whiten(buffer, 0x37)
+
+
+def test_whiten_chained() -> None:
+    """Test whiten with several chained seeds."""
+    buffer = _from_dotted("F9.08.49.89.E4.E1.A2.3E.6C.95.0B.58.C9")
+    assert whiten(buffer, 0x37, 0x7F) == _ref_whiten(_ref_whiten(buffer, 0x37), 0x7F)
+    assert whiten(whiten(buffer, 0x7F, 0x37), 0x37, 0x7F) == buffer
+
+
+def _ref_crc16_le(buffer: bytes, seed: int, poly: int = 0x8408, ref_in: bool = True, ref_out: bool = True) -> int:
+    """Bit by bit reference CRC16."""
+    crc = seed if not ref_in else seed ^ 0xFFFF
+    for byte in buffer:
+        crc = crc ^ byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ poly if crc & 0x0001 else crc >> 1
+    return crc if not ref_out else crc ^ 0xFFFF
+
+
+def test_reverse() -> None:
+    """Test bytes reversal."""
+    assert reverse_byte(0xCA) == 0x53
+    assert reverse_short(0xCA01) == 0x8053
+    buffer = _from_dotted("CA.01.00.FF.0F")
+    assert reverse_all(buffer) == _from_dotted("53.80.00.FF.F0")
+    assert reverse_all(bytearray(buffer)) == _from_dotted("53.80.00.FF.F0")
+    assert isinstance(reverse_all(bytearray(buffer)), bytes)
+    assert reverse_all(b"") == b""
+
+
+def test_crc16() -> None:
+    """Test the table driven CRC16 against the references."""
+    buffer = _from_dotted("F9.08.49.89.E4.E1.A2.3E.6C.95.0B.58.C9.38.28.07.00.FF.AA.55")
+    for seed in [0x0000, 0xFFFF, 0xA5BE, 0x696B, 0x1234]:
+        assert Crc16(0x1021)(buffer, seed) == crc_hqx(buffer, seed)
+        assert Crc16(0x1021, True, True)(buffer, seed) == _ref_crc16_le(buffer, seed, 0x8408, False, False)
+        assert Crc16(0x8005, True, True)(buffer, seed) == _ref_crc16_le(buffer, seed, 0xA001, False, False)
+        assert Crc16(0x1021, True, False)(buffer, seed) == reverse_short(_ref_crc16_le(buffer, seed, 0x8408, False, False))
+        assert Crc16(0x1021, False, True, 0xFFFF)(buffer, seed) == reverse_short(crc_hqx(buffer, seed)) ^ 0xFFFF
+        for ref_in in [True, False]:
+            for ref_out in [True, False]:
+                assert crc16_le(buffer, seed, 0x8408, ref_in, ref_out) == _ref_crc16_le(buffer, seed, 0x8408, ref_in, ref_out)
+    assert Crc16(0x1021, True, True, 0xFFFF)(b"123456789", 0xFFFF) == 0x906E  # CRC-16/X-25 check value
+    assert Crc16(0x1021)(b"123456789", 0xFFFF) == 0x29B1  # CRC-16/CCITT-FALSE check value
+
+
+def test_keystream_cache() -> None:
+    """Test the keystream LRU cache."""
+    cache = KeystreamCache(lambda seed, length: bytes([seed] * length), 2)
+    assert cache.xor(b"\x00\x01", 0x10) == b"\x10\x11"
+    assert cache.xor(b"\x01\x00", 0x10) == b"\x11\x10"
+    assert cache.stats() == {"size": 1, "maxsize": 2, "hits": 1, "misses": 1}
+    assert cache.xor(b"\x00\x01\x02", 0x10) == b"\x10\x11\x12"  # different length: miss
+    assert cache.xor(b"\x00", 0x20) == b"\x20"  # evicts (0x10, 2)
+    assert cache.stats() == {"size": 2, "maxsize": 2, "hits": 1, "misses": 3}
+    assert cache.xor(b"\x00\x01", 0x10) == b"\x10\x11"
+    assert cache.stats() == {"size": 2, "maxsize": 2, "hits": 1, "misses": 4}
+    cache.resize(1)
+    assert cache.stats() == {"size": 1, "maxsize": 1, "hits": 1, "misses": 4}
+    cache.resize(0)
+    assert cache.xor(b"\x00", 0x30) == b"\x30"
+    assert cache.stats() == {"size": 0, "maxsize": 0, "hits": 1, "misses": 5}
+    cache.clear()
+    assert cache.stats() == {"size": 0, "maxsize": 0, "hits": 0, "misses": 0}
@@ -7,6 +7,7 @@ from unittest import mock
 import pytest
 import voluptuous as vol
 from ble_adv import async_setup, get_coordinator
+from ble_adv.adapters import PRIO_COMMAND
 from ble_adv.codecs.models import BleAdvEntAttr
 from ble_adv.const import CONF_LAST_VERSION, DOMAIN
 from ble_adv.coordinator import BleAdvCoordinator
@@ -34,7 +35,7 @@ class _Device(mock.AsyncMock):
     set_event_entity = mock.MagicMock()
 
     def assert_apply_change(self, ent: BleAdvEntity, chgs: list[str]) -> None:
-        self.apply_change.assert_called_once_with(BleAdvEntAttr(chgs, ent.get_attrs(), ent._base_type, ent._index))  # noqa: SLF001
+        self.apply_change.assert_called_once_with(BleAdvEntAttr(chgs, ent.get_attrs(), ent._base_type, ent._index), PRIO_COMMAND)  # noqa: SLF001
         self.apply_change.reset_mock()
 
     def assert_no_change(self) -> None:
@@ -0,0 +1,134 @@
+"""Capture tests."""
+
+# ruff: noqa: S101
+import threading
+from io import BytesIO
+from pathlib import Path
+from unittest import mock
+
+import pytest
+from ble_adv.capture import (
+    MAGIC,
+    NB_RAW_SLOTS,
+    BleAdvCaptureFile,
+    BleAdvCaptureRecord,
+    BleAdvCaptureRing,
+    BleAdvCaptureWriter,
+    hash_mac,
+    read_capture,
+    read_capture_files,
+)
+
+MAC1 = "AA:BB:CC:DD:EE:01"
+MAC2 = "AA:BB:CC:DD:EE:02"
+
+
+def _raw(i: int) -> bytes:
+    return bytes([0x02, 0x01, 0x1A, 0x05, 0xFF]) + i.to_bytes(4, "little")
+
+
+def test_writer_reader() -> None:
+    """Test the round trip of a capture, including the raw references."""
+    stream = BytesIO()
+    writer = BleAdvCaptureWriter(stream, 100.0)
+    records = [
+        BleAdvCaptureRecord(0.0, "hci0", MAC1, _raw(1)),
+        BleAdvCaptureRecord(0.02, "hci0", MAC1, _raw(1)),
+        BleAdvCaptureRecord(0.021, "esp-test", MAC2, _raw(1)),
+        BleAdvCaptureRecord(1.5, "esp-test", "not a mac", _raw(2)),
+    ]
+    for rec in records:
+        writer.write(rec.ts + 100.0, rec.adapter_id, rec.orig, rec.raw)
+    assert writer.size == len(stream.getvalue())
+    stream.seek(0)
+    records[3].orig = "00:00:00:00:00:00"
+    assert list(read_capture(stream)) == records
+    # repeated raw adv only costs the record header
+    assert writer.size == len(MAGIC) + (3 + 1 + 4) + (3 + 1 + 8) + 4 * (3 + 12) + 2 * len(_raw(1))
+
+
+def test_writer_slots() -> None:
+    """Test the round robin raw table beyond its size."""
+    stream = BytesIO()
+    writer = BleAdvCaptureWriter(stream, 0.0)
+    raws = [_raw(i % (NB_RAW_SLOTS + 10)) for i in range(3 * NB_RAW_SLOTS)]
+    for i, raw in enumerate(raws):
+        writer.write(i / 1000.0, "hci0", MAC1, raw)
+    stream.seek(0)
+    assert [x.raw for x in read_capture(stream)] == raws
+
+
+def test_reader_invalid() -> None:
+    """Test invalid and truncated captures."""
+    with pytest.raises(ValueError, match="Not a BLE ADV capture"):
+        list(read_capture(BytesIO(b"NOTACAPTURE")))
+    stream = BytesIO()
+    writer = BleAdvCaptureWriter(stream, 0.0)
+    writer.write(0.0, "hci0", MAC1, _raw(1))
+    writer.write(0.1, "hci0", MAC1, _raw(2))
+    assert len(list(read_capture(BytesIO(stream.getvalue()[:-3])))) == 1
+
+
+def test_capture_file(tmp_path: Path) -> None:
+    """Test the rotating capture file."""
+    path = tmp_path / "capture.bin"
+    recorder = BleAdvCaptureFile(path, 200, 2)
+    for i in range(30):
+        recorder.record(50.0 + i, "hci0", MAC1, _raw(i))
+    recorder.close()
+    assert recorder.nb_records == 30
+    assert sorted(x.name for x in tmp_path.iterdir()) == ["capture.bin", "capture.bin.1", "capture.bin.2"]
+    records = list(read_capture_files(path))
+    assert [x.raw for x in records] == [_raw(i) for i in range(30 - len(records), 30)]
+    assert [x.ts for x in records] == [float(i) for i in range(30 - len(records), 30)]
+    diag = recorder.diagnostic_dump()
+    assert diag["type"] == "BleAdvCaptureFile"
+    assert not diag["failed"]
+
+
+def test_capture_file_overflow(tmp_path: Path) -> None:
+    """Test the records dropped when the writer thread lags behind."""
+    path = tmp_path / "capture.bin"
+    with mock.patch.object(BleAdvCaptureFile, "MAX_QUEUED", 2):
+        recorder = BleAdvCaptureFile(path, 10000, 0)
+    writing = threading.Event()
+    release = threading.Event()
+    write = recorder._write  # noqa: SLF001
+
+    def _slow_write(ts: float, adapter_id: str, orig: str, raw: bytes) -> None:
+        writing.set()
+        release.wait()
+        write(ts, adapter_id, orig, raw)
+
+    recorder._write = _slow_write  # noqa: SLF001
+    recorder.record(0.0, "hci0", MAC1, _raw(0))
+    assert writing.wait(1.0)
+    for i in range(1, 6):
+        recorder.record(float(i), "hci0", MAC1, _raw(i))
+    release.set()
+    recorder.close()
+    assert recorder.nb_records == 3
+    assert recorder.diagnostic_dump()["dropped"] == 3
+    assert [x.raw for x in read_capture_files(path)] == [_raw(0), _raw(1), _raw(2)]
+
+
+def test_capture_ring() -> None:
+    """Test the in memory ring."""
+    recorder = BleAdvCaptureRing(BleAdvCaptureRing.REC_SIZE * 10 + 10 * len(_raw(0)))
+    for i in range(25):
+        recorder.record(10.0 + i, "hci0", MAC1, _raw(i))
+    recorder.record(40.0, "hci0", MAC2, _raw(1))
+    diag = recorder.diagnostic_dump()
+    assert diag == {"type": "BleAdvCaptureRing", "records": 26, "kept": 10, "size": recorder.max_size, "max_size": recorder.max_size}
+    records = list(read_capture(BytesIO(recorder.dump())))
+    assert [x.raw for x in records] == [*(_raw(i) for i in range(16, 25)), _raw(1)]
+    assert [x.ts for x in records] == [*(float(i) for i in range(9)), 14.0]
+    assert {x.orig for x in records} == {MAC1, MAC2}
+    # exported with the macs hashed, distinct macs kept distinct
+    hashed = list(read_capture(BytesIO(recorder.dump(hash_macs=True))))
+    assert [x.raw for x in hashed] == [x.raw for x in records]
+    assert len({x.orig for x in hashed[:-1]}) == 1
+    assert hashed[0].orig not in (MAC1, MAC2, hashed[-1].orig)
+    assert hash_mac(MAC1, b"salt") == hash_mac(MAC1, b"salt") != hash_mac(MAC1, b"pepper")
+    recorder.close()
+    assert recorder.dump() == MAGIC
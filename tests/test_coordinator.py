@@ -3,12 +3,27 @@
 # ruff: noqa: S101
 import asyncio
 from datetime import datetime
+from io import BytesIO
+from pathlib import Path
 from unittest import mock
 
-from ble_adv.adapters import BleAdvQueueItem
-from ble_adv.codecs.models import BleAdvAdvertisement, BleAdvCodec, BleAdvConfig, BleAdvEncCmd
-from ble_adv.const import CONF_ADAPTER_ID, CONF_DEVICE_QUEUE, CONF_DURATION, CONF_INTERVAL, CONF_RAW, CONF_REPEAT
-from ble_adv.coordinator import BleAdvBaseDevice, BleAdvCoordinator, BleAdvRecvItem
+import pytest
+from ble_adv.adapters import PRIO_ADJUST, AdapterError, BleAdvAdapter, BleAdvAdapterAdvItem, BleAdvQueueItem
+from ble_adv.capture import BleAdvCaptureRing, read_capture
+from ble_adv.codecs import BleAdvCodecRegistry, get_codecs
+from ble_adv.codecs.models import BleAdvAdvertisement, BleAdvCodec, BleAdvConfig, BleAdvEncCmd, BleAdvEntAttr
+from ble_adv.const import (
+    CONF_ADAPTER_ID,
+    CONF_DEVICE_QUEUE,
+    CONF_DURATION,
+    CONF_INTERVAL,
+    CONF_RAW,
+    CONF_REPEAT,
+    TX_POLICY_BEST_N,
+    TX_POLICY_LEAST_LOADED,
+)
+from ble_adv.coordinator import BleAdvBaseDevice, BleAdvCoordinator, BleAdvExpiringMap, BleAdvRecvItem
+from homeassistant.const import CONF_FILE_PATH
 from homeassistant.core import HomeAssistant
 from homeassistant.loader import Manifest
 
@@ -22,6 +37,7 @@ class _Codec(mock.MagicMock):
     ign_duration = 2
     consolidate = mock.MagicMock(return_value=BleAdvEncCmd(0x20))
     get_translator_sets = mock.MagicMock(return_value={BleAdvCodec.DEF_TRANS_NAME: [], "tr_test": []})
+    signature = mock.MagicMock(return_value=(0xFF, 12, 0, b""))
 
 
 class _Device(BleAdvBaseDevice):
@@ -29,7 +45,34 @@ class _Device(BleAdvBaseDevice):
         super().__init__(coord, name, codec_id, adapter_ids, 1, 10, 1000, BleAdvConfig(1, 1))
 
 
-def _get_codecs() -> dict[str, BleAdvCodec]:
+class _Adapter(BleAdvAdapter):
+    def __init__(self, name: str, fail: bool = False) -> None:
+        super().__init__(name, "mac", mock.AsyncMock(), 100)
+        self.fail: bool = fail
+        self.advertised: list[bytes] = []
+
+    async def open(self) -> None:
+        self._opened = True
+
+    def close(self) -> None:
+        self._opened = False
+
+    async def _advertise(self, item: BleAdvAdapterAdvItem, adv_set: int = 0) -> None:  # noqa: ARG002
+        if self.fail:
+            raise AdapterError("Failing")
+        self.advertised.append(item.data)
+
+    async def _advertise_idle(self, adv_set: int = 0) -> None:
+        pass
+
+
+async def _drain(adapters: dict[str, _Adapter]) -> None:
+    await asyncio.sleep(0.01)  # fallback enqueued
+    for adapter in adapters.values():
+        await adapter.drain()
+
+
+def _get_codecs() -> BleAdvCodecRegistry:
     cod1 = _Codec()
     cod1.codec_id = "cod1"
     cod1.match_id = "cod1"
@@ -38,7 +81,7 @@ def _get_codecs() -> dict[str, BleAdvCodec]:
     cod2.codec_id = "cod2/a"
     cod2.match_id = "cod2"
     cod2.match_params = []
-    return {cod1.codec_id: cod1, cod2.codec_id: cod2}
+    return BleAdvCodecRegistry(codecs=[cod1, cod2])
 
 
 async def test_coordinator(hass: HomeAssistant, coord: BleAdvCoordinator) -> None:
@@ -53,8 +96,8 @@ async def test_coordinator(hass: HomeAssistant, coord: BleAdvCoordinator) -> Non
     assert coord.get_adapter_ids() == ["esp-test"]
     adv = BleAdvAdvertisement(0xFF, b"dtwithminlen", 0x1A)
     qi = BleAdvQueueItem(0x10, 1, 100, 20, [adv.to_raw()], 2)
-    await coord.advertise("not-exists", "q1", qi)
-    await coord.advertise("esp-test", "q1", qi)
+    assert not await (await coord.advertise("not-exists", "q1", qi))
+    assert await (await coord.advertise("esp-test", "q1", qi))
     await coord._esp_bt_manager.adapters["esp-test"].drain()  # noqa: SLF001
     assert t1.get_adv_calls() == [{"raw": adv.to_raw().hex()}]
     await coord.handle_raw_adv("esp-test", "", adv.to_raw())
@@ -74,6 +117,49 @@ async def test_coordinator(hass: HomeAssistant, coord: BleAdvCoordinator) -> Non
     assert coord.has_available_adapters()
 
 
+async def test_codec_index(coord: BleAdvCoordinator) -> None:
+    """Test the codec signature index."""
+    coord.codecs = get_codecs()
+    dev1 = _Device(coord, "dev1", "fanlamp_pro_v1/r1", ["esp-test"])
+    coord.add_device(dev1)
+    fl_codecs = {x.codec_id for x in coord.codecs.values() if x.match_id == "fanlamp_pro_v1"}
+    assert {codec_id for cands in coord._codec_index.values() for _, _, codec_id in cands} == fl_codecs  # noqa: SLF001
+    dev2 = _Device(coord, "dev2", "zhijia_v2", ["esp-test"])
+    coord.add_device(dev2)
+    adv = coord.codecs["fanlamp_pro_v1/r1"].encode_advs(BleAdvEncCmd(0x10), BleAdvConfig(1, 0))[0]
+    assert coord.codecs["fanlamp_pro_v1/r1"] in coord._candidate_codecs(adv)  # noqa: SLF001
+    assert coord.codecs["zhijia_v2"] not in coord._candidate_codecs(adv)  # noqa: SLF001
+    adv = coord.codecs["zhijia_v2"].encode_advs(BleAdvEncCmd(0x10), BleAdvConfig(1, 0))[0]
+    assert coord._candidate_codecs(adv) == [coord.codecs["zhijia_v2"]]  # noqa: SLF001
+    coord.remove_device(dev1)
+    assert coord._candidate_codecs(adv) == [coord.codecs["zhijia_v2"]]  # noqa: SLF001
+    coord.remove_device(dev2)
+    assert coord._codec_index == {}  # noqa: SLF001
+
+
+async def test_routes(coord: BleAdvCoordinator) -> None:
+    """Test the routing of decoded advs to devices."""
+    coord.codecs = _get_codecs()
+    dev1 = _Device(coord, "dev1", "cod1", ["esp-test", "other"])
+    dev1.add_listener("cod2/a", BleAdvConfig(2, 0), False)
+    assert dev1.routes() == {
+        ("cod1", 1, 1, "esp-test"): True,
+        ("cod1", 1, 1, "other"): True,
+        ("cod2", 2, 0, "esp-test"): False,
+        ("cod2", 2, 0, "other"): False,
+    }
+    coord.add_device(dev1)
+    dev2 = _Device(coord, "dev2", "cod1", ["esp-test"])
+    coord.add_device(dev2)
+    assert coord._routes[("cod1", 1, 1, "esp-test")] == {"dev1": (dev1, True), "dev2": (dev2, True)}  # noqa: SLF001
+    dev2.add_listener("cod1", BleAdvConfig(1, 1), False)
+    assert coord._routes[("cod1", 1, 1, "esp-test")] == {"dev1": (dev1, True), "dev2": (dev2, False)}  # noqa: SLF001
+    coord.remove_device(dev1)
+    assert coord._routes == {("cod1", 1, 1, "esp-test"): {"dev2": (dev2, False)}}  # noqa: SLF001
+    coord.remove_device(dev2)
+    assert coord._routes == {}  # noqa: SLF001
+
+
 async def test_device_pub(hass: HomeAssistant, coord: BleAdvCoordinator) -> None:
     """Test device publication."""
     codecs = _get_codecs()
@@ -151,6 +237,101 @@ async def test_deduplicate_tx_count_seed(coord: BleAdvCoordinator) -> None:
     dev1.async_on_command.reset_mock()
 
 
+async def test_tx_policy(coord: BleAdvCoordinator) -> None:
+    """Test the selection of the adapters by the TX policy."""
+    coord.codecs = _get_codecs()
+    dev = _Device(coord, "dev1", "cod1", ["hci0", "hci1", "esp-a"])
+    delays = {"hci0": 0.2, "hci1": None, "esp-a": 0.1}
+    coord.adapter_tx_delay = mock.MagicMock(side_effect=delays.get)
+    assert sorted(dev.tx_adapter_ids()) == ["esp-a", "hci0", "hci1"]
+    dev.tx_policy = TX_POLICY_LEAST_LOADED
+    assert dev.tx_adapter_ids() == ["esp-a"]
+    dev.tx_policy = TX_POLICY_BEST_N
+    assert dev.tx_adapter_ids() == ["esp-a", "hci0"]
+    dev.tx_adapters = 5
+    assert dev.tx_adapter_ids() == ["esp-a", "hci0"]
+    coord.adapter_tx_delay = mock.MagicMock(return_value=None)
+    assert sorted(dev.tx_adapter_ids()) == ["esp-a", "hci0", "hci1"]
+    # fallback to all the other adapters if the selected one does not transmit the command
+    adapters = {"hci0": _Adapter("hci0"), "hci1": _Adapter("hci1"), "esp-a": _Adapter("esp-a", fail=True)}
+    for adapter in adapters.values():
+        await adapter.async_init()
+    coord._get_adapter = mock.MagicMock(side_effect=adapters.get)  # noqa: SLF001
+    dev.tx_policy = TX_POLICY_LEAST_LOADED
+    dev.duration = 10
+    coord.adapter_tx_delay = mock.MagicMock(side_effect=delays.get)
+    completions = await dev.apply_cmd(BleAdvEncCmd(0x10))
+    assert len(completions) == 1
+    assert not await completions[0]
+    await _drain(adapters)
+    assert [len(x.advertised) for x in adapters.values()] == [1, 1, 0]
+    adapters["esp-a"]._on_error.assert_awaited_once()  # noqa: SLF001
+    # superseded command: no fallback for it
+    superseded = await dev.apply_cmd(BleAdvEncCmd(0x10))
+    await dev.apply_cmd(BleAdvEncCmd(0x10))
+    assert not await superseded[0]
+    await _drain(adapters)
+    assert [len(x.advertised) for x in adapters.values()] == [2, 2, 0]
+    # transmitted by the selected adapter: no fallback
+    adapters["esp-a"].fail = False
+    assert await (await dev.apply_cmd(BleAdvEncCmd(0x10)))[0]
+    await _drain(adapters)
+    assert [len(x.advertised) for x in adapters.values()] == [2, 2, 1]
+    for adapter in adapters.values():
+        await adapter.async_final()
+
+
+async def test_tx_policy_idle_adapters(coord: BleAdvCoordinator) -> None:
+    """Test the least loaded policy selecting the idle adapter with the lowest latency."""
+    coord.codecs = _get_codecs()
+    dev = _Device(coord, "dev1", "cod1", ["hci0", "hci1"])
+    adapters = {"hci0": _Adapter("hci0"), "hci1": _Adapter("hci1")}
+    for adapter in adapters.values():
+        await adapter.async_init()
+    coord._get_adapter = mock.MagicMock(side_effect=adapters.get)  # noqa: SLF001
+    adapters["hci0"].tx_latency = 0.05
+    adapters["hci1"].tx_latency = 0.02
+    assert coord.adapter_tx_delay("hci0") == 0.05
+    dev.tx_policy = TX_POLICY_LEAST_LOADED
+    assert dev.tx_adapter_ids() == ["hci1"]
+    for adapter in adapters.values():
+        await adapter.async_final()
+
+
+async def test_entity_preemption(coord: BleAdvCoordinator) -> None:
+    """Test a turn off dropping the pending brightness change of the entity."""
+    coord.codecs = _get_codecs()
+    dev = _Device(coord, "dev1", "cod1", ["hci0"])
+    dev.codec = mock.MagicMock(ign_duration=2)
+    dev.codec.ent_to_enc.side_effect = lambda ent_attr, _: [BleAdvEncCmd(0x21 if "br" in ent_attr.chg_attrs else 0x11)]
+    dev.codec.encode_advs.side_effect = lambda enc_cmd, _: [BleAdvAdvertisement(0xFF, bytes([enc_cmd.cmd]))]
+    adapters = {"hci0": _Adapter("hci0")}
+    coord._get_adapter = mock.MagicMock(side_effect=adapters.get)  # noqa: SLF001
+    brightness = await dev.advertise(BleAdvEntAttr(["br"], {"on": True, "br": 0.5}, "light", 0), PRIO_ADJUST)
+    await dev.advertise(BleAdvEntAttr(["br"], {"on": True, "br": 0.5}, "light", 1), PRIO_ADJUST)
+    off = await dev.advertise(BleAdvEntAttr(["on"], {"on": False}, "light", 0))
+    assert not await brightness[0]
+    assert adapters["hci0"].nb_queued == 2
+    await adapters["hci0"].async_init()
+    await _drain(adapters)
+    assert await off[0]
+    # only the off message of the entity left, the brightness change of the other entity kept
+    assert [x[-1] for x in adapters["hci0"].advertised] == [0x21, 0x11]
+    await adapters["hci0"].async_final()
+
+
+async def test_adapter_stats(coord: BleAdvCoordinator) -> None:
+    """Test the adapter stats accessor."""
+    assert coord.adapter_stats("hci0") is None
+    adapter = mock.MagicMock(available=True, nb_queued=2)
+    adapter.tx_delay.return_value = 0.12345
+    adapter.stats.diagnostic_dump.return_value = {"enqueued": 3}
+    coord._get_adapter = mock.MagicMock(return_value=adapter)  # noqa: SLF001
+    assert coord.adapter_stats("hci0") == {"queued": 2, "tx_delay": 0.123, "enqueued": 3}
+    adapter.available = False
+    assert coord.adapter_stats("hci0") is None
+
+
 async def test_listening(coord: BleAdvCoordinator) -> None:
     """Test listening mode."""
     coord.codecs = _get_codecs()
@@ -214,12 +395,14 @@ async def test_inject_raw(hass: HomeAssistant, coord: BleAdvCoordinator) -> None
 
 async def test_decode_raw(coord: BleAdvCoordinator) -> None:
     """Test Raw Decoding."""
-    coord.codecs = {"cod1": _Codec()}
+    cod1 = _Codec()
+    cod1.codec_id = "cod1"
+    coord.codecs = BleAdvCodecRegistry(codecs=[cod1])
     res = coord.decode_raw("123")
     assert res == ["Cannot convert to bytes"]
     res = coord.decode_raw("1234")
     assert res == ["cod1", "1234", "cmd: 0x10, param: 0x00, args: [0,0,0]", "id: 0x00000001, index: 0, tx: 0, seed: 0x0000", "", "<tr_test> "]
-    coord.codecs.clear()
+    coord.codecs = BleAdvCodecRegistry()
     res = coord.decode_raw("1234")
     assert res == ["Could not be decoded by any known codec"]
 
@@ -236,3 +419,74 @@ async def test_full_diagnostics(coord: BleAdvCoordinator) -> None:
     with mock.patch("ble_adv.coordinator.async_get_integration", side_effect=_mock_async_get_integration):
         diag = await coord.full_diagnostic_dump()
         assert len(diag["coordinator"]) > 0
+
+
+async def test_capture_replay(hass: HomeAssistant, coord: BleAdvCoordinator) -> None:
+    """Test the capture of the received advs and their replay."""
+    coord.codecs = get_codecs()
+    dev1 = _Device(coord, "dev1", "zhijia_v2", ["hci0"])
+    dev1.add_listener("zhijia_v2", BleAdvConfig(0x00E15324, 1), True)
+    dev1.async_on_command = mock.AsyncMock()
+    coord.add_device(dev1)
+    ring = BleAdvCaptureRing(4096)
+    coord.recorder = ring
+    raw = bytes.fromhex("02011A1BFF229D9DC969F92FCAC76952DA7BB3366E87AFC44A5F85F69CA919")
+    await coord.handle_raw_adv("hci0", "AA:BB:CC:DD:EE:FF", raw)
+    await coord.handle_raw_adv("hci0", "AA:BB:CC:DD:EE:FF", raw)
+    dev1.async_on_command.assert_called_once()
+    assert ring.nb_records == 2
+    assert coord.diagnostic_dump()["capture"] == {
+        "type": "BleAdvCaptureRing",
+        "records": 2,
+        "kept": 2,
+        "size": 2 * (ring.REC_SIZE + len(raw)),
+        "max_size": 4096,
+    }
+    # exported with the macs hashed
+    path = Path(hass.config.config_dir) / "capture.bin"
+    assert await coord.export_capture(path) == {}
+    exported = list(read_capture(BytesIO(path.read_bytes())))
+    assert [x.raw for x in exported] == [raw, raw]
+    assert exported[0].orig != "AA:BB:CC:DD:EE:FF"
+    assert await coord.export_capture(Path(hass.config.config_dir).parent / "capture.bin") == {CONF_FILE_PATH: mock.ANY}
+    # replay on a dedicated coordinator: decoded by its own device, the live one untouched
+    with pytest.raises(RuntimeError):
+        await coord.replay(read_capture(BytesIO(ring.dump())))
+    replay_coord = coord.create_replay_coordinator()
+    dev2 = _Device(replay_coord, "dev2", "zhijia_v2", ["hci0"])
+    dev2.add_listener("zhijia_v2", BleAdvConfig(0x00E15324, 1), True)
+    dev2.async_on_command = mock.AsyncMock()
+    replay_coord.add_device(dev2)
+    dev1.async_on_command.reset_mock()
+    await replay_coord.replay(read_capture(BytesIO(ring.dump())))
+    dev2.async_on_command.assert_called_once()
+    dev1.async_on_command.assert_not_called()
+    assert ring.nb_records == 2
+    assert replay_coord.recorder is None
+    assert coord.clock is not replay_coord.clock
+
+
+def test_expiring_map() -> None:
+    """Test the expiring map used to deduplicate advs."""
+    emap = BleAdvExpiringMap(3)
+    emap.set(b"a", 1, 10.0)
+    emap.set(b"b", 2, 20.0)
+    emap.set(b"a", 1, 30.0)  # extend
+    emap.expire(15.0)
+    assert b"a" in emap
+    assert emap.get(b"b") == 2
+    emap.expire(25.0)
+    assert b"b" not in emap
+    assert emap.get(b"b") is None
+    emap.set(b"c", 3, 40.0)
+    emap.set(b"d", 4, 40.0)
+    assert emap.get(b"a") == 1
+    emap.set(b"e", 5, 40.0)  # size cap: LRU 'c' evicted
+    assert [x for x, _, _ in emap.items()] == [b"d", b"a", b"e"]
+    for i in range(100):
+        emap.set(b"a", 1, 50.0 + i)
+    assert len(emap._heap) <= 32  # noqa: SLF001
+    emap.expire(100.0)
+    assert [(x, exp, val) for x, exp, val in emap.items()] == [(b"a", 149.0, 1)]
+    emap.clear()
+    assert len(emap) == 0
@@ -2,17 +2,21 @@
 
 # ruff: noqa: S101
 import asyncio
+from datetime import timedelta
 from typing import Any
 from unittest import mock
 
-from ble_adv.adapters import BleAdvQueueItem
-from ble_adv.codecs.const import ATTR_CMD, ATTR_CMD_PAIR, ATTR_CMD_TIMER, ATTR_CMD_TOGGLE, ATTR_ON, ATTR_SUB_TYPE, ATTR_TIME, DEVICE_TYPE
+from ble_adv.adapters import PRIO_ADJUST, PRIO_COMMAND, PRIO_REFRESH, BleAdvQueueItem
+from ble_adv.codecs import BleAdvCodecRegistry
+from ble_adv.codecs.const import ATTR_BR, ATTR_CMD, ATTR_CMD_PAIR, ATTR_CMD_TIMER, ATTR_CMD_TOGGLE, ATTR_ON, ATTR_SUB_TYPE, ATTR_TIME, DEVICE_TYPE
 from ble_adv.codecs.models import BleAdvAdvertisement, BleAdvConfig, BleAdvEncCmd, BleAdvEntAttr
 from ble_adv.const import CONF_FORCED_OFF, CONF_FORCED_ON, SILENT_SWITCH_TYPE
 from ble_adv.coordinator import BleAdvCoordinator
 from ble_adv.device import ATTR_AVAILABLE, ATTR_IS_ON, BleAdvDevice, BleAdvEntity, BleAdvEvent, BleAdvStateAttribute, BleAdvSwitch
 from homeassistant.const import STATE_ON
 from homeassistant.core import HomeAssistant, State
+from homeassistant.util import dt as dt_util
+from pytest_homeassistant_custom_component.common import async_fire_time_changed
 
 from .conftest import _Device
 
@@ -53,7 +57,8 @@ async def test_device(hass: HomeAssistant, coord: BleAdvCoordinator) -> None:
     codec.ent_to_enc = mock.MagicMock(return_value=[BleAdvEncCmd(0x10)])
     adv = BleAdvAdvertisement(0xFF, b"12345")
     codec.encode_advs = mock.MagicMock(return_value=[adv])
-    coord.codecs = {codec.codec_id: codec}
+    codec.signature = mock.MagicMock(return_value=(0xFF, 7, 0, b""))
+    coord.codecs = BleAdvCodecRegistry(codecs=[codec])
     coord.advertise = mock.AsyncMock()
     conf = BleAdvConfig(0xABCDEF, 1)
     device = BleAdvDevice(hass, "my_device", "device", codec.codec_id, ["my_adapter"], 1, 20, 100, conf, coord)
@@ -102,7 +107,7 @@ async def test_device(hass: HomeAssistant, coord: BleAdvCoordinator) -> None:
     assert ent0.is_on
     ent0.async_write_ha_state.assert_called_once()
     ent0.async_write_ha_state.reset_mock()
-    ent0.handle_change.assert_called_once_with(["on"], {"on": True, "sub_type": "ent_sub_type", "cmd": "INIT_INITB"})
+    ent0.handle_change.assert_called_once_with(["on"], {"on": True, "sub_type": "ent_sub_type", "cmd": "INIT_INITB"}, PRIO_REFRESH)
     ent0.handle_change.reset_mock()
     ent1.handle_change.assert_not_called()
     toggle_cmd = BleAdvEntAttr([ATTR_CMD], {ATTR_CMD: ATTR_CMD_TOGGLE}, "ent_type", 0)
@@ -139,6 +144,54 @@ async def test_device(hass: HomeAssistant, coord: BleAdvCoordinator) -> None:
     assert not ent1.is_on
 
 
+async def _async_time_travel(hass: HomeAssistant, delay_ms: int) -> None:
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(milliseconds=delay_ms))
+    await hass.async_block_till_done()
+
+
+async def test_device_coalescing(hass: HomeAssistant, coord: BleAdvCoordinator) -> None:
+    """Test the coalescing of the continuous changes."""
+    coord.debounce = 50
+    device = BleAdvDevice(hass, "my_device", "device", "fanlamp_pro_v1", ["my_adapter"], 1, 20, 100, BleAdvConfig(0xABCDEF, 1), coord)
+    device.advertise = mock.AsyncMock()
+    brs = [BleAdvEntAttr([ATTR_BR], {ATTR_ON: True, ATTR_BR: x / 10.0}, "light", 0) for x in range(5)]
+    for br in brs:
+        await device.apply_change(br)
+    await device.apply_change(BleAdvEntAttr([ATTR_BR], {ATTR_ON: True, ATTR_BR: 1.0}, "light", 1))
+    # first change at once, the latest one at the end of the window
+    br1 = BleAdvEntAttr([ATTR_BR], {ATTR_ON: True, ATTR_BR: 1.0}, "light", 1)
+    assert device.advertise.await_args_list == [mock.call(brs[0], PRIO_ADJUST), mock.call(br1, PRIO_ADJUST)]
+    await _async_time_travel(hass, 60)
+    assert device.advertise.await_args_list[2:] == [mock.call(brs[4], PRIO_ADJUST)]
+    await _async_time_travel(hass, 60)
+    assert device.advertise.await_count == 3
+    device.advertise.reset_mock()
+    # other change of the entity: pending changes flushed first
+    off_cmd = BleAdvEntAttr([ATTR_ON], {ATTR_ON: False}, "light", 0)
+    for br in brs[:3]:
+        await device.apply_change(br)
+    await device.apply_change(off_cmd)
+    assert device.advertise.await_args_list == [
+        mock.call(brs[0], PRIO_ADJUST),
+        mock.call(brs[2], PRIO_ADJUST),
+        mock.call(off_cmd, PRIO_COMMAND),
+    ]
+    await _async_time_travel(hass, 60)
+    assert device.advertise.await_count == 3
+    device.advertise.reset_mock()
+    # teardown: windows cancelled, pending changes dropped
+    for br in brs[:3]:
+        await device.apply_change(br)
+    await device.async_final()
+    await _async_time_travel(hass, 60)
+    assert device.advertise.await_args_list == [mock.call(brs[0], PRIO_ADJUST)]
+    device.advertise.reset_mock()
+    coord.debounce = 0
+    for br in brs:
+        await device.apply_change(br)
+    assert device.advertise.await_count == 5
+
+
 async def test_entity(device: _Device) -> None:
     """Test entity."""
     ent = _Entity("ent_type", "ent_sub_type", device, 0)
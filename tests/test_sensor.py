@@ -0,0 +1,49 @@
+"""Sensor Entity tests."""
+
+# ruff: noqa: S101
+from unittest import mock
+
+from ble_adv.sensor import BleAdvAdapterSensor, async_setup_entry
+from homeassistant.core import HomeAssistant
+
+from .conftest import create_base_entry
+
+
+def _added_adapters(add_ent_mock: mock.MagicMock) -> list[str]:
+    return [ent._adapter_id for call in add_ent_mock.call_args_list for ent in call.args[0]]  # noqa: SLF001
+
+
+async def test_setup(hass: HomeAssistant) -> None:
+    """Test async_setup_entry: a single sensor per adapter, handed over on unload."""
+    ent1 = await create_base_entry(hass, "ent_id1", {})
+    ent2 = await create_base_entry(hass, "ent_id2", {})
+    hass.data["ble_adv"][ent1.entry_id].adapter_ids = ["hci0", "hci1"]
+    hass.data["ble_adv"][ent2.entry_id].adapter_ids = ["hci1", "hci2"]
+    add_ent_mock1 = mock.MagicMock()
+    add_ent_mock2 = mock.MagicMock()
+    with mock.patch.object(ent1, "async_on_unload") as on_unload:
+        await async_setup_entry(hass, ent1, add_ent_mock1)
+    await async_setup_entry(hass, ent2, add_ent_mock2)
+    assert _added_adapters(add_ent_mock1) == ["hci0", "hci1"]
+    assert _added_adapters(add_ent_mock2) == ["hci2"]
+    sensor: BleAdvAdapterSensor = add_ent_mock1.call_args.args[0][0]
+    assert sensor.unique_id == "coordinator_unique_id_adapter_hci0"
+    assert sensor.device_info is not None and sensor.device_info["identifiers"] == {("ble_adv", "coordinator_unique_id")}
+    assert "enqueued" in sensor._unrecorded_attributes  # noqa: SLF001
+    on_unload.call_args.args[0]()  # entry 1 unloaded
+    assert _added_adapters(add_ent_mock2) == ["hci2", "hci1"]
+
+
+async def test_update() -> None:
+    """Test the polling of the adapter stats."""
+    coordinator = mock.MagicMock()
+    sensor = BleAdvAdapterSensor(coordinator, "hci0")
+    coordinator.adapter_stats.return_value = None
+    await sensor.async_update()
+    assert not sensor.available
+    coordinator.adapter_stats.return_value = {"queued": 2, "tx_delay": 0.1, "enqueued": 5}
+    await sensor.async_update()
+    assert sensor.available
+    assert sensor.native_value == 2
+    assert sensor.extra_state_attributes == {"tx_delay": 0.1, "enqueued": 5}
+    coordinator.adapter_stats.assert_called_with("hci0")